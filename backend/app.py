@@ -1,22 +1,114 @@
 from flask import Flask, request, jsonify, make_response, send_file
 from flask_cors import CORS
-from pymongo import MongoClient, ASCENDING, DESCENDING
+from werkzeug.middleware.proxy_fix import ProxyFix
+import pymongo
+from pymongo import MongoClient, ASCENDING, DESCENDING, ReadPreference, UpdateOne, ReplaceOne
 from pymongo.collection import ReturnDocument
+from pymongo.errors import CollectionInvalid, BulkWriteError, PyMongoError
+from pymongo.monitoring import ConnectionPoolListener, CommandListener
+from pymongo.read_preferences import PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
 from bson.objectid import ObjectId
 from dotenv import load_dotenv
 import os
 import re
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, date, timedelta, timezone
 import time
+import threading
+import gzip
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+from flask.json.provider import DefaultJSONProvider
+from bson.decimal128 import Decimal128
+from bson import Binary, encode as bson_encode, decode_all as bson_decode_all
 import bcrypt
 import jwt
 from functools import wraps
 import hashlib
 import uuid
+import json
+import random
+import cProfile
+import pstats
+import io
+import queue
+import logging
+from logging.handlers import RotatingFileHandler
+import click
+import csv
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+try:
+    import orjson  # optional: faster JSON encoding
+except ImportError:
+    orjson = None
+try:
+    import brotli  # optional: "br" response compression
+except ImportError:
+    brotli = None
+try:
+    import openpyxl  # optional: .xlsx scheduled reports
+except ImportError:
+    openpyxl = None
+try:
+    import redis  # optional: shared cache tier and invalidation bus
+except ImportError:
+    redis = None
 
 load_dotenv()
 
+# ---------------- JSON ----------------
+def json_default(o):
+    """Serialize BSON/Python types Flask's encoder does not know about."""
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, datetime):
+        # pymongo returns naive UTC datetimes
+        if o.tzinfo is None:
+            o = o.replace(tzinfo=timezone.utc)
+        return o.isoformat()
+    if isinstance(o, date):
+        return o.isoformat()
+    if isinstance(o, Decimal128):
+        o = o.to_decimal()
+    if isinstance(o, Decimal):
+        return float(o)
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+ORJSON_OPTIONS = (orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+class BSONJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider that understands ObjectId, datetime and Decimal/Decimal128, so
+    Mongo documents can be returned from views without per-field conversion.
+    Uses orjson when installed.
+    """
+    default = staticmethod(json_default)
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        # kwargs are only passed for pretty-printed (debug) output; let the stdlib handle those
+        if orjson is not None and not kwargs:
+            return orjson.dumps(obj, default=json_default, option=ORJSON_OPTIONS).decode("utf-8")
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
 app = Flask(__name__)
+app.json = BSONJSONProvider(app)
+
+# Number of reverse proxies in front of the app (e.g. 1 behind nginx). Only
+# that many X-Forwarded-* hops are trusted; request.remote_addr is then the
+# real client, which the audit log and login throttle key on. Left at 0, the
+# headers are ignored, since a client can send any X-Forwarded-For it likes.
+TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", "0"))
+if TRUSTED_PROXIES > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=TRUSTED_PROXIES,
+                            x_host=TRUSTED_PROXIES)
 
 # CORS
 # Normalize origins list (strip whitespace and drop empties) so matching is exact
@@ -32,48 +124,820 @@ USER_COLLECTION = os.getenv("USER_COLLECTION", "Users")
 QR_COLLECTION = os.getenv("QR_COLLECTION", "QrRegistry")              # QR registry is separate
 AUDIT_COLLECTION = os.getenv("AUDIT_COLLECTION", "AuditLogs")
 INFO_COLLECTION = os.getenv("INFO_COLLECTION", "OtherInfo")
+TOMBSTONE_COLLECTION = os.getenv("TOMBSTONE_COLLECTION", "Tombstones")  # deletes, for delta sync
+SYNC_TOMBSTONE_TTL_DAYS = int(os.getenv("SYNC_TOMBSTONE_TTL_DAYS", "30"))
+ARCHIVE_ASSETS_COLLECTION = os.getenv("ARCHIVE_ASSETS_COLLECTION", "AssetsArchive")  # cold tier, see archive_assets
+ARCHIVE_QR_COLLECTION = os.getenv("ARCHIVE_QR_COLLECTION", "QrRegistryArchive")
 JWT_SECRET = os.getenv("JWT_SECRET")
 SIGNUP_SECRET = os.getenv("SECRET_KEY", "")
 
 
-client = MongoClient(MONGO_URL)
-db = client[DB_NAME]
+# Connection pool sizing. Each gunicorn worker process owns its own client, so
+# MONGO_MAX_POOL_SIZE should be at least GUNICORN_THREADS (see gunicorn.conf.py).
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000"))
+
+
+class PoolStateListener(ConnectionPoolListener):
+    """Tracks connection pool state so the readiness probe can report it."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+        self.checked_out = 0
+        self.checkout_failures = 0
+        self.last_checkout_failure = None
+        self.pools_cleared = 0
+        self.last_pool_cleared = None
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "open": self.open,
+                "checked_out": self.checked_out,
+                "checkout_failures": self.checkout_failures,
+                "last_checkout_failure": self.last_checkout_failure,
+                "pools_cleared": self.pools_cleared,
+                "last_pool_cleared": self.last_pool_cleared,
+            }
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pools_cleared += 1
+            self.last_pool_cleared = int(time.time())
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open = max(0, self.open - 1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+            self.last_checkout_failure = int(time.time())
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checked_out += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+
+pool_state = PoolStateListener()
+
+
+# Read commands whose serving node is reported back to the client (see X-Read-Node)
+READ_COMMANDS = {"find", "getMore", "aggregate", "count", "distinct"}
+# Per-request state. pymongo publishes command events on the thread that runs
+# the command, so a thread-local ties them to the request being served.
+_request_local = threading.local()
+
+
+class RequestCommandListener(CommandListener):
+    """
+    Attributes Mongo commands to the current request: which servers answered
+    its reads, how many commands it issued, total DB time and the slowest one.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event)
+        if event.command_name in READ_COMMANDS:
+            served = getattr(_request_local, "read_nodes", None)
+            if served is not None:
+                served.add(event.connection_id)
+
+    def failed(self, event):
+        self._record(event)
+
+    def _record(self, event):
+        stats = getattr(_request_local, "mongo", None)
+        if stats is None:
+            return
+        seconds = event.duration_micros / 1_000_000
+        stats["count"] += 1
+        stats["seconds"] += seconds
+        if seconds >= stats["slowest_seconds"]:
+            stats["slowest_seconds"] = seconds
+            stats["slowest_command"] = event.command_name
+
+
+request_command_listener = RequestCommandListener()
+
+
+# Slow operation log: commands slower than SLOW_QUERY_MS are recorded with
+# their route, redacted filter shape and an explain("executionStats") plan.
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))  # <= 0 disables
+SLOW_OP_COMMANDS = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify", "getMore"}
+_slow_ops_local = threading.local()  # marks the slow-op worker's own commands
+
+
+class SlowCommandListener(CommandListener):
+    """Hands commands that exceed SLOW_QUERY_MS to the slow-op worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def started(self, event):
+        if SLOW_QUERY_MS <= 0 or event.command_name not in SLOW_OP_COMMANDS:
+            return
+        if getattr(_slow_ops_local, "internal", False):
+            return
+        with self._lock:
+            self._inflight[(event.connection_id, event.request_id)] = event.command
+
+    def succeeded(self, event):
+        self._finish(event, event.reply)
+
+    def failed(self, event):
+        self._finish(event, None)
+
+    def _finish(self, event, reply):
+        if SLOW_QUERY_MS <= 0 or event.command_name not in SLOW_OP_COMMANDS:
+            return
+        with self._lock:
+            command = self._inflight.pop((event.connection_id, event.request_id), None)
+        if command is None or event.duration_micros < SLOW_QUERY_MS * 1000:
+            return
+        record_slow_op(event, command, reply)
+
+
+slow_command_listener = SlowCommandListener()
+
+client = MongoClient(
+    MONGO_URL,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+    socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+    event_listeners=[pool_state, request_command_listener, slow_command_listener],
+)
+# Default handles always read from the primary (scans, writes, read-your-writes),
+# even if MONGO_URL carries a readPreference option.
+db = client.get_database(DB_NAME, read_preference=ReadPreference.PRIMARY)
 assets = db[ASSETS_COLLECTION]
 users = db[USER_COLLECTION]
 qr_registry = db[QR_COLLECTION]
 audit = db[AUDIT_COLLECTION]
 info = db[INFO_COLLECTION]
+tombstones = db[TOMBSTONE_COLLECTION]
+assets_archive = db[ARCHIVE_ASSETS_COLLECTION]
+qr_archive = db[ARCHIVE_QR_COLLECTION]
+
+# ---------------- Read/write splitting ----------------
+# Heavy read paths are grouped into workloads; each workload gets its own read
+# preference so analytics, exports and audit browsing can be served by
+# secondaries while scan and write traffic stays on the primary.
+#   analytics: get_asset_stats, get_bulk_asset_stats, get_filter_options
+#   export:    list_assets (full dump)
+#   audit:     audit_list, audit_get_one
+# Override per workload with READ_PREFERENCE_<WORKLOAD> (primary,
+# primaryPreferred, secondary, secondaryPreferred, nearest).
+READ_MAX_STALENESS_SECONDS = int(os.getenv("READ_MAX_STALENESS_SECONDS", "120"))
+READ_WORKLOADS = {
+    "analytics": os.getenv("READ_PREFERENCE_ANALYTICS", "secondaryPreferred"),
+    "export": os.getenv("READ_PREFERENCE_EXPORT", "secondaryPreferred"),
+    "audit": os.getenv("READ_PREFERENCE_AUDIT", "secondaryPreferred"),
+}
 
-# Indexes (idempotent)
-users.create_index("emp_id", unique=True)
-assets.create_index([("serial_no", ASCENDING)])
-qr_registry.create_index([("qr_id", ASCENDING)], unique=True)
-qr_registry.create_index([("serial_no", ASCENDING), ("institute", ASCENDING)], unique=True)
-qr_registry.create_index([("institute", ASCENDING), ("department", ASCENDING)])
-qr_registry.create_index([("created_at", DESCENDING)])
-qr_registry.create_index([("used", ASCENDING), ("created_at", DESCENDING)])
-qr_registry.create_index([("asset_id", ASCENDING)])
-
-# Audit indexes
-audit.create_index([("ts", DESCENDING)])
-audit.create_index([("action", ASCENDING)])
-audit.create_index([("actor.emp_id", ASCENDING), ("ts", DESCENDING)])
-audit.create_index([("resource.id", ASCENDING), ("ts", DESCENDING)])
-audit.create_index([("resource.serial_no", ASCENDING)])
-audit.create_index([("resource.qr_id", ASCENDING)])
+def build_read_preference(mode: str):
+    """Map a read preference mode name to a pymongo read preference."""
+    # The server requires maxStalenessSeconds >= 90; anything lower disables it.
+    staleness = READ_MAX_STALENESS_SECONDS if READ_MAX_STALENESS_SECONDS >= 90 else -1
+    modes = {
+        "primarypreferred": PrimaryPreferred,
+        "secondary": Secondary,
+        "secondarypreferred": SecondaryPreferred,
+        "nearest": Nearest,
+    }
+    cls = modes.get((mode or "").strip().lower())
+    if cls is None:
+        return ReadPreference.PRIMARY
+    return cls(max_staleness=staleness)
+
+def read_collection(name: str, workload: str):
+    """Collection handle carrying the read preference configured for a workload."""
+    return db.get_collection(name, read_preference=build_read_preference(READ_WORKLOADS.get(workload)))
+
+assets_analytics = read_collection(ASSETS_COLLECTION, "analytics")
+qr_registry_analytics = read_collection(QR_COLLECTION, "analytics")
+assets_export = read_collection(ASSETS_COLLECTION, "export")
+audit_reader = read_collection(AUDIT_COLLECTION, "audit")
+# Revision counters read alongside analytics/export data (see collection_validators)
+info_analytics = read_collection(INFO_COLLECTION, "analytics")
+info_export = read_collection(INFO_COLLECTION, "export")
+
+SERVER_TYPE_NODE_CLASS = {
+    "RSPrimary": "primary",
+    "RSSecondary": "secondary",
+    "Standalone": "standalone",
+    "Mongos": "mongos",
+    "LoadBalancer": "load-balancer",
+}
 
-# ---------------- Helpers: Auth ----------------
-EMP_RE = re.compile(r"^[A-Za-z0-9_-]{3,64}$")
+@app.before_request
+def _track_read_nodes():
+    _request_local.read_nodes = set()
+
+@app.after_request
+def _report_read_node(resp):
+    """Tell the client which node class served the request's reads (X-Read-Node)."""
+    served = getattr(_request_local, "read_nodes", None)
+    _request_local.read_nodes = None
+    if not served:
+        return resp
+    try:
+        servers = client.topology_description.server_descriptions()
+        classes = sorted({
+            SERVER_TYPE_NODE_CLASS.get(servers[addr].server_type_name, "unknown") if addr in servers else "unknown"
+            for addr in served
+        })
+        resp.headers["X-Read-Node"] = ",".join(classes)
+    except Exception:
+        pass
+    return resp
+
+# Indexes (idempotent). Also called by scripts that rebuild collections.
+def ensure_indexes():
+    users.create_index("emp_id", unique=True)
+    users.create_index([("role", ASCENDING), ("emp_id", ASCENDING)])
+    users.create_index([("name_lc", ASCENDING)])
+    assets.create_index([("serial_no", ASCENDING)])
+    qr_registry.create_index([("qr_id", ASCENDING)], unique=True)
+    qr_registry.create_index([("serial_no", ASCENDING), ("institute", ASCENDING)], unique=True)
+    qr_registry.create_index([("institute", ASCENDING), ("department", ASCENDING)])
+    qr_registry.create_index([("created_at", DESCENDING)])
+    qr_registry.create_index([("used", ASCENDING), ("created_at", DESCENDING)])
+    qr_registry.create_index([("asset_id", ASCENDING)])
+
+    # Delta sync: change feed order and tombstone retention
+    assets.create_index([("seq", ASCENDING)])
+    qr_registry.create_index([("seq", ASCENDING)])
+    tombstones.create_index([("seq", ASCENDING)])
+    tombstones.create_index([("deleted_at", ASCENDING)], expireAfterSeconds=SYNC_TOMBSTONE_TTL_DAYS * 86400)
+
+    # Scan bundle scope fingerprints (count + newest seq per scope)
+    assets.create_index([("institute", ASCENDING), ("department", ASCENDING),
+                         ("building_name", ASCENDING), ("seq", ASCENDING)])
+    qr_registry.create_index([("institute", ASCENDING), ("department", ASCENDING), ("seq", ASCENDING)])
+
+    # Typed date fields: range filters on list/stats
+    for field in ("assign_date", "purchase_date", "verification_date"):
+        assets.create_index([(field, ASCENDING)])
+
+    # Asset search (edge n-grams, see search_terms)
+    assets.create_index([("_search.grams", ASCENDING)])
+
+    # Room inventory / reconciliation
+    assets.create_index([("building_name", ASCENDING), ("room_no", ASCENDING), ("institute", ASCENDING)])
+
+    # Archival tier: policy scan on the hot side, lookups on the cold side
+    assets.create_index([("status", ASCENDING), ("updated_at", ASCENDING)])
+    assets_archive.create_index([("registration_number", ASCENDING)])
+    assets_archive.create_index([("serial_no", ASCENDING)])
+    assets_archive.create_index([("institute", ASCENDING), ("department", ASCENDING)])
+    qr_archive.create_index([("qr_id", ASCENDING)])
+    qr_archive.create_index([("asset_id", ASCENDING)])
+
+    # Audit indexes
+    audit.create_index([("ts", DESCENDING)])
+    audit.create_index([("action", ASCENDING)])
+    audit.create_index([("actor.emp_id", ASCENDING), ("ts", DESCENDING)])
+    audit.create_index([("resource.id", ASCENDING), ("ts", DESCENDING)])
+    audit.create_index([("resource.serial_no", ASCENDING)])
+    audit.create_index([("resource.qr_id", ASCENDING)])
+
+ensure_indexes()
+
+# ---------------- Load shedding ----------------
+# Expensive endpoint classes get a per-process concurrency limit with a small
+# bounded wait queue, so they can never hold every request thread and starve
+# scan traffic (which is not limited). A request that finds the queue full is
+# shed with 429; one that waited LOAD_SHED_WAIT_SECONDS without a slot gets 503.
+# Admitted requests run under pymongo.timeout(), so every Mongo command carries
+# a maxTimeMS for the remaining budget and the server abandons it on deadline.
+# Keep the sum of limits + queues below GUNICORN_THREADS (see gunicorn.conf.py).
+#   analytics: stats, bulk-stats, filter-options, histogram, valuation
+#   export:    scan bundle
+#   import:    single-import, bulk update/delete, archive runs
+# Plain asset create and list are interactive pages and stay unlimited.
+def _workload_limit(name, concurrency, queue_size, deadline):
+    prefix = f"LOAD_SHED_{name.upper()}"
+    return (int(os.getenv(f"{prefix}_CONCURRENCY", str(concurrency))),
+            int(os.getenv(f"{prefix}_QUEUE", str(queue_size))),
+            float(os.getenv(f"{prefix}_DEADLINE_SECONDS", str(deadline))))
+
+WORKLOAD_LIMITS = {
+    "analytics": _workload_limit("analytics", 2, 1, 15),
+    "export": _workload_limit("export", 2, 1, 60),
+    "import": _workload_limit("import", 1, 0, 120),
+}
+LOAD_SHED_WAIT_SECONDS = float(os.getenv("LOAD_SHED_WAIT_SECONDS", "2"))
+LOAD_SHED_RETRY_AFTER = int(os.getenv("LOAD_SHED_RETRY_AFTER", "5"))
+
+
+class WorkloadLimiter:
+    """Concurrency slots plus a bounded queue for one workload class."""
+
+    def __init__(self, name, concurrency, queue_size, deadline):
+        self.name = name
+        self.deadline = deadline
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._admission = threading.BoundedSemaphore(concurrency + queue_size)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.shed = {"queue_full": 0, "wait_timeout": 0, "deadline": 0}
+
+    def acquire(self):
+        """None when admitted, else the reason it was shed."""
+        if not self._admission.acquire(blocking=False):
+            reason = "queue_full"
+        elif not self._slots.acquire(timeout=LOAD_SHED_WAIT_SECONDS):
+            self._admission.release()
+            reason = "wait_timeout"
+        else:
+            with self._lock:
+                self.in_flight += 1
+            return None
+        self.count(reason)
+        return reason
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+        self._admission.release()
+
+    def count(self, reason):
+        with self._lock:
+            self.shed[reason] += 1
+
+
+workload_limiters = {name: WorkloadLimiter(name, *limits) for name, limits in WORKLOAD_LIMITS.items()}
+
+def shed_response(workload, status, message):
+    resp = make_response(jsonify({"error": message, "workload": workload}), status)
+    resp.headers["Retry-After"] = str(LOAD_SHED_RETRY_AFTER)
+    return resp
+
+def limit_workload(name):
+    """Admit the view through the named workload's limiter and Mongo deadline."""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            limiter = workload_limiters[name]
+            started = time.monotonic()
+            refused = limiter.acquire()
+            if refused == "queue_full":
+                return shed_response(name, 429, f"Too many {name} requests in progress, retry shortly")
+            if refused:
+                return shed_response(name, 503, f"Server busy with {name} requests, retry shortly")
+            try:
+                with pymongo.timeout(limiter.deadline - (time.monotonic() - started)):
+                    return fn(*args, **kwargs)
+            except PyMongoError as e:
+                if not e.timeout:
+                    raise
+                limiter.count("deadline")
+                return shed_response(name, 503, f"Request exceeded the {name} time budget; narrow the filters")
+            finally:
+                limiter.release()
+        return wrapper
+    return deco
+
+def deadline_exceeded(e) -> bool:
+    """Views that catch Exception re-raise these so limit_workload can shed them."""
+    return isinstance(e, PyMongoError) and e.timeout
+
+def render_workload_metrics() -> str:
+    lines = ["# HELP workload_in_flight Requests running per limited workload class.",
+             "# TYPE workload_in_flight gauge"]
+    for name, limiter in sorted(workload_limiters.items()):
+        lines.append(f'workload_in_flight{{workload="{name}"}} {limiter.in_flight}')
+    lines += ["# HELP workload_shed_total Requests shed per workload class and reason.",
+              "# TYPE workload_shed_total counter"]
+    for name, limiter in sorted(workload_limiters.items()):
+        for reason, n in sorted(limiter.shed.items()):
+            lines.append(f'workload_shed_total{{workload="{name}",reason="{reason}"}} {n}')
+    return "\n".join(lines) + "\n"
+
+# ---------------- Response compression ----------------
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "5"))
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/plain", "text/csv", "text/html", "application/javascript"}
+
+def negotiate_encoding(accept_encodings):
+    """Pick the best content coding the client accepts: br, then gzip."""
+    if brotli is not None and accept_encodings.quality("br") > 0:
+        return "br"
+    if accept_encodings.quality("gzip") > 0:
+        return "gzip"
+    return None
+
+def compress_body(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESS_GZIP_LEVEL)
+
+@app.after_request
+def _compress_response(resp):
+    if (
+        request.method == "HEAD"
+        or resp.direct_passthrough
+        or resp.status_code < 200
+        or resp.status_code in (204, 206, 304)
+        or "Content-Encoding" in resp.headers
+        or resp.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return resp
+    data = resp.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return resp
+    resp.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding(request.accept_encodings)
+    if not encoding:
+        return resp
+    resp.set_data(compress_body(data, encoding))
+    resp.headers["Content-Encoding"] = encoding
+    # The compressed bytes differ from the identity representation
+    etag, weak = resp.get_etag()
+    if etag and not weak:
+        resp.set_etag(etag, weak=True)
+    return resp
+
+# ---------------- Shared cache ----------------
+# Two tiers: an in-process LRU and, when CACHE_URL is set (redis://host:6379/0
+# or any Redis-protocol server), a tier shared by every worker and host.
+# Entries live in a namespace named after the data they derive from ("assets",
+# "qr", "users", "master"). Invalidating a namespace bumps its version, which
+# orphans every key in it at once. Invalidations travel on a bus so other
+# workers drop their copies too: Redis pub/sub with CACHE_URL, otherwise a
+# change stream on the source collections (replica sets only; without either,
+# entries live until their TTL, and user lookups skip the cache entirely).
+CACHE_URL = os.getenv("CACHE_URL", "")
+CACHE_PREFIX = os.getenv("CACHE_PREFIX", "campusassets")
+CACHE_LOCAL_SIZE = int(os.getenv("CACHE_LOCAL_SIZE", "4096"))
+CACHE_DEFAULT_TTL = float(os.getenv("CACHE_DEFAULT_TTL", "60"))
+CACHE_BUS = os.getenv("CACHE_BUS", "auto").lower()  # auto | redis | changestream | none
+CACHE_BUS_RETRY_SECONDS = int(os.getenv("CACHE_BUS_RETRY_SECONDS", "30"))
+CACHE_CHANNEL = f"{CACHE_PREFIX}:invalidate"
+# Change-stream bus: source collection -> namespace
+CACHE_COLLECTION_NAMESPACES = {
+    ASSETS_COLLECTION: "assets",
+    QR_COLLECTION: "qr",
+    USER_COLLECTION: "users",
+    INFO_COLLECTION: "master",  # only master-data changes, see _cache_bus_changestream
+}
+
+
+class Cache:
+    """Namespaced, versioned two-tier cache; see the section comment."""
+
+    def __init__(self, local_size, shared=None):
+        self._lock = threading.Lock()
+        self._local = OrderedDict()  # (ns, version, key) -> (expires_at, value), oldest first
+        self._versions = {}          # ns -> version
+        self.local_size = local_size
+        self.shared = shared
+        self.origin = uuid.uuid4().hex  # lets a worker skip its own bus messages
+        self.bus_live = False            # True while an invalidation bus is delivering
+        self.stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "invalidations": 0}
+
+    def _shared_key(self, ns, version, key):
+        return f"{CACHE_PREFIX}:{ns}:{version}:{key}"
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def version(self, ns) -> int:
+        with self._lock:
+            v = self._versions.get(ns)
+        if v is not None:
+            return v
+        v = 0
+        if self.shared is not None:
+            try:
+                v = int(self.shared.get(f"{CACHE_PREFIX}:v:{ns}") or 0)
+            except Exception:
+                pass  # the shared tier is best effort; fall back to local only
+        with self._lock:
+            return self._versions.setdefault(ns, v)
+
+    def _put_local(self, ns, version, key, value, expires_at):
+        with self._lock:
+            self._local.pop((ns, version, key), None)
+            self._local[(ns, version, key)] = (expires_at, value)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def get(self, ns, key, default=None):
+        v = self.version(ns)
+        with self._lock:
+            hit = self._local.get((ns, v, key))
+            if hit is not None and hit[0] > time.time():
+                self._local.move_to_end((ns, v, key))
+                self.stats["local_hits"] += 1
+                return hit[1]
+        if self.shared is not None:
+            try:
+                raw = self.shared.get(self._shared_key(ns, v, key))
+                # BSON, never pickle: the shared tier must not be able to run code here
+                entry = bson_decode_all(raw)[0] if raw is not None else None
+            except Exception:
+                entry = None
+            if entry is not None:
+                expires_at, value = entry["expires_at"], entry["value"]
+                self._put_local(ns, v, key, value, expires_at)
+                self._count("shared_hits")
+                return value
+        self._count("misses")
+        return default
+
+    def set(self, ns, key, value, ttl=None):
+        ttl = ttl or CACHE_DEFAULT_TTL
+        v = self.version(ns)
+        expires_at = time.time() + ttl
+        self._put_local(ns, v, key, value, expires_at)
+        if self.shared is not None:
+            try:
+                raw = bson_encode({"expires_at": expires_at, "value": value})
+                self.shared.set(self._shared_key(ns, v, key), raw, px=int(ttl * 1000))
+            except Exception:
+                pass
+
+    def get_or_set(self, ns, key, loader, ttl=None):
+        value = self.get(ns, key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.set(ns, key, value, ttl)
+        return value
+
+    def delete(self, ns, key):
+        """Drop one key everywhere."""
+        v = self.version(ns)
+        with self._lock:
+            self._local.pop((ns, v, key), None)
+        if self.shared is not None:
+            try:
+                self.shared.delete(self._shared_key(ns, v, key))
+            except Exception:
+                pass
+        self._publish({"op": "del", "ns": ns, "key": key})
+
+    def invalidate(self, *namespaces):
+        """Orphan every key in the namespaces, in this worker and (via the bus) all others."""
+        for ns in namespaces:
+            v = None
+            if self.shared is not None:
+                try:
+                    v = int(self.shared.incr(f"{CACHE_PREFIX}:v:{ns}"))
+                except Exception:
+                    pass
+            with self._lock:
+                self._versions[ns] = v if v is not None else self._versions.get(ns, 0) + 1
+                self.stats["invalidations"] += 1
+            self._publish({"op": "inv", "ns": ns, "v": v})
+
+    def apply(self, msg):
+        """Apply an invalidation received from the bus."""
+        if msg.get("origin") == self.origin:
+            return
+        ns = msg["ns"]
+        if msg["op"] == "del":
+            with self._lock:
+                self._local.pop((ns, self._versions.get(ns, 0), msg["key"]), None)
+            return
+        with self._lock:
+            current = self._versions.get(ns, 0)
+            self._versions[ns] = max(current, msg["v"]) if msg.get("v") is not None else current + 1
+            self.stats["invalidations"] += 1
+
+    def bus_connected(self):
+        """Invalidations sent while the bus was down are lost; drop the local tier."""
+        with self._lock:
+            self._local.clear()
+            self.bus_live = True
+
+    def _publish(self, msg):
+        if self.shared is None:
+            return  # change-stream bus: other workers see the write itself
+        try:
+            self.shared.publish(CACHE_CHANNEL, json.dumps({**msg, "origin": self.origin}))
+        except Exception:
+            pass
+
+
+def build_shared_cache():
+    if not CACHE_URL:
+        return None
+    if redis is None:
+        logging.getLogger(__name__).warning("CACHE_URL is set but redis is not installed; using the local cache only")
+        return None
+    return redis.Redis.from_url(CACHE_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+cache = Cache(CACHE_LOCAL_SIZE, build_shared_cache())
+_cache_bus_thread = None
+_cache_bus_lock = threading.Lock()
+
+def _cache_bus_redis():
+    # Own connection without socket_timeout: listen() blocks between messages
+    pubsub = redis.Redis.from_url(CACHE_URL).pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(CACHE_CHANNEL)
+    cache.bus_connected()
+    for message in pubsub.listen():
+        cache.apply(json.loads(message["data"]))
+
+def _cache_bus_changestream():
+    pipeline = [{"$match": {"$or": [
+        {"ns.coll": {"$in": [c for c, ns in CACHE_COLLECTION_NAMESPACES.items() if ns != "master"]}},
+        # OtherInfo also holds counters written on every asset change; only
+        # master-data writes (which always bump "version") matter here
+        {"ns.coll": INFO_COLLECTION, "updateDescription.updatedFields.version": {"$exists": True}},
+        {"ns.coll": INFO_COLLECTION, "fullDocument.type": MASTER_DOC_FILTER["type"]},
+    ]}}]
+    with db.watch(pipeline) as stream:
+        cache.bus_connected()
+        for change in stream:
+            ns = CACHE_COLLECTION_NAMESPACES[change["ns"]["coll"]]
+            if ns == "users":
+                cache.apply({"op": "del", "ns": ns, "key": str(change["documentKey"]["_id"])})
+            else:
+                cache.apply({"op": "inv", "ns": ns})
+
+def _cache_bus_worker(listen):
+    warned = False
+    while True:
+        try:
+            listen()
+        except Exception as e:
+            # Standalone servers cannot open change streams; say so once
+            log = logging.getLogger(__name__)
+            (log.debug if warned else log.warning)("cache invalidation bus unavailable: %s", e)
+            warned = True
+        cache.bus_live = False
+        time.sleep(CACHE_BUS_RETRY_SECONDS)
+
+def cache_bus_listener():
+    mode = CACHE_BUS
+    if mode == "auto":
+        mode = "redis" if cache.shared is not None else "changestream"
+    if mode == "redis" and cache.shared is not None:
+        return _cache_bus_redis
+    if mode == "changestream":
+        return _cache_bus_changestream
+    return None
+
+@app.before_request
+def _ensure_cache_bus():
+    global _cache_bus_thread
+    if _cache_bus_thread is not None:
+        return
+    with _cache_bus_lock:
+        if _cache_bus_thread is None:
+            listen = cache_bus_listener()
+            _cache_bus_thread = threading.Thread(target=_cache_bus_worker, args=(listen,), name="cache-bus", daemon=True)
+            if listen is not None:
+                _cache_bus_thread.start()
+
+def render_cache_metrics() -> str:
+    lines = ["# HELP cache_events_total Shared cache lookups and invalidations in this worker.",
+             "# TYPE cache_events_total counter"]
+    for event, n in sorted(cache.stats.items()):
+        lines.append(f'cache_events_total{{event="{event}"}} {n}')
+    return "\n".join(lines) + "\n"
+
+# ---------------- Helpers: Password hashing ----------------
+# bcrypt runs on a small per-process pool so a login storm cannot occupy every
+# request thread. Jobs beyond PASSWORD_WORKERS + PASSWORD_QUEUE_MAX are refused
+# at once (PasswordPoolBusy -> 503 with Retry-After) instead of queueing.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", "2"))
+PASSWORD_QUEUE_MAX = int(os.getenv("PASSWORD_QUEUE_MAX", "16"))
+PASSWORD_WAIT_SECONDS = float(os.getenv("PASSWORD_WAIT_SECONDS", "10"))
+PASSWORD_RETRY_AFTER = int(os.getenv("PASSWORD_RETRY_AFTER", "2"))
+
+class PasswordPoolBusy(Exception):
+    """The hashing pool is saturated; the caller should answer 503."""
+
+_password_pool = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="bcrypt")
+_password_slots = threading.BoundedSemaphore(PASSWORD_WORKERS + PASSWORD_QUEUE_MAX)
+
+def run_password_job(fn, *args):
+    if not _password_slots.acquire(blocking=False):
+        raise PasswordPoolBusy()
+    try:
+        future = _password_pool.submit(fn, *args)
+    except Exception:
+        _password_slots.release()
+        raise
+    future.add_done_callback(lambda _: _password_slots.release())
+    try:
+        return future.result(timeout=PASSWORD_WAIT_SECONDS)
+    except FuturesTimeout:
+        raise PasswordPoolBusy()
 
 def hash_password(plain: str) -> bytes:
-    return bcrypt.hashpw(plain.encode("utf-8"), bcrypt.gensalt())
+    return run_password_job(bcrypt.hashpw, plain.encode("utf-8"), bcrypt.gensalt(BCRYPT_ROUNDS))
 
 def check_password(plain: str, hashed: bytes) -> bool:
     try:
-        return bcrypt.checkpw(plain.encode("utf-8"), hashed)
+        return run_password_job(bcrypt.checkpw, plain.encode("utf-8"), hashed)
+    except PasswordPoolBusy:
+        raise
     except Exception:
         return False
 
+def password_needs_rehash(hashed) -> bool:
+    """True when a stored hash was made with a different cost than BCRYPT_ROUNDS."""
+    try:
+        return int(bytes(hashed).split(b"$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError, TypeError):
+        return False
+
+def password_busy_response():
+    resp = make_response(jsonify({"error": "Server busy, please retry shortly"}), 503)
+    resp.headers["Retry-After"] = str(PASSWORD_RETRY_AFTER)
+    return resp
+
+class FailureThrottle:
+    """
+    Token bucket per key (emp_id or client IP). Each failed attempt spends a
+    token; tokens refill one per refill_seconds up to burst. Per process; at
+    most max_keys buckets are kept, the least recently spent evicted first.
+    """
+
+    def __init__(self, burst, refill_seconds, max_keys=50000):
+        self._lock = threading.Lock()
+        self.burst = burst
+        self.refill = refill_seconds
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated), oldest update first
+
+    def _level(self, key, now):
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated) / self.refill)
+
+    def retry_after(self, key) -> int:
+        """Seconds until the key may try again; 0 when it may now."""
+        with self._lock:
+            level = self._level(key, time.time())
+        return 0 if level >= 1 else int((1 - level) * self.refill) + 1
+
+    def spend(self, key):
+        now = time.time()
+        with self._lock:
+            self._buckets[key] = (self._level(key, now) - 1, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+LOGIN_FAIL_BURST = int(os.getenv("LOGIN_FAIL_BURST", "5"))
+LOGIN_FAIL_IP_BURST = int(os.getenv("LOGIN_FAIL_IP_BURST", "30"))
+LOGIN_FAIL_REFILL_SECONDS = float(os.getenv("LOGIN_FAIL_REFILL_SECONDS", "60"))
+login_fail_by_emp = FailureThrottle(LOGIN_FAIL_BURST, LOGIN_FAIL_REFILL_SECONDS)
+login_fail_by_ip = FailureThrottle(LOGIN_FAIL_IP_BURST, LOGIN_FAIL_REFILL_SECONDS)
+
+# ---------------- Helpers: Auth ----------------
+EMP_RE = re.compile(r"^[A-Za-z0-9_-]{3,64}$")
+
 def jwt_issue(user, ttl_hours=8):
     now = int(time.time())
     payload = {
@@ -98,24 +962,26 @@ def get_token_from_request():
     return None
 
 def update_asset_by_registration(registration_number, update_data):
-    # Remove _id if present in update_data
-    if '_id' in update_data:
-        del update_data['_id']
-    
-    # Add update timestamp
-    update_data['updated_at'] = datetime.now(timezone.utc)
-    
+    # Remove _id and the system-maintained version fields if present
+    for key in ('_id', 'version', 'updated_at', 'seq', '_search', 'schema'):
+        update_data.pop(key, None)
+    type_asset_fields(update_data)  # raises ValueError for malformed dates/amounts
+
     result = assets.find_one_and_update(
         {"registration_number": registration_number},
-        {"$set": update_data},
+        stamp_update({"$set": update_data}),
         return_document=ReturnDocument.AFTER
     )
     
     if result:
-        result['_id'] = str(result['_id'])
-        return result
+        if touches_search(update_data):
+            assets.update_one({"_id": result["_id"]}, {"$set": {"_search": search_terms(result)}})
+        bump_revision("assets")
+        return present_asset(result)
     return None
 
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+
 def current_user():
     token = get_token_from_request()
     if not token:
@@ -125,11 +991,17 @@ def current_user():
         uid = payload.get("sub")
         if not uid:
             return None, "Invalid token"
-        doc = users.find_one({"_id": ObjectId(uid)}, {"password": 0})
-        if not doc:
-            return None, "User not found"
-        doc["_id"] = str(doc["_id"])
-        return doc, None
+        # Without a running bus a delete or role change in another worker would
+        # not reach this one, so read the user every time
+        doc = cache.get("users", uid) if cache.bus_live else None
+        if doc is None:
+            doc = users.find_one({"_id": ObjectId(uid)}, {"password": 0})
+            if not doc:
+                return None, "User not found"
+            doc["_id"] = str(doc["_id"])
+            if cache.bus_live:
+                cache.set("users", uid, doc, USER_CACHE_TTL)
+        return dict(doc), None
     except Exception:
         return None, "Invalid or expired token"
 
@@ -193,20 +1065,25 @@ def hash_ua(ua: str) -> str:
     except Exception:
         return ""
 
+def client_ip(req) -> str:
+    # ProxyFix (TRUSTED_PROXIES) has already resolved forwarded hops
+    return req.remote_addr or ""
+
 def get_request_context(req):
-    ip = req.headers.get("X-Forwarded-For", "").split(",")[0].strip() or req.remote_addr or ""
+    ip = client_ip(req)
     ua = req.headers.get("User-Agent", "")
     ctx = {
         "ip_masked": mask_ip(ip),
         "ua_hash": hash_ua(ua),
         "method": req.method,
         "route": req.path,
-        "request_id": req.headers.get("X-Request-ID", str(uuid.uuid4())),
+        "request_id": getattr(_request_local, "request_id", None) or req.headers.get("X-Request-ID", str(uuid.uuid4())),
     }
     return ctx
 
 def audit_log(audit_col, req, user, action, resource=None, changes=None,
-              ok=True, status=200, error=None, institute=None, department=None, severity="info"):
+              ok=True, status=200, error=None, institute=None, department=None, severity="info",
+              snapshot=None):
     try:
         now = int(time.time())
         doc = {
@@ -238,11 +1115,181 @@ def audit_log(audit_col, req, user, action, resource=None, changes=None,
             doc.pop("institute", None)
         if not doc.get("department"):
             doc.pop("department", None)
+        if snapshot is not None:
+            doc["snapshot"] = snapshot  # compressed copy of removed data; not returned by the read APIs
         audit_col.insert_one(doc)
     except Exception:
         # Never break the main flow because of audit failures
         pass
 
+# ---------------- Helpers: Conditional GET ----------------
+# Every asset/QR write stamps "updated_at" and increments "version" on the
+# document, and bumps a per-collection counter in the OtherInfo "revisions"
+# record. Single-document GETs derive their validators from the former; list
+# and stats endpoints from the latter.
+REVISION_DOC_FILTER = {"type": "revisions"}
+VALIDATOR_FIELDS = {"version": 1, "updated_at": 1}
+
+def stamp_update(update: dict, now=None, seq=None) -> dict:
+    """Add updated_at/version/seq maintenance to an update document."""
+    fields = update.setdefault("$set", {})
+    # Timestamp before allocating: the sync feed's settle window relies on it
+    fields["updated_at"] = now or datetime.now(timezone.utc)
+    fields["seq"] = seq if seq is not None else allocate_seq()
+    update.setdefault("$inc", {})["version"] = 1
+    return update
+
+def stamp_new(doc: dict, now=None, seq=None) -> dict:
+    doc["updated_at"] = now or datetime.now(timezone.utc)
+    doc["seq"] = seq if seq is not None else allocate_seq()
+    doc["version"] = 1
+    return doc
+
+def bump_revision(*names):
+    """Record that the named collections ("assets", "qr") changed."""
+    now = datetime.now(timezone.utc)
+    info.update_one(
+        REVISION_DOC_FILTER,
+        {"$inc": {n: 1 for n in names}, "$set": {f"{n}_at": now for n in names}},
+        upsert=True,
+    )
+    cache.invalidate(*names)
+
+def _as_utc(dt):
+    if dt is None:
+        return None
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+def doc_validators(prefix, doc):
+    """(etag, last_modified) for one document; legacy docs count as version 0."""
+    return f"{prefix}-{doc['_id']}-{int(doc.get('version') or 0)}", _as_utc(doc.get("updated_at"))
+
+def collection_validators(prefix, *names, source=None):
+    """
+    (etag, last_modified) from the revision counters of the named collections.
+    Analytics endpoints pass their own read handle as source and call this
+    before running their queries, so a lagging secondary can only make the
+    ETag older than the data, never newer.
+    """
+    doc = (source if source is not None else info).find_one(REVISION_DOC_FILTER) or {}
+    etag = "-".join([prefix] + [str(int(doc.get(n) or 0)) for n in names])
+    stamps = [_as_utc(doc.get(f"{n}_at")) for n in names if doc.get(f"{n}_at")]
+    return etag, max(stamps, default=None)
+
+def wants_revalidation() -> bool:
+    return bool(request.if_none_match) or request.if_modified_since is not None
+
+def not_modified(etag, last_modified=None):
+    """304 response if the request's validators match, else None."""
+    if request.if_none_match:
+        # If-None-Match wins over If-Modified-Since when both are sent
+        fresh = bool(etag) and request.if_none_match.contains_weak(etag)
+    elif last_modified is not None and request.if_modified_since is not None:
+        fresh = last_modified.replace(microsecond=0) <= request.if_modified_since
+    else:
+        fresh = False
+    if not fresh:
+        return None
+    return with_etag(make_response("", 304), etag, last_modified)
+
+def with_etag(resp, etag, last_modified=None):
+    """Attach validators and ask clients to revalidate before reuse."""
+    if etag:
+        resp.set_etag(etag, weak=True)
+    if last_modified is not None:
+        resp.last_modified = last_modified
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+def document_response(coll, query, prefix, projection=None, present=None):
+    """
+    Single-document GET with conditional support. When the request carries
+    validators, a version-only probe runs first so a 304 skips both the full
+    fetch and serialization.
+    """
+    if wants_revalidation():
+        probe = coll.find_one(query, VALIDATOR_FIELDS)
+        if not probe:
+            return jsonify({"error": "Not found"}), 404
+        cached = not_modified(*doc_validators(prefix, probe))
+        if cached is not None:
+            return cached
+    doc = coll.find_one(query, projection)
+    if not doc:
+        return jsonify({"error": "Not found"}), 404
+    validators = doc_validators(prefix, doc)
+    return with_etag(jsonify(present(doc) if present else doc), *validators), 200
+
+# ---------------- Helpers: Sync sequence ----------------
+# Assets, QR rows and tombstones share one monotonically increasing "seq"
+# drawn from a counter in OtherInfo; GET /api/sync/changes pages through it.
+SYNC_SEQ_FILTER = {"type": "sync_seq"}
+# A seq is allocated shortly before its write commits. The feed only hands
+# out changes older than this window so a slower in-flight write with a
+# lower seq can never land behind a client's watermark.
+SYNC_SETTLE_SECONDS = float(os.getenv("SYNC_SETTLE_SECONDS", "5"))
+
+def allocate_seq(count: int = 1) -> int:
+    """Reserve count consecutive sequence numbers; returns the first."""
+    doc = info.find_one_and_update(
+        SYNC_SEQ_FILTER, {"$inc": {"value": count}},
+        upsert=True, return_document=ReturnDocument.AFTER,
+    )
+    return int(doc["value"]) - count + 1
+
+def record_tombstones(kind: str, docs, key: str):
+    """Leave a tombstone per deleted document so sync clients drop it too."""
+    docs = list(docs)
+    if not docs:
+        return
+    now = datetime.now(timezone.utc)
+    first = allocate_seq(len(docs))
+    tombstones.insert_many([
+        {"kind": kind, "doc_id": d["_id"], key: d.get(key), "seq": first + i, "deleted_at": now}
+        for i, d in enumerate(docs)
+    ])
+
+# ---------------- Helpers: Asset search terms ----------------
+# Each asset carries "_search": {"tokens": [...], "grams": [...]} built from
+# SEARCH_FIELDS on every write. "grams" holds the edge n-grams of every token
+# (a multikey index serves prefix lookups); "tokens" is used for ranking and
+# for prefixes longer than SEARCH_GRAM_MAX. Responses never include it.
+SEARCH_FIELDS = ["asset_name", "company_model", "it_serial_no", "dead_stock_no",
+                 "vendor_name", "bill_no", "po_no", "desc"]
+# Code-like fields also index their separator-free form ("INV/2019/0042" -> "inv20190042")
+SEARCH_CODE_FIELDS = {"company_model", "it_serial_no", "dead_stock_no", "bill_no", "po_no"}
+SEARCH_GRAM_MIN = 2
+SEARCH_GRAM_MAX = 8
+SEARCH_DESC_TOKENS = 24
+ASSET_PUBLIC = {"_search": 0}
+_SEARCH_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def search_tokens(text) -> list:
+    return _SEARCH_TOKEN_RE.findall(str(text).lower())
+
+def search_terms(doc: dict) -> dict:
+    tokens = set()
+    for field in SEARCH_FIELDS:
+        value = doc.get(field)
+        if value in (None, ""):
+            continue
+        words = search_tokens(value)
+        if field == "desc":
+            words = words[:SEARCH_DESC_TOKENS]
+        tokens.update(words)
+        if field in SEARCH_CODE_FIELDS and len(words) > 1:
+            tokens.add("".join(words))
+    grams = {t[:n] for t in tokens for n in range(SEARCH_GRAM_MIN, min(len(t), SEARCH_GRAM_MAX) + 1)}
+    return {"tokens": sorted(tokens), "grams": sorted(grams)}
+
+def touches_search(fields) -> bool:
+    return any(f in SEARCH_FIELDS for f in fields)
+
+def refresh_search_terms(query):
+    """Recompute _search for assets matching query after a partial update."""
+    for doc in assets.find(query, {f: 1 for f in SEARCH_FIELDS}):
+        assets.update_one({"_id": doc["_id"]}, {"$set": {"_search": search_terms(doc)}})
+
 # ---------------- Auth routes ----------------
 @app.route("/api/auth/signup", methods=["POST"])
 def auth_signup():
@@ -268,8 +1315,11 @@ def auth_signup():
 
     try:
         hashed = hash_password(password)
-        doc = {"emp_id": emp_id, "name": name, "password": hashed, "role": role, "created_at": int(time.time())}
+        doc = {"emp_id": emp_id, "name": name, "name_lc": name.lower(), "password": hashed, "role": role,
+               "created_at": int(time.time())}
         users.insert_one(doc)
+    except PasswordPoolBusy:
+        return password_busy_response()
     except Exception as e:
         if "duplicate key" in str(e).lower():
             audit_log(audit, request, None, "auth.signup", ok=False, status=409, error="Duplicate emp_id")
@@ -277,6 +1327,7 @@ def auth_signup():
         audit_log(audit, request, None, "auth.signup", ok=False, status=500, error="Insert failed")
         return jsonify({"error": "Failed to create user"}), 500
 
+    adjust_role_count(role, 1)
     user = users.find_one({"emp_id": emp_id})
     token = jwt_issue(user)
     user_out = {"_id": str(user["_id"]), "emp_id": user["emp_id"], "name": user["name"], "role": user["role"]}
@@ -294,10 +1345,33 @@ def auth_login():
         audit_log(audit, request, None, "auth.login", ok=False, status=400, error="Missing credentials")
         return jsonify({"error": "Missing credentials"}), 400
 
+    emp_key, ip_key = emp_id.lower(), client_ip(request)
+    wait = max(login_fail_by_emp.retry_after(emp_key), login_fail_by_ip.retry_after(ip_key))
+    if wait:
+        audit_log(audit, request, None, "auth.login", ok=False, status=429, error="Too many failed attempts")
+        resp = make_response(jsonify({"error": "Too many failed attempts, try again later"}), 429)
+        resp.headers["Retry-After"] = str(wait)
+        return resp
+
     user = users.find_one({"emp_id": emp_id})
-    if not user or not check_password(password, user.get("password") or b""):
+    stored = (user or {}).get("password") or b""
+    try:
+        ok = bool(user) and check_password(password, stored)
+    except PasswordPoolBusy:
+        return password_busy_response()
+    if not ok:
+        login_fail_by_emp.spend(emp_key)
+        login_fail_by_ip.spend(ip_key)
         audit_log(audit, request, None, "auth.login", ok=False, status=401, error="Invalid credentials")
         return jsonify({"error": "Invalid credentials"}), 401
+    login_fail_by_emp.reset(emp_key)
+
+    if password_needs_rehash(stored):
+        # Best effort: a busy pool just leaves it for the next login
+        try:
+            users.update_one({"_id": user["_id"], "password": stored}, {"$set": {"password": hash_password(password)}})
+        except PasswordPoolBusy:
+            pass
 
     token = jwt_issue(user)
     user_out = {"_id": str(user["_id"]), "emp_id": user["emp_id"], "name": user["name"], "role": user.get("role", "Faculty")}
@@ -329,22 +1403,186 @@ def sanitize_token(s: str) -> str:
     base = (s or "").strip().replace(" ", "_")
     return SAFE_TOKEN_RE.sub("", base)[:48] or "ASSET"
 
-def reg_prefix_from_asset(asset_name: str) -> str:
+def reg_prefix_from_asset(asset_name: str, at=None) -> str:
     name = sanitize_token(asset_name)[:6]
-    ts = datetime.now().strftime("%Y%m%d%H%M%S")
+    ts = (at or datetime.now()).strftime("%Y%m%d%H%M%S")
     return f"{name}/{ts}"
 
 def reg_with_seq(prefix: str, idx: int) -> str:
     return f"{prefix}/{idx:05d}"
 
 # Assets serial number generator (global sequential 1..N)
-def next_asset_serial() -> int:
-    cur = assets.find({}, {"serial_no": 1}).sort([("serial_no", DESCENDING)]).limit(1)
+# Serials come from a counter in OtherInfo. Each allocation first raises it
+# ($max) to the highest serial in either tier, so archived assets keep their
+# numbers and rows written by imports or seed scripts are never reissued.
+ASSET_SERIAL_FILTER = {"type": "asset_serial"}
+
+def highest_asset_serial() -> int:
+    top = 0
+    for coll in (assets, assets_archive):
+        doc = coll.find_one({"serial_no": {"$exists": True}}, {"serial_no": 1}, sort=[("serial_no", DESCENDING)])
+        try:
+            top = max(top, int(doc["serial_no"]))
+        except (TypeError, KeyError, ValueError):
+            pass
+    return top
+
+def next_asset_serial(count: int = 1) -> int:
+    """Reserve count consecutive serial numbers; returns the first."""
+    info.update_one(ASSET_SERIAL_FILTER, {"$max": {"value": highest_asset_serial()}}, upsert=True)
+    doc = info.find_one_and_update(
+        ASSET_SERIAL_FILTER, {"$inc": {"value": count}},
+        upsert=True, return_document=ReturnDocument.AFTER,
+    )
+    return int(doc["value"]) - count + 1
+
+# ---------------- Helpers: Typed asset schema ----------------
+# Assets store real BSON dates (UTC midnight), Decimal128 money and int
+# serials. Writes coerce through type_asset_fields(); responses go through
+# present_asset(), which turns dates back into "YYYY-MM-DD" so the API shape
+# is unchanged. "flask migrate-asset-types" converts older documents.
+ASSET_SCHEMA_VERSION = 2
+ASSET_DATE_FIELDS = ("assign_date", "purchase_date", "verification_date")
+DATE_INPUT_FORMATS = (DATE_FMT_DATE, "%d-%m-%Y", "%d/%m/%Y", "%Y/%m/%d", "%d.%m.%Y")
+MONEY_QUANT = Decimal("0.01")
+
+def parse_date_field(value):
+    """UTC-midnight datetime from a date/ISO string/datetime; None when blank."""
+    if value is None:
+        return None
+    if isinstance(value, (datetime, date)):
+        return datetime(value.year, value.month, value.day)
+    text = str(value).strip()
+    if not text:
+        return None
+    for fmt in DATE_INPUT_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            pass
+    parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))  # raises ValueError
+    return datetime(parsed.year, parsed.month, parsed.day)
+
+def parse_money(value):
+    """Decimal128 rounded to paise from a number or "1,250.50"; None when blank."""
+    if value is None or isinstance(value, Decimal128):
+        return value
+    text = str(value).replace(",", "").strip()
+    if not text:
+        return None
     try:
-        last = list(cur)[0].get("serial_no")
-        return int(last) + 1
-    except Exception:
-        return 1
+        amount = Decimal(text)
+    except InvalidOperation:
+        raise ValueError(f"not a number: {text!r}")
+    if not amount.is_finite():
+        raise ValueError(f"not a number: {text!r}")
+    return Decimal128(amount.quantize(MONEY_QUANT))
+
+def parse_serial(value):
+    if value is None or isinstance(value, bool):
+        raise ValueError("serial_no must be an integer")
+    if isinstance(value, int):
+        return value
+    return int(str(value).replace("\uFEFF", "").strip())
+
+def type_asset_fields(fields: dict) -> dict:
+    """Coerce the typed asset fields present in fields, in place."""
+    for field in ASSET_DATE_FIELDS:
+        if field in fields:
+            try:
+                fields[field] = parse_date_field(fields[field])
+            except ValueError:
+                raise ValueError(f"{field} must be a date (YYYY-MM-DD)")
+    if "rate_per_unit" in fields:
+        try:
+            fields["rate_per_unit"] = parse_money(fields["rate_per_unit"])
+        except ValueError:
+            raise ValueError("rate_per_unit must be a number")
+    if "serial_no" in fields:
+        try:
+            fields["serial_no"] = parse_serial(fields["serial_no"])
+        except ValueError:
+            raise ValueError("serial_no must be an integer")
+    return fields
+
+def present_asset(doc):
+    """API shape of a stored asset: dates as YYYY-MM-DD ("" when unset), no search terms."""
+    if not doc:
+        return doc
+    for field in ASSET_DATE_FIELDS:
+        if field in doc:
+            value = doc[field]
+            doc[field] = value.strftime(DATE_FMT_DATE) if isinstance(value, datetime) else (value or "")
+    doc.pop("_search", None)
+    return doc
+
+def date_range_filter(args):
+    """
+    {field: {"$gte", "$lt"}} from ?date_field=&date_from=&date_to= (inclusive
+    days, date_field defaults to purchase_date); {} when no bounds. Raises ValueError.
+    """
+    start, end = (args.get("date_from") or "").strip(), (args.get("date_to") or "").strip()
+    if not start and not end:
+        return {}
+    field = (args.get("date_field") or "purchase_date").strip()
+    if field not in ASSET_DATE_FIELDS:
+        raise ValueError(f"date_field must be one of {list(ASSET_DATE_FIELDS)}")
+    bounds = {}
+    try:
+        if start:
+            bounds["$gte"] = parse_date_field(start)
+        if end:
+            bounds["$lt"] = parse_date_field(end) + timedelta(days=1)
+    except ValueError:
+        raise ValueError("date_from/date_to must be dates (YYYY-MM-DD)")
+    return {field: bounds}
+
+def migrate_asset_document(doc: dict) -> dict:
+    """$set converting one pre-typed asset. Unparseable values move to legacy_raw.<field>."""
+    fields = {"schema": ASSET_SCHEMA_VERSION}
+    for field in (*ASSET_DATE_FIELDS, "rate_per_unit", "serial_no"):
+        if field not in doc:
+            continue
+        value = doc[field]
+        try:
+            typed = type_asset_fields({field: value})[field]
+        except ValueError:
+            if field == "serial_no":
+                continue  # keep it; serials are referenced by QR labels and reports
+            fields[f"legacy_raw.{field}"] = value
+            typed = None
+        if type(typed) is not type(value) or typed != value:
+            fields[field] = typed
+    return fields
+
+@app.cli.command("migrate-asset-types")
+@click.option("--batch-size", default=500, show_default=True)
+def migrate_asset_types_command(batch_size):
+    """Convert older assets to the typed schema; resumable, _id order."""
+    projection = {f: 1 for f in (*ASSET_DATE_FIELDS, "rate_per_unit", "serial_no", "version")}
+    last_id, done, raw = None, 0, 0
+    while True:
+        q = {"schema": {"$ne": ASSET_SCHEMA_VERSION}}
+        if last_id is not None:
+            q["_id"] = {"$gt": last_id}
+        docs = list(assets.find(q, projection).sort("_id", ASCENDING).limit(batch_size))
+        if not docs:
+            break
+        now = datetime.now(timezone.utc)
+        first_seq = allocate_seq(len(docs))
+        ops = []
+        for n, doc in enumerate(docs):
+            fields = migrate_asset_document(doc)
+            raw += sum(1 for k in fields if k.startswith("legacy_raw."))
+            # Skip documents edited mid-run; the next run picks them up
+            ops.append(UpdateOne({"_id": doc["_id"], "version": doc.get("version")},
+                                 stamp_update({"$set": fields}, now, first_seq + n)))
+        assets.bulk_write(ops, ordered=False)
+        last_id, done = docs[-1]["_id"], done + len(docs)
+        click.echo(f"{done} assets migrated")
+    if done:
+        bump_revision("assets")
+    click.echo(f"done: {done} assets, {raw} unparseable values kept under legacy_raw")
 
 # ---------------- Assets (create/list/update) ----------------
 # DEPRECATED ROUTE: POST /api/assets/bulk
@@ -405,14 +1643,14 @@ def create_assets_bulk():
     except Exception:
         return jsonify({"error": "quantity must be an integer"}), 400
 
-    # Coerce rate_per_unit to numeric if possible (store as float), else keep string
-    rate_per_unit = None
-    if rate_per_unit_raw:
-        try:
-            rate_per_unit = float(rate_per_unit_raw.replace(",", ""))
-        except Exception:
-            # keep original text if parsing fails
-            rate_per_unit = rate_per_unit_raw
+    # Typed fields: BSON dates and Decimal128 money
+    try:
+        typed = type_asset_fields({
+            "assign_date": assign_date, "purchase_date": purchase_date,
+            "verification_date": verification_date, "rate_per_unit": rate_per_unit_raw,
+        })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     # Required checks
     missing = []
@@ -434,25 +1672,14 @@ def create_assets_bulk():
     if status and status not in allowed_status:
         return jsonify({"error": f"status must be one of {sorted(list(allowed_status))}"}), 400
 
-    # Date parsing leniency: keep raw if parse fails
-    if assign_date:
-        try:
-            _ = datetime.strptime(assign_date, DATE_FMT_DATE)
-        except Exception:
-            pass
-
-    if purchase_date:
-        try:
-            _ = datetime.strptime(purchase_date, DATE_FMT_DATE)
-        except Exception:
-            pass
-
     prefix = reg_prefix_from_asset(asset_name)
 
     # Allocate serial numbers up-front to avoid race on per-insert
-    start_serial = next_asset_serial()
+    start_serial = next_asset_serial(quantity)
     docs = []
     now_ts = int(time.time())
+    stamped_at = datetime.now(timezone.utc)
+    first_seq = allocate_seq(quantity)
     for i in range(1, quantity + 1):
         doc = {
             "serial_no": start_serial + (i - 1),
@@ -468,7 +1695,7 @@ def create_assets_bulk():
             "building_name": building_name,
 
             # Assignment/lifecycle
-            "assign_date": assign_date,
+            "assign_date": typed["assign_date"],
             "status": status,
 
             # Details
@@ -476,7 +1703,7 @@ def create_assets_bulk():
             "remarks": remarks,
 
             # Verification
-            "verification_date": verification_date or "",
+            "verification_date": typed["verification_date"],
             "verified": bool(verified),
             "verified_by": verified_by,
 
@@ -492,8 +1719,8 @@ def create_assets_bulk():
             # Procurement
             "bill_no": bill_no,
             "vendor_name": vendor_name,
-            "purchase_date": purchase_date,
-            "rate_per_unit": rate_per_unit,
+            "purchase_date": typed["purchase_date"],
+            "rate_per_unit": typed["rate_per_unit"],
             "po_no": po_no,
 
             # Physical/specs
@@ -503,8 +1730,10 @@ def create_assets_bulk():
             "dead_stock_no": dead_stock_no,
 
             "created_at": now_ts,
+            "schema": ASSET_SCHEMA_VERSION,
         }
-        docs.append(doc)
+        doc["_search"] = search_terms(doc)
+        docs.append(stamp_new(doc, stamped_at, first_seq + i - 1))
 
     try:
         res = assets.insert_many(docs, ordered=True)
@@ -515,9 +1744,10 @@ def create_assets_bulk():
             docs[i - 1]["registration_number"] = reg_with_seq(prefix, i)
         res = assets.insert_many(docs, ordered=True)
 
-    inserted_ids = [str(x) for x in res.inserted_ids]
-    for j, _id in enumerate(inserted_ids):
-        docs[j]["_id"] = _id
+    # insert_many sets "_id" on each doc in place; the JSON provider serializes it
+    for doc in docs:
+        present_asset(doc)
+    bump_revision("assets")
 
     # AUDIT (bulk)
     try:
@@ -549,22 +1779,33 @@ def create_asset_single():
 @app.route("/api/assets", methods=["GET"])
 @require_auth
 def list_assets():
-    out = []
-    for d in assets.find():
-        d["_id"] = str(d["_id"])
-        out.append(d)
-    return jsonify(out), 200
+    try:
+        query = date_range_filter(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    archived = include_archived()
+    etag, modified = collection_validators("assets-all" if archived else "assets", "assets",
+                                           *(("archive",) if archived else ()), source=info_export)
+    cached = not_modified(etag, modified)
+    if cached is not None:
+        return cached
+    if archived:
+        cur = assets_export.aggregate([
+            {"$match": query}, {"$project": ASSET_PUBLIC},
+            {"$unionWith": {"coll": ARCHIVE_ASSETS_COLLECTION, "pipeline": [{"$match": query}]}},
+        ])
+    else:
+        cur = assets_export.find(query, ASSET_PUBLIC)
+    items = [present_asset(d) for d in cur]
+    return with_etag(jsonify(items), etag, modified), 200
 
 @app.route("/api/assets/by-reg/<path:registration_number>", methods=["GET"])
 @require_auth
 def get_by_registration(registration_number):
     if not REG_RE.match(registration_number):
         return jsonify({"error": "Not found"}), 404
-    doc = assets.find_one({"registration_number": registration_number})
-    if not doc:
-        return jsonify({"error": "Not found"}), 404
-    doc["_id"] = str(doc["_id"])
-    return jsonify(doc), 200
+    query = {"registration_number": registration_number}
+    return document_response(asset_tier(query), query, "asset", ASSET_PUBLIC, present_asset)
 
 @app.route("/api/assets/<id>", methods=["GET"])
 @require_auth
@@ -573,11 +1814,7 @@ def get_by_id(id):
         oid = ObjectId(id)
     except Exception:
         return jsonify({"error": "Invalid id"}), 400
-    doc = assets.find_one({"_id": oid})
-    if not doc:
-        return jsonify({"error": "Not found"}), 404
-    doc["_id"] = str(doc["_id"])
-    return jsonify(doc), 200
+    return document_response(asset_tier({"_id": oid}), {"_id": oid}, "asset", ASSET_PUBLIC, present_asset)
 
 
 @app.route("/api/assets/update-by-registration/<path:registration_number>", methods=["PUT"])
@@ -595,6 +1832,8 @@ def update_asset_by_reg(registration_number):
             return jsonify({"error": f"Asset with registration number {registration_number} not found"}), 404
             
         return jsonify(updated_asset)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -634,6 +1873,8 @@ def update_asset(id):
         if f in data:
             if f == "verified":
                 update[f] = bool(data[f])
+            elif data[f] is None and (f in ASSET_DATE_FIELDS or f == "rate_per_unit"):
+                update[f] = None  # JSON null clears a typed field
             else:
                 update[f] = str(data[f]).strip()
 
@@ -662,16 +1903,25 @@ def update_asset(id):
 
     if not update:
         return jsonify({"error": "No fields to update"}), 400
+    try:
+        type_asset_fields(update)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     # Load before for diff
-    before = assets.find_one({"_id": oid}) or {}
+    before = assets.find_one({"_id": oid}, ASSET_PUBLIC) or {}
+    fields = dict(update)
+    if before and touches_search(update):
+        fields["_search"] = search_terms({**before, **update})
     updated = assets.find_one_and_update(
         {"_id": oid},
-        {"$set": update},
+        stamp_update({"$set": fields}),
+        projection=ASSET_PUBLIC,
         return_document=ReturnDocument.AFTER,
     )
     if not updated:
         return jsonify({"error": "Not found"}), 404
+    bump_revision("assets")
 
     # Build diff
     changed = {}
@@ -686,8 +1936,7 @@ def update_asset(id):
         ok=True, status=200, institute=updated.get("institute"), department=updated.get("department")
     )
 
-    updated["_id"] = str(updated["_id"])
-    return jsonify(updated), 200
+    return jsonify(present_asset(updated)), 200
 
 # ---------------- Profile API ----------------
 @app.route("/api/auth/profile", methods=["PUT"])
@@ -698,7 +1947,8 @@ def update_profile():
     name = (body.get("name") or "").strip()
     if not name:
         return jsonify({"error": "Name cannot be empty"}), 400
-    users.update_one({"_id": ObjectId(user["_id"])}, {"$set": {"name": name}})
+    users.update_one({"_id": ObjectId(user["_id"])}, {"$set": {"name": name, "name_lc": name.lower()}})
+    cache.delete("users", str(user["_id"]))
     audit_log(audit, request, user, "user.profile_update", ok=True, status=200)
     return jsonify({"name": name}), 200
 
@@ -821,7 +2071,8 @@ def enrich_qr_with_asset(qr_doc):
     out = dict(qr_doc)
     if "asset_id" in qr_doc and isinstance(qr_doc.get("asset_id"), ObjectId):
         aid = qr_doc["asset_id"]
-        asset_doc = assets.find_one({"_id": aid}, {f: 1 for f in ASSET_FIELDS})
+        source = assets_archive if qr_doc.get("archived") else assets
+        asset_doc = present_asset(source.find_one({"_id": aid}, {f: 1 for f in ASSET_FIELDS}))
         if asset_doc:
             for f in ASSET_FIELDS:
                 out[f] = asset_doc.get(f, out.get(f, ""))
@@ -863,25 +2114,62 @@ def qr_list():
         page, size = 1, 25
     skip = (page - 1) * size
 
-    total = qr_registry.count_documents(q)
-    cur = qr_registry.find(q).sort([("created_at", DESCENDING), ("_id", DESCENDING)]).skip(skip).limit(size)
+    # Rows embed asset fields, so asset writes invalidate the page too
+    archived = include_archived()
+    etag, modified = collection_validators("qr-list-all" if archived else "qr-list", "qr", "assets",
+                                           *(("archive",) if archived else ()))
+    cached = not_modified(etag, modified)
+    if cached is not None:
+        return cached
+
+    order = [("created_at", DESCENDING), ("_id", DESCENDING)]
+    if archived:
+        total = qr_registry.count_documents(q) + qr_archive.count_documents(q)
+        cur = qr_registry.aggregate([
+            {"$match": q},
+            {"$unionWith": {"coll": ARCHIVE_QR_COLLECTION, "pipeline": [{"$match": q}]}},
+            {"$sort": dict(order)}, {"$skip": skip}, {"$limit": size},
+        ])
+    else:
+        total = qr_registry.count_documents(q)
+        cur = qr_registry.find(q).sort(order).skip(skip).limit(size)
 
-    items = []
-    for d in cur:
-        d["_id"] = str(d["_id"])
-        items.append(enrich_qr_with_asset(d))
+    items = [enrich_qr_with_asset(d) for d in cur]
 
-    return jsonify({"total": total, "page": page, "size": size, "items": items}), 200
+    resp = jsonify({"total": total, "page": page, "size": size, "items": items})
+    return with_etag(resp, etag, modified), 200
 
 @app.route("/api/qr/by-id/<path:qr_id>", methods=["GET"])
 @require_auth
 def qr_get_by_id(qr_id):
-    doc = qr_registry.find_one({"qr_id": qr_id})
+    # Probe only the validators when the client can take a 304
+    probe_fields = {"asset_id": 1, **VALIDATOR_FIELDS} if wants_revalidation() else None
+    source, linked_source = qr_registry, assets
+    doc = qr_registry.find_one({"qr_id": qr_id}, probe_fields)
+    if not doc and include_archived():
+        source, linked_source = qr_archive, assets_archive
+        doc = qr_archive.find_one({"qr_id": qr_id}, probe_fields)
     if not doc:
         return jsonify({"error": "Not found"}), 404
-    doc["_id"] = str(doc["_id"])
+
+    # The response mirrors the linked asset, so its version is part of the ETag
+    aid = doc.get("asset_id")
+    linked = linked_source.find_one({"_id": aid}, VALIDATOR_FIELDS) if isinstance(aid, ObjectId) else None
+    etag, modified = doc_validators("qr", doc)
+    if linked:
+        etag = f"{etag}-{int(linked.get('version') or 0)}"
+        stamps = [t for t in (modified, _as_utc(linked.get("updated_at"))) if t is not None]
+        modified = max(stamps, default=None)
+    cached = not_modified(etag, modified)
+    if cached is not None:
+        return cached
+
+    if probe_fields is not None:
+        doc = source.find_one({"qr_id": qr_id})
+        if not doc:
+            return jsonify({"error": "Not found"}), 404
     enriched = enrich_qr_with_asset(doc)
-    return jsonify(enriched), 200
+    return with_etag(jsonify(enriched), etag, modified), 200
 
 # Editable fields for bulk QR scan-to-fill
 QR_EDITABLE = {
@@ -922,18 +2210,19 @@ def qr_update_fields(qr_id):
 
     set_used = _has_meaningful_updates(update)
 
-    ops = {"$set": update}
+    ops = {"$set": dict(update)}
     if set_used:
         ops["$set"]["used"] = True
         ops["$set"]["linked_at"] = int(time.time())
 
     doc = qr_registry.find_one_and_update(
         {"qr_id": qr_id},
-        ops,
+        stamp_update(ops),
         return_document=ReturnDocument.AFTER
     )
     if not doc:
         return jsonify({"error": "QR not found"}), 404
+    bump_revision("qr")
 
     # AUDIT (qr update fields)
     audit_log(
@@ -943,7 +2232,6 @@ def qr_update_fields(qr_id):
         ok=True, status=200, institute=doc.get("institute"), department=doc.get("department")
     )
 
-    doc["_id"] = str(doc["_id"])
     enriched = enrich_qr_with_asset(doc)
     return jsonify(enriched), 200
 
@@ -956,11 +2244,12 @@ def qr_link_asset(qr_id, id):
         return jsonify({"error": "Invalid asset id"}), 400
     upd = qr_registry.find_one_and_update(
         {"qr_id": qr_id},
-        {"$set": {"used": True, "asset_id": oid, "linked_at": int(time.time())}},
+        stamp_update({"$set": {"used": True, "asset_id": oid, "linked_at": int(time.time())}}),
         return_document=ReturnDocument.AFTER,
     )
     if not upd:
         return jsonify({"error": "QR not found"}), 404
+    bump_revision("qr")
 
     # AUDIT
     audit_log(
@@ -969,7 +2258,6 @@ def qr_link_asset(qr_id, id):
         ok=True, status=200, institute=upd.get("institute"), department=upd.get("department")
     )
 
-    upd["_id"] = str(upd["_id"])
     enriched = enrich_qr_with_asset(upd)
     return jsonify(enriched), 200
 
@@ -984,10 +2272,15 @@ def delete_asset_by_qrid(qr_id):
     deleted_asset = 0
     aid = qr_doc.get("asset_id")
     if isinstance(aid, ObjectId):
-        res = assets.delete_one({"_id": aid})
-        deleted_asset = res.deleted_count
+        asset_doc = assets.find_one_and_delete({"_id": aid}, projection={"registration_number": 1})
+        if asset_doc:
+            deleted_asset = 1
+            record_tombstones("asset", [asset_doc], "registration_number")
 
     res_qr = qr_registry.delete_one({"_id": qr_doc["_id"]})
+    if res_qr.deleted_count:
+        record_tombstones("qr", [qr_doc], "qr_id")
+    bump_revision("assets", "qr")
 
     # AUDIT
     audit_log(
@@ -1003,9 +2296,11 @@ def delete_asset_by_qrid(qr_id):
 @app.route("/api/qr/by-id/<path:qr_id>", methods=["DELETE"])
 @require_role("Super_Admin", "Admin")
 def delete_qr_only(qr_id):
-    res = qr_registry.delete_one({"qr_id": qr_id})
-    if res.deleted_count == 0:
+    qr_doc = qr_registry.find_one_and_delete({"qr_id": qr_id}, projection={"qr_id": 1})
+    if not qr_doc:
         return jsonify({"error": "Not found"}), 404
+    record_tombstones("qr", [qr_doc], "qr_id")
+    bump_revision("qr")
 
     audit_log(
         audit, request, request.user, "qr.delete",
@@ -1031,8 +2326,13 @@ def delete_asset_by_serial(serial_no):
         audit_log(audit, request, request.user, "asset.delete", resource={"type":"Asset","id": str(aid),"serial_no": serial_no}, ok=False, status=500, error="Delete failed")
         return jsonify({"error": "Asset delete failed"}), 500
 
+    record_tombstones("asset", [asset_doc], "registration_number")
+
     # Delete all QR rows linked to this asset (complete purge)
-    res_q = qr_registry.delete_many({"asset_id": aid})
+    linked_qr = list(qr_registry.find({"asset_id": aid}, {"qr_id": 1}))
+    res_q = qr_registry.delete_many({"_id": {"$in": [q["_id"] for q in linked_qr]}})
+    record_tombstones("qr", linked_qr, "qr_id")
+    bump_revision("assets", "qr")
 
     # AUDIT
     snapshot = {k: asset_doc.get(k) for k in ["serial_no","registration_number","asset_name","category","location","status","institute","department"]}
@@ -1045,7 +2345,934 @@ def delete_asset_by_serial(serial_no):
 
     return jsonify({"deleted_asset": 1, "deleted_qr": int(res_q.deleted_count)}), 200
 
+# --------- Bulk delete (filter / serial range / registration prefix) ----------
+# Send the criteria with "dry_run": true to get the match count and a confirm
+# token, then send them again with that token to delete. Matching assets go
+# in _id-ordered chunks, each with one cascading delete of the linked QR rows.
+# A single audit record carries a gzip'd BSON snapshot of everything removed,
+# which POST /api/assets/bulk-delete/<batch_id>/undo puts back. The record is
+# written before the first delete and each page's snapshot is appended to it
+# before that page goes, so a request that dies partway stays reversible.
+BULK_DELETE_FILTER_FIELDS = {
+    "institute", "department", "category", "status", "asset_name",
+    "building_name", "room_no", "vendor_name", "bill_no", "po_no",
+}
+BULK_DELETE_CHUNK = int(os.getenv("BULK_DELETE_CHUNK", "500"))
+BULK_DELETE_MAX = int(os.getenv("BULK_DELETE_MAX", "10000"))
+# The snapshot lives inside the audit document, which must stay under 16 MB
+BULK_DELETE_SNAPSHOT_MAX_BYTES = int(os.getenv("BULK_DELETE_SNAPSHOT_MAX_BYTES", str(8 * 1024 * 1024)))
+
+def bulk_delete_query(body: dict) -> dict:
+    """Asset filter from the request body; raises ValueError on bad or missing criteria."""
+    q = {}
+    flt = body.get("filter") or {}
+    if not isinstance(flt, dict):
+        raise ValueError("filter must be an object")
+    for key, value in flt.items():
+        if key not in BULK_DELETE_FILTER_FIELDS:
+            raise ValueError(f"Unsupported filter field: {key}")
+        if isinstance(value, (dict, list)):
+            raise ValueError(f"filter.{key} must be a plain value")
+        q[key] = str(value).strip()
+    if body.get("serial_from") is not None or body.get("serial_to") is not None:
+        try:
+            lo = parse_serial(body.get("serial_from", body.get("serial_to")))
+            hi = parse_serial(body.get("serial_to", body.get("serial_from")))
+        except ValueError:
+            raise ValueError("serial_from/serial_to must be integers")
+        if lo > hi:
+            raise ValueError("serial_from must not exceed serial_to")
+        q["serial_no"] = {"$gte": lo, "$lte": hi}
+    prefix = (body.get("registration_prefix") or "").strip()
+    if prefix:
+        q["registration_number"] = {"$regex": "^" + re.escape(prefix)}
+    if not q:
+        raise ValueError("Provide filter, serial_from/serial_to or registration_prefix")
+    return q
+
+def bulk_delete_token(query: dict, count: int) -> str:
+    shape = json.dumps(query, sort_keys=True, default=str)
+    return hashlib.sha1(f"{shape}|{count}".encode("utf-8")).hexdigest()[:16]
+
+@app.route("/api/assets/bulk-delete", methods=["POST"])
+@require_role("Super_Admin", "Admin")
+@limit_workload("import")
+def bulk_delete_assets():
+    """
+    Body: {filter: {field: value}, serial_from, serial_to, registration_prefix,
+    dry_run, confirm}. Criteria combine with AND.
+    """
+    body = request.get_json(silent=True) or {}
+    try:
+        query = bulk_delete_query(body)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    count = assets.count_documents(query)
+    token = bulk_delete_token(query, count)
+    if body.get("dry_run", False) or not body.get("confirm"):
+        sample = list(assets.find(query, {"serial_no": 1, "registration_number": 1, "asset_name": 1})
+                      .sort("_id", ASCENDING).limit(10))
+        return jsonify({"dry_run": True, "matched": count, "confirm": token,
+                        "max": BULK_DELETE_MAX, "sample": sample}), 200
+    if body.get("confirm") != token:
+        return jsonify({"error": "Matching assets changed since the dry run; preview again", "matched": count}), 409
+    if count > BULK_DELETE_MAX:
+        return jsonify({"error": f"Matches {count} assets; narrow the criteria to at most {BULK_DELETE_MAX}"}), 400
+
+    batch_id = uuid.uuid4().hex
+    record = {"action": "asset.bulk_delete", "resource.batch_id": batch_id}
+    progress = {"deleted_assets": 0, "deleted_qr_rows": 0, "truncated": False, "complete": False}
+    audit_log(
+        audit, request, request.user, "asset.bulk_delete",
+        resource={"type": "Asset", "batch_id": batch_id, "criteria": json.dumps(query, default=str)},
+        changes={"after": dict(progress)},
+        ok=True, status=200, institute=query.get("institute"), department=query.get("department"),
+        snapshot=[], severity="warning",
+    )
+    if audit.find_one(record, {"_id": 1}) is None:
+        return jsonify({"error": "Could not record the undo snapshot; nothing was deleted"}), 500
+
+    packed = 0
+    last_id = None
+    try:
+        while True:
+            page_q = dict(query, **({"_id": {"$gt": last_id}} if last_id is not None else {}))
+            docs = list(assets.find(page_q).sort("_id", ASCENDING).limit(BULK_DELETE_CHUNK))
+            if not docs:
+                break
+            last_id = docs[-1]["_id"]
+            ids = [d["_id"] for d in docs]
+            linked = list(qr_registry.find({"asset_id": {"$in": ids}}))
+            chunk = b"".join(bson_encode({"kind": "asset", "doc": d}) for d in docs)
+            chunk += b"".join(bson_encode({"kind": "qr", "doc": d}) for d in linked)
+            # One complete gzip member per page; a page that does not fit is left out whole
+            member = gzip.compress(chunk, mtime=0)
+            if packed + len(member) > BULK_DELETE_SNAPSHOT_MAX_BYTES:
+                progress["truncated"] = True  # this page stays; a follow-up request can delete the rest
+                break
+            audit.update_one(record, {"$push": {"snapshot": Binary(member)}})
+            packed += len(member)
+
+            progress["deleted_assets"] += assets.delete_many({"_id": {"$in": ids}}).deleted_count
+            if linked:
+                progress["deleted_qr_rows"] += qr_registry.delete_many(
+                    {"_id": {"$in": [q["_id"] for q in linked]}}).deleted_count
+            record_tombstones("asset", docs, "registration_number")
+            record_tombstones("qr", linked, "qr_id")
+        progress["complete"] = True
+    finally:
+        if progress["deleted_assets"]:
+            bump_revision("assets", "qr")
+        audit.update_one(record, {"$set": {"changes.after": progress}})
+
+    return jsonify({
+        "deleted_asset": progress["deleted_assets"], "deleted_qr": progress["deleted_qr_rows"],
+        "batch_id": batch_id,
+        "remaining": assets.count_documents(query) if progress["truncated"] else 0,
+    }), 200
+
+@app.route("/api/assets/bulk-delete/<batch_id>/undo", methods=["POST"])
+@require_role("Super_Admin")
+@limit_workload("import")
+def undo_bulk_delete(batch_id):
+    """Re-insert what a bulk delete removed; documents that exist again are skipped."""
+    record = audit.find_one({"action": "asset.bulk_delete", "resource.batch_id": batch_id}, {"snapshot": 1})
+    if not record or not record.get("snapshot"):
+        return jsonify({"error": "Bulk delete not found"}), 404
+    restored = {"asset": [], "qr": []}
+    pages = record["snapshot"] if isinstance(record["snapshot"], list) else [record["snapshot"]]
+    for entry in bson_decode_all(b"".join(gzip.decompress(bytes(p)) for p in pages)):
+        restored[entry["kind"]].append(entry["doc"])
+
+    now = datetime.now(timezone.utc)
+    first = allocate_seq(len(restored["asset"]) + len(restored["qr"])) if any(restored.values()) else 0
+    n = 0
+    for doc in restored["asset"] + restored["qr"]:
+        doc.update({"updated_at": now, "seq": first + n, "version": int(doc.get("version") or 0) + 1})
+        n += 1
+    for doc in restored["asset"]:
+        doc["_search"] = search_terms(doc)
+
+    counts = {}
+    for kind, coll in (("asset", assets), ("qr", qr_registry)):
+        docs = restored[kind]
+        counts[kind] = 0
+        if not docs:
+            continue
+        try:
+            counts[kind] = len(coll.insert_many(docs, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            counts[kind] = e.details.get("nInserted", 0)  # the rest clash with documents written since
+    bump_revision("assets", "qr")
+    audit_log(
+        audit, request, request.user, "asset.bulk_delete.undo",
+        resource={"type": "Asset", "batch_id": batch_id},
+        changes={"after": {"restored_assets": counts["asset"], "restored_qr_rows": counts["qr"],
+                           "skipped": len(restored["asset"]) + len(restored["qr"]) - counts["asset"] - counts["qr"]}},
+        ok=True, status=200
+    )
+    return jsonify({"restored_asset": counts["asset"], "restored_qr": counts["qr"]}), 200
+
+# ---------------- Delta sync ----------------
+SYNC_PAGE_DEFAULT = 500
+SYNC_PAGE_MAX = 5000
+
+def sync_token(seq: int) -> str:
+    """Opaque watermark: "<seq>.<issued unix time>"."""
+    return f"{int(seq)}.{int(time.time())}"
+
+def parse_sync_token(token: str):
+    """(seq, issued_at) from a token; (0, None) for a first sync."""
+    if not token:
+        return 0, None
+    seq, _, issued = token.partition(".")
+    return int(seq), (int(issued) if issued else None)
+
+@app.route("/api/sync/changes", methods=["GET"])
+@require_auth
+def sync_changes():
+    """
+    Assets and QR rows created/updated, and tombstones for rows deleted,
+    after the "since" watermark, in seq order. Clients apply the page and
+    call again with "next"; "has_more" says whether another page is ready.
+    Omit "since" for a full initial load.
+    """
+    try:
+        since, issued_at = parse_sync_token((request.args.get("since") or "").strip())
+        limit = min(SYNC_PAGE_MAX, max(1, int(request.args.get("limit", SYNC_PAGE_DEFAULT))))
+    except ValueError:
+        return jsonify({"error": "Invalid since or limit"}), 400
+
+    # Tombstones expire; an older watermark may have missed deletes
+    if issued_at is not None and issued_at < time.time() - SYNC_TOMBSTONE_TTL_DAYS * 86400:
+        return jsonify({"error": "Sync token expired, full resync required", "reset": True}), 410
+
+    q = {"seq": {"$gt": since}}
+    changes = []
+    for kind, cur in (
+        ("assets", assets.find(q, ASSET_PUBLIC).sort("seq", ASCENDING).limit(limit + 1)),
+        ("qr", qr_registry.find(q).sort("seq", ASCENDING).limit(limit + 1)),
+        ("deleted", tombstones.find(q, {"_id": 0}).sort("seq", ASCENDING).limit(limit + 1)),
+    ):
+        changes.extend((doc["seq"], kind, doc) for doc in cur)
+    changes.sort(key=lambda c: c[0])
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    # Stop before the first change still inside the settle window
+    settled_before = datetime.now(timezone.utc) - timedelta(seconds=SYNC_SETTLE_SECONDS)
+    out = {"assets": [], "qr": [], "deleted": []}
+    watermark = since
+    for seq, kind, doc in changes:
+        stamp = _as_utc(doc.get("deleted_at") if kind == "deleted" else doc.get("updated_at"))
+        if stamp is not None and stamp > settled_before:
+            has_more = False
+            break
+        out[kind].append(present_asset(doc) if kind == "assets" else doc)
+        watermark = seq
+
+    return jsonify({**out, "next": sync_token(watermark), "has_more": has_more}), 200
+
+def backfill_sync_seq(batch_size: int = 1000, log=print) -> int:
+    """
+    Give every asset and QR row written before delta sync existed a seq, in
+    _id order. Resumable: only documents still lacking a seq are touched.
+    """
+    total = 0
+    for name, coll in (("assets", assets), ("qr", qr_registry)):
+        while True:
+            ids = [d["_id"] for d in coll.find({"seq": {"$exists": False}}, {"_id": 1})
+                                          .sort("_id", ASCENDING).limit(batch_size)]
+            if not ids:
+                break
+            first = allocate_seq(len(ids))
+            coll.bulk_write([
+                UpdateOne({"_id": _id, "seq": {"$exists": False}}, {"$set": {"seq": first + i}})
+                for i, _id in enumerate(ids)
+            ], ordered=False)
+            total += len(ids)
+            log(f"{name}: {total} documents sequenced")
+    return total
+
+@app.cli.command("backfill-sync-seq")
+def backfill_sync_seq_command():
+    """Assign delta-sync sequence numbers to pre-existing documents."""
+    backfill_sync_seq()
+
+# ---------------- Archival tier ----------------
+# Assets whose status is in ARCHIVE_STATUSES and that have not been written
+# for ARCHIVE_AFTER_DAYS move, with their QR rows, to the archive collections.
+# The hot collections (and their indexes, filter options and stats) then only
+# hold the working set. Reads opt in with ?include_archived=true; archived
+# documents carry "archived": true and "archived_at" (the Assets page has an
+# "Include archived" toggle). Sync clients see a move as a delete, and a
+# restore as a fresh write. The background mover is opt-in: set
+# ARCHIVE_INTERVAL_HOURS once clients that need archived rows ask for them,
+# or run "flask archive-assets" by hand. Assets without updated_at (written
+# before per-document stamps) are never picked; touch them first if needed.
+ARCHIVE_STATUSES = [s.strip() for s in os.getenv("ARCHIVE_STATUSES", "scrape,damage,inactive").split(",") if s.strip()]
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "180"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVE_INTERVAL_HOURS = float(os.getenv("ARCHIVE_INTERVAL_HOURS", "0"))  # 0 disables the background mover
+ARCHIVE_RUN_FILTER = {"type": "archive_run"}
+
+_archive_thread = None
+_archive_lock = threading.Lock()
+
+def include_archived() -> bool:
+    return (request.args.get("include_archived") or "").strip().lower() in ("1", "true", "yes")
+
+def asset_tier(query):
+    """Collection to read one asset from: the archive only when asked for and not found hot."""
+    if include_archived() and assets.find_one(query, {"_id": 1}) is None:
+        return assets_archive
+    return assets
+
+def archive_candidates_query(now=None):
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=ARCHIVE_AFTER_DAYS)
+    return {
+        "status": {"$in": ARCHIVE_STATUSES},
+        "updated_at": {"$lt": cutoff},  # no timestamp means age unknown: leave it hot
+    }
+
+def move_documents(src, dst, docs, extra=None, drop=()):
+    """
+    Copy docs into dst, then delete them from src only if unchanged since they
+    were read (same version). Copies of documents that changed in between are
+    withdrawn again. Returns the documents that moved.
+    """
+    if not docs:
+        return []
+    copies = [{**{k: v for k, v in d.items() if k not in drop}, **(extra or {})} for d in docs]
+    dst.bulk_write([ReplaceOne({"_id": c["_id"]}, c, upsert=True) for c in copies], ordered=False)
+    ids = [d["_id"] for d in docs]
+    or_ = [{"_id": d["_id"], "version": d.get("version")} for d in docs]
+    src.delete_many({"$or": or_})
+    stayed = {d["_id"] for d in src.find({"_id": {"$in": ids}}, {"_id": 1})}
+    if stayed:
+        dst.delete_many({"_id": {"$in": list(stayed)}})
+    return [d for d in docs if d["_id"] not in stayed]
+
+def archive_assets(batch_size: int = ARCHIVE_BATCH_SIZE, log=None):
+    """Move every asset matching the policy, batch by batch in _id order; returns (assets, qr rows)."""
+    query = archive_candidates_query()
+    last_id, moved_assets, moved_qr = None, 0, 0
+    while True:
+        page_q = dict(query, **({"_id": {"$gt": last_id}} if last_id is not None else {}))
+        docs = list(assets.find(page_q).sort("_id", ASCENDING).limit(batch_size))
+        if not docs:
+            break
+        last_id = docs[-1]["_id"]
+        now = datetime.now(timezone.utc)
+        stamp = {"archived": True, "archived_at": now}
+        moved = move_documents(assets, assets_archive, docs, stamp, drop=("_search",))
+        if not moved:
+            continue
+        qr_rows = list(qr_registry.find({"asset_id": {"$in": [d["_id"] for d in moved]}}))
+        qr_moved = move_documents(qr_registry, qr_archive, qr_rows, stamp)
+        record_tombstones("asset", moved, "registration_number")
+        record_tombstones("qr", qr_moved, "qr_id")
+        bump_revision("assets", "qr", "archive")
+        moved_assets += len(moved)
+        moved_qr += len(qr_moved)
+        if log:
+            log(f"archived {moved_assets} assets, {moved_qr} QR rows")
+    return moved_assets, moved_qr
+
+def restore_asset(oid):
+    """
+    Move one archived asset and its QR rows back to the hot tier; None if not
+    archived. Raises ValueError when a QR row clashes with one issued since.
+    """
+    doc = assets_archive.find_one({"_id": oid})
+    if not doc:
+        return None
+    qr_rows = list(qr_archive.find({"asset_id": oid}))
+    now = datetime.now(timezone.utc)
+    first = allocate_seq(1 + len(qr_rows))
+    for i, row in enumerate([doc] + qr_rows):
+        row.pop("archived", None)
+        row.pop("archived_at", None)
+        row.update({"updated_at": now, "seq": first + i, "version": int(row.get("version") or 0) + 1})
+    doc["_search"] = search_terms(doc)
+    # Insert before deleting so a failure leaves the asset archived, not lost
+    if qr_rows:
+        try:
+            qr_registry.insert_many(qr_rows)  # ordered: stops at the first clash
+        except BulkWriteError as e:
+            inserted = e.details.get("nInserted", 0)
+            if inserted:
+                qr_registry.delete_many({"_id": {"$in": [r["_id"] for r in qr_rows[:inserted]]}})
+            raise ValueError("A QR row with the same qr_id or serial now exists; resolve it before restoring")
+    assets.insert_one(doc)
+    qr_archive.delete_many({"asset_id": oid})
+    assets_archive.delete_one({"_id": oid})
+    bump_revision("assets", "qr", "archive")
+    return doc, qr_rows
+
+def _archive_scheduler():
+    info.update_one(ARCHIVE_RUN_FILTER, {"$setOnInsert": {"next_run_at": datetime.now(timezone.utc)}}, upsert=True)
+    while True:
+        now = datetime.now(timezone.utc)
+        try:
+            # Claiming the run moves next_run_at, so one worker per interval does the pass
+            claimed = info.find_one_and_update(
+                {**ARCHIVE_RUN_FILTER, "next_run_at": {"$lte": now}},
+                {"$set": {"next_run_at": now + timedelta(hours=ARCHIVE_INTERVAL_HOURS), "started_at": now}},
+            )
+            if claimed:
+                moved_assets, moved_qr = archive_assets()
+                info.update_one(ARCHIVE_RUN_FILTER, {"$set": {
+                    "finished_at": datetime.now(timezone.utc), "assets": moved_assets, "qr": moved_qr}})
+        except Exception:
+            app.logger.exception("archive pass failed")
+        time.sleep(min(3600, ARCHIVE_INTERVAL_HOURS * 3600))
+
+@app.before_request
+def _ensure_archive_scheduler():
+    global _archive_thread
+    if ARCHIVE_INTERVAL_HOURS <= 0 or (_archive_thread is not None and _archive_thread.is_alive()):
+        return
+    with _archive_lock:
+        if _archive_thread is None or not _archive_thread.is_alive():
+            _archive_thread = threading.Thread(target=_archive_scheduler, name="archive-mover", daemon=True)
+            _archive_thread.start()
+
+@app.route("/api/archive/run", methods=["POST"])
+@require_role("Super_Admin")
+@limit_workload("import")
+def run_archive():
+    """Run an archival pass now with the configured policy."""
+    moved_assets, moved_qr = archive_assets()
+    audit_log(
+        audit, request, request.user, "archive.run",
+        resource={"type": "Archive", "statuses": ARCHIVE_STATUSES, "after_days": ARCHIVE_AFTER_DAYS},
+        changes={"assets": moved_assets, "qr": moved_qr},
+        ok=True, status=200
+    )
+    return jsonify({"archived_assets": moved_assets, "archived_qr": moved_qr}), 200
+
+@app.route("/api/archive/assets/<id>/restore", methods=["POST"])
+@require_role("Super_Admin", "Admin")
+def restore_archived_asset(id):
+    try:
+        oid = ObjectId(id)
+    except Exception:
+        return jsonify({"error": "Invalid id"}), 400
+    try:
+        restored = restore_asset(oid)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    if restored is None:
+        return jsonify({"error": "Archived asset not found"}), 404
+    doc, qr_rows = restored
+    audit_log(
+        audit, request, request.user, "archive.restore",
+        resource={"type": "Asset", "id": id, "registration_number": doc.get("registration_number")},
+        changes={"qr": [r.get("qr_id") for r in qr_rows]},
+        ok=True, status=200
+    )
+    return jsonify({"asset": present_asset(doc), "qr_restored": len(qr_rows)}), 200
+
+@app.cli.command("archive-assets")
+@click.option("--batch-size", default=ARCHIVE_BATCH_SIZE, show_default=True)
+def archive_assets_command(batch_size):
+    """Move assets matching the archival policy (and their QR rows) to the archive tier."""
+    moved_assets, moved_qr = archive_assets(batch_size, log=click.echo)
+    click.echo(f"done: {moved_assets} assets, {moved_qr} QR rows")
+
+# ---------------- Offline scan bundle ----------------
+# Verifiers download everything a scan needs for one scope up front, scan
+# offline against it, then upload the queued verifications in one request.
+SCAN_BUNDLE_CACHE_SIZE = int(os.getenv("SCAN_BUNDLE_CACHE_SIZE", "32"))
+SCAN_UPLOAD_MAX = int(os.getenv("SCAN_UPLOAD_MAX", "2000"))
+SCAN_ASSET_FIELDS = [
+    "registration_number", "serial_no", "asset_name", "category", "status",
+    "institute", "department", "room_no", "building_name",
+    "assigned_type", "assigned_faculty_name",
+    "verified", "verified_by", "verification_date", "version",
+]
+SCAN_QR_FIELDS = [
+    "asset_id", "used", "asset_name", "category", "status",
+    "verified", "verified_by", "verification_date", "version",
+]
+# Fields a verifier may set from the field; anything else needs the full form
+SCAN_UPLOAD_FIELDS = {"status", "remarks", "room_no", "building_name", "verified_by", "verification_date"}
+ASSET_STATUSES = {"active", "inactive", "repair", "scrape", "damage"}
+
+_scan_bundles = {}  # scope -> (fingerprint, etag, gzipped body), oldest first
+_scan_bundles_lock = threading.Lock()
+
+def scan_scope_queries(institute, department, building):
+    asset_q = {"institute": institute}
+    qr_q = {"institute": institute.upper()}
+    if department:
+        asset_q["department"] = department
+        qr_q["department"] = department.upper()
+    if building:
+        asset_q["building_name"] = building
+    return asset_q, qr_q
+
+def scope_fingerprint(coll, q):
+    """(count, newest seq) - changes on any insert, update, delete or move."""
+    newest = coll.find_one(q, {"seq": 1}, sort=[("seq", DESCENDING)])
+    return coll.count_documents(q), (newest or {}).get("seq")
+
+def build_scan_bundle(scope, asset_q, qr_q):
+    # Unlinked QR rows only exist on QR cards scoped by institute/department
+    asset_rows = {
+        d.pop("registration_number"): {**present_asset(d), "_id": str(d["_id"])}
+        for d in assets.find(asset_q, {f: 1 for f in SCAN_ASSET_FIELDS})
+        if d.get("registration_number")
+    }
+    qr_rows = {d.pop("qr_id"): d for d in qr_registry.find(qr_q, {"_id": 0, "qr_id": 1, **{f: 1 for f in SCAN_QR_FIELDS}})}
+    body = {
+        "scope": scope,
+        "generated_at": datetime.now(timezone.utc),
+        "assets": asset_rows,
+        "qr": qr_rows,
+    }
+    return gzip.compress(app.json.dumps(body).encode("utf-8"), COMPRESS_GZIP_LEVEL)
+
+@app.route("/api/scan/bundle", methods=["GET"])
+@require_role("Super_Admin", "Admin", "Verifier")
+@limit_workload("export")
+def scan_bundle():
+    """
+    Snapshot of scan-relevant fields for institute[/department][/building]:
+    assets keyed by registration_number, QR rows keyed by qr_id. Built once
+    per scope and served gzipped from memory until the scope's documents change.
+    """
+    institute = (request.args.get("institute") or "").strip()
+    department = (request.args.get("department") or "").strip()
+    building = (request.args.get("building") or "").strip()
+    if not institute:
+        return jsonify({"error": "institute is required"}), 400
+
+    scope = {"institute": institute, "department": department or None, "building": building or None}
+    asset_q, qr_q = scan_scope_queries(institute, department, building)
+    key = (institute, department, building)
+    fingerprint = (scope_fingerprint(assets, asset_q), scope_fingerprint(qr_registry, qr_q))
+
+    with _scan_bundles_lock:
+        cached = _scan_bundles.get(key)
+    if cached is None or cached[0] != fingerprint:
+        data = build_scan_bundle(scope, asset_q, qr_q)
+        etag = "bundle-" + hashlib.sha1(repr((key, fingerprint)).encode("utf-8")).hexdigest()[:16]
+        cached = (fingerprint, etag, data)
+        with _scan_bundles_lock:
+            _scan_bundles.pop(key, None)
+            _scan_bundles[key] = cached
+            while len(_scan_bundles) > SCAN_BUNDLE_CACHE_SIZE:
+                _scan_bundles.pop(next(iter(_scan_bundles)))
+
+    _, etag, data = cached
+    unchanged = not_modified(etag)
+    if unchanged is not None:
+        return unchanged
+    if "gzip" in request.accept_encodings:
+        resp = make_response(data)
+        resp.headers["Content-Encoding"] = "gzip"
+    else:
+        resp = make_response(gzip.decompress(data))
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.mimetype = "application/json"
+    return with_etag(resp, etag), 200
+
+def resolve_scan_targets(items):
+    """
+    Resolve registration numbers, QR ids and asset ids to documents with one
+    $in query per collection. QR rows linked to an asset resolve to that asset.
+    Returns (assets by reg, QR rows by qr_id, assets by _id).
+    """
+    regs = {str(i["registration_number"]).strip() for i in items if i.get("registration_number")}
+    qr_ids = {str(i["qr_id"]).strip() for i in items if i.get("qr_id") and not i.get("registration_number")}
+    by_qr = {d["qr_id"]: d for d in qr_registry.find({"qr_id": {"$in": list(qr_ids)}})} if qr_ids else {}
+    linked = {d["asset_id"] for d in by_qr.values() if isinstance(d.get("asset_id"), ObjectId)}
+    linked |= {ObjectId(i["asset_id"]) for i in items if ObjectId.is_valid(i.get("asset_id"))}
+    found = list(assets.find({"$or": [{"registration_number": {"$in": list(regs)}},
+                                      {"_id": {"$in": list(linked)}}]})) if (regs or linked) else []
+    by_reg = {d.get("registration_number"): d for d in found}
+    by_id = {d["_id"]: d for d in found}
+    return by_reg, by_qr, by_id
+
+@app.route("/api/scan/verifications", methods=["POST"])
+@require_role("Super_Admin", "Admin", "Verifier")
+def scan_upload_verifications():
+    """
+    Apply verifications queued offline. Body: {"items": [{"registration_number"
+    or "qr_id", "verified_by", optional "verification_date", "base_version"
+    and SCAN_UPLOAD_FIELDS}]}. Items whose document moved past base_version
+    are reported as conflicts and not applied.
+    """
+    body = request.get_json(silent=True) or {}
+    items = body.get("items")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "items must be a non-empty list"}), 400
+    if len(items) > SCAN_UPLOAD_MAX:
+        return jsonify({"error": f"At most {SCAN_UPLOAD_MAX} items per upload"}), 400
+    return apply_verifications(items, "scan.batch_verify")
+
+def apply_verifications(items, action):
+    """
+    Shared by the scan upload and /api/verify/batch: resolve every item, mark
+    the targets verified with one version-guarded bulk write per collection and
+    record one aggregated audit entry. Items whose document changed after it
+    was read (the guard matched nothing) are reported as conflicts so the
+    client retries them. Returns the per-item results response.
+    """
+    by_reg, by_qr, by_id = resolve_scan_targets([i for i in items if isinstance(i, dict)])
+    today = datetime.now(timezone.utc).date().isoformat()
+    results = []
+    # (coll, _id) -> one write per document; later items for it merge into it
+    pending = {}
+    now = datetime.now(timezone.utc)
+    first_seq = allocate_seq(len(items))
+
+    for n, item in enumerate(items):
+        if not isinstance(item, dict):
+            results.append({"index": n, "result": "invalid", "reason": "Item must be an object"})
+            continue
+        ref = {k: str(item[k]) for k in ("registration_number", "qr_id", "asset_id") if item.get(k)}
+        if not ref:
+            results.append({"index": n, "result": "invalid", "reason": "No identifier"})
+            continue
+        verified_by = str(item.get("verified_by") or request.user.get("name") or "").strip()
+        update = {k: str(item[k]).strip() for k in SCAN_UPLOAD_FIELDS if k in item and item[k] is not None}
+        update.update(verified=True, verified_by=verified_by,
+                      verification_date=update.get("verification_date") or today)
+        if update.get("status") and update["status"] not in ASSET_STATUSES:
+            results.append({"index": n, **ref, "result": "invalid", "reason": "Unknown status"})
+            continue
+
+        if ref.get("registration_number"):
+            doc, coll = by_reg.get(ref["registration_number"].strip()), "asset"
+        elif ref.get("asset_id"):
+            doc = by_id.get(ObjectId(ref["asset_id"])) if ObjectId.is_valid(ref["asset_id"]) else None
+            coll = "asset"
+        else:
+            doc = by_qr.get(str(ref.get("qr_id") or "").strip())
+            coll = "qr"
+            if doc and isinstance(doc.get("asset_id"), ObjectId) and doc["asset_id"] in by_id:
+                doc, coll = by_id[doc["asset_id"]], "asset"
+            elif doc:
+                update["used"] = True
+        if not doc:
+            results.append({"index": n, **ref, "result": "not_found"})
+            continue
+
+        current = int(doc.get("version") or 0)
+        try:
+            base = None if item.get("base_version") is None else int(item["base_version"])
+        except (TypeError, ValueError):
+            results.append({"index": n, **ref, "result": "invalid", "reason": "base_version must be an integer"})
+            continue
+        if base is not None and base != current:
+            results.append({"index": n, **ref, "result": "conflict", "version": current})
+            continue
+        if coll == "asset":
+            try:
+                type_asset_fields(update)
+            except ValueError as e:
+                results.append({"index": n, **ref, "result": "invalid", "reason": str(e)})
+                continue
+        entry = pending.get((coll, doc["_id"]))
+        if entry is None:
+            # Guard on the version seen here so a concurrent edit is not overwritten
+            entry = pending[(coll, doc["_id"])] = {"guard": doc.get("version"), "set": {}, "results": []}
+            doc["version"] = current + 1  # later items for the same doc build on this one
+        entry["set"].update(update)
+        entry["seq"] = first_seq + n
+        result = {"index": n, **ref, "result": "applied", "target": coll, "id": str(doc["_id"])}
+        entry["results"].append(result)
+        results.append(result)
+
+    written = set()
+    for coll, target in (("asset", assets), ("qr", qr_registry)):
+        entries = {_id: e for (c, _id), e in pending.items() if c == coll}
+        if not entries:
+            continue
+        target.bulk_write([
+            UpdateOne({"_id": _id, "version": e["guard"]}, stamp_update({"$set": e["set"]}, now, e["seq"]))
+            for _id, e in entries.items()
+        ], ordered=False)
+        # A document carries this batch's seq only if its guarded write landed
+        stamped = {d["_id"]: d for d in target.find({"_id": {"$in": list(entries)}}, {"seq": 1, "version": 1})}
+        for _id, e in entries.items():
+            d = stamped.get(_id)
+            if d is not None and d.get("seq") == e["seq"]:
+                written.add(coll)
+                continue
+            for r in e["results"]:
+                r.pop("target")
+                r.pop("id")
+                if d is None:
+                    r["result"] = "not_found"
+                else:
+                    r.update(result="conflict", version=int(d.get("version") or 0))
+
+    applied = sum(1 for r in results if r["result"] == "applied")
+    if written:
+        bump_revision(*[name for name, coll in (("assets", "asset"), ("qr", "qr")) if coll in written])
+
+    counts = {}
+    for r in results:
+        counts[r["result"]] = counts.get(r["result"], 0) + 1
+    audit_log(
+        audit, request, request.user, action,
+        resource={"type": "Asset"},
+        changes={"after": {**counts, "written": applied,
+                           "sample": [r.get("registration_number") or r.get("qr_id") or r.get("asset_id")
+                                      for r in results[:50]]}},
+        ok=True, status=200
+    )
+    return jsonify({"counts": counts, "written": applied, "results": results}), 200
+
+def identifier_ref(ident: str) -> dict:
+    """Classify a scanned identifier as registration number, asset id or QR id."""
+    if REG_RE.match(ident):
+        return {"registration_number": ident}
+    if ObjectId.is_valid(ident):
+        return {"asset_id": ident}
+    return {"qr_id": ident}
+
+def scan_date(value):
+    """YYYY-MM-DD from an ISO date/timestamp; None when absent. Raises ValueError."""
+    if not value:
+        return None
+    return datetime.fromisoformat(str(value).strip().replace("Z", "+00:00")).date().isoformat()
+
+@app.route("/api/verify/batch", methods=["POST"])
+@require_role("Super_Admin", "Admin", "Verifier")
+def verify_batch():
+    """
+    Verify a scanner queue in one request. Body: {"ids": [...], optional
+    "verified_by" and "scanned_at"}. Each id is a registration number, QR id
+    or asset ObjectId, or an object {"id", "verified_by", "scanned_at"}
+    overriding the batch defaults.
+    """
+    body = request.get_json(silent=True) or {}
+    entries = body.get("ids")
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"error": "ids must be a non-empty list"}), 400
+    if len(entries) > SCAN_UPLOAD_MAX:
+        return jsonify({"error": f"At most {SCAN_UPLOAD_MAX} ids per batch"}), 400
+
+    items = []
+    for n, entry in enumerate(entries):
+        entry = entry if isinstance(entry, dict) else {"id": entry}
+        try:
+            day = scan_date(entry.get("scanned_at") or body.get("scanned_at"))
+        except ValueError:
+            return jsonify({"error": f"ids[{n}]: scanned_at must be an ISO date or timestamp"}), 400
+        item = identifier_ref(str(entry.get("id") or "").strip()) if entry.get("id") else {}
+        item["verified_by"] = entry.get("verified_by") or body.get("verified_by")
+        if day:
+            item["verification_date"] = day
+        items.append(item)
+    return apply_verifications(items, "verify.batch")
+
+# ---------------- Room inventory & reconciliation ----------------
+ROOM_ITEM_FIELDS = {
+    "registration_number": 1, "serial_no": 1, "asset_name": 1, "category": 1, "status": 1,
+    "institute": 1, "department": 1, "building_name": 1, "room_no": 1,
+    "verified": 1, "verified_by": 1, "verification_date": 1, "version": 1,
+}
+
+def room_query(institute, building, room=None):
+    q = {"building_name": building}
+    if room:
+        q["room_no"] = room
+    if institute:
+        q["institute"] = institute
+    return q
+
+@app.route("/api/rooms/inventory", methods=["GET"])
+@require_role("Super_Admin", "Admin", "Verifier")
+def room_inventory():
+    """
+    What should be in a room: ?building=&room=[&institute=] lists its assets.
+    Without room, summarises every room of the building (total/verified).
+    """
+    institute = (request.args.get("institute") or "").strip()
+    building = (request.args.get("building") or "").strip()
+    room = (request.args.get("room") or "").strip()
+    if not building:
+        return jsonify({"error": "building is required"}), 400
+
+    if room:
+        items = [present_asset(d) for d in assets.find(room_query(institute, building, room), ROOM_ITEM_FIELDS)
+                                               .sort("serial_no", ASCENDING)]
+        return jsonify({"building": building, "room": room, "total": len(items), "items": items}), 200
+
+    rooms = list(assets.aggregate([
+        {"$match": room_query(institute, building)},
+        {"$group": {
+            "_id": "$room_no",
+            "total": {"$sum": 1},
+            "verified": {"$sum": {"$cond": [{"$eq": ["$verified", True]}, 1, 0]}},
+        }},
+        {"$sort": {"_id": 1}},
+    ]))
+    rooms = [{"room": r["_id"], "total": r["total"], "verified": r["verified"]} for r in rooms]
+    return jsonify({"building": building, "rooms": rooms}), 200
+
+@app.route("/api/rooms/reconcile", methods=["POST"])
+@require_role("Super_Admin", "Admin", "Verifier")
+def room_reconcile():
+    """
+    Compare what was scanned in a room against what should be there.
+    Body: {"building", "room", optional "institute", "scanned": [registration
+    numbers or QR ids], "verified_by", "apply": false, "relocate": false}.
+    Returns matched, missing (expected, not scanned), misplaced (scanned,
+    registered elsewhere) and unknown (unresolvable) items. The default is a
+    dry run; only with "apply": true is every scanned asset marked verified
+    (misplaced ones also moved here when relocate is set) in a single bulk write.
+    """
+    body = request.get_json(silent=True) or {}
+    institute = str(body.get("institute") or "").strip()
+    building = str(body.get("building") or "").strip()
+    room = str(body.get("room") or "").strip()
+    scanned = body.get("scanned")
+    if not building or not room:
+        return jsonify({"error": "building and room are required"}), 400
+    if not isinstance(scanned, list):
+        return jsonify({"error": "scanned must be a list"}), 400
+    if len(scanned) > SCAN_UPLOAD_MAX:
+        return jsonify({"error": f"At most {SCAN_UPLOAD_MAX} scanned codes per room"}), 400
+
+    codes = list(dict.fromkeys(str(c).strip() for c in scanned if str(c or "").strip()))
+    refs = [{"registration_number": c} if REG_RE.match(c) else {"qr_id": c} for c in codes]
+    by_reg, by_qr, by_id = resolve_scan_targets(refs)
+
+    found, unknown = {}, []
+    for code, ref in zip(codes, refs):
+        if "registration_number" in ref:
+            doc = by_reg.get(code)
+        else:
+            aid = (by_qr.get(code) or {}).get("asset_id")
+            doc = by_id.get(aid) if isinstance(aid, ObjectId) else None
+        if doc:
+            found[doc["_id"]] = doc
+        else:
+            unknown.append(code)
+
+    expected = {d["_id"]: d for d in assets.find(room_query(institute, building, room), ROOM_ITEM_FIELDS)}
+    matched_ids = expected.keys() & found.keys()
+    missing_ids = expected.keys() - found.keys()
+    misplaced_ids = found.keys() - expected.keys()
+
+    def brief(d):
+        return {k: d.get(k) for k in ("_id", "registration_number", "asset_name", "building_name", "room_no")}
+
+    written = 0
+    apply = body.get("apply") is True  # anything else is a dry run
+    if apply and found:
+        verified_by = str(body.get("verified_by") or request.user.get("name") or "").strip()
+        today = parse_date_field(datetime.now(timezone.utc).date())
+        now = datetime.now(timezone.utc)
+        first_seq = allocate_seq(len(found))
+        ops = []
+        for n, aid in enumerate(found):
+            fields = {"verified": True, "verified_by": verified_by, "verification_date": today}
+            if aid in misplaced_ids and body.get("relocate"):
+                fields.update(building_name=building, room_no=room)
+            ops.append(UpdateOne({"_id": aid}, stamp_update({"$set": fields}, now, first_seq + n)))
+        written = assets.bulk_write(ops, ordered=False).modified_count
+        bump_revision("assets")
+
+    summary = {"matched": len(matched_ids), "missing": len(missing_ids),
+               "misplaced": len(misplaced_ids), "unknown": len(unknown), "written": written}
+    audit_log(
+        audit, request, request.user, "room.reconcile",
+        resource={"type": "Room", "building_name": building, "room_no": room},
+        changes={"after": summary},
+        ok=True, status=200, institute=institute or None
+    )
+    def listing(docs, ids):
+        return sorted((brief(docs[i]) for i in ids), key=lambda d: d.get("registration_number") or "")
+
+    return jsonify({
+        "building": building, "room": room, "dry_run": not apply, "counts": summary,
+        "matched": listing(found, matched_ids),
+        "missing": listing(expected, missing_ids),
+        "misplaced": listing(found, misplaced_ids),
+        "unknown": unknown,
+    }), 200
+
+# ---------------- Asset search ----------------
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "1000"))
+
+@app.route("/api/assets/search", methods=["GET"])
+@require_auth
+def search_assets():
+    """
+    Prefix search over SEARCH_FIELDS: every term of q must prefix-match some
+    token of the asset. Results rank exact token matches first, then newest
+    serial. Optional institute/department filters; page/size pagination.
+    At most SEARCH_CANDIDATES matches are ranked, "capped" says when a query
+    matched more (narrow it to see the rest).
+    """
+    terms = [t for t in dict.fromkeys(search_tokens(request.args.get("q") or "")) if len(t) >= SEARCH_GRAM_MIN]
+    if not terms:
+        return jsonify({"error": f"q must contain a term of at least {SEARCH_GRAM_MIN} characters"}), 400
+    try:
+        page = max(1, int(request.args.get("page", 1)))
+        size = min(100, max(1, int(request.args.get("size", 25))))
+    except Exception:
+        page, size = 1, 25
+
+    # Longest term first: its gram is the most selective index bound
+    terms.sort(key=len, reverse=True)
+    match = {"_search.grams": {"$all": [t[:SEARCH_GRAM_MAX] for t in terms]}}
+    long_terms = [t for t in terms if len(t) > SEARCH_GRAM_MAX]
+    if long_terms:
+        match["$and"] = [{"_search.tokens": {"$regex": f"^{re.escape(t)}"}} for t in long_terms]
+    for field in ("institute", "department"):
+        value = (request.args.get(field) or "").strip()
+        if value:
+            match[field] = value
+
+    result = next(assets.aggregate([
+        {"$match": match},
+        {"$limit": SEARCH_CANDIDATES + 1},
+        {"$addFields": {"score": {"$size": {"$filter": {
+            "input": "$_search.tokens", "cond": {"$in": ["$$this", {"$literal": terms}]}}}}}},
+        {"$sort": {"score": -1, "serial_no": -1}},
+        {"$facet": {
+            "total": [{"$count": "n"}],
+            "items": [{"$skip": (page - 1) * size}, {"$limit": size}, {"$project": {"_search": 0}}],
+        }},
+    ]), {"total": [], "items": []})
+    total = result["total"][0]["n"] if result["total"] else 0
+    capped = total > SEARCH_CANDIDATES
+    return jsonify({
+        "q": request.args.get("q"), "page": page, "size": size,
+        "total": min(total, SEARCH_CANDIDATES), "capped": capped,
+        "items": [present_asset(d) for d in result["items"]],
+    }), 200
+
+@app.cli.command("reindex-search")
+@click.option("--all", "rebuild_all", is_flag=True, help="Rebuild every asset, not only ones missing terms.")
+@click.option("--batch-size", default=1000, show_default=True)
+def reindex_search_command(rebuild_all, batch_size):
+    """Build asset search terms; resumable, processes _id order in batches."""
+    q = {} if rebuild_all else {"_search": {"$exists": False}}
+    last_id, done = None, 0
+    while True:
+        page_q = dict(q, **({"_id": {"$gt": last_id}} if last_id is not None else {}))
+        docs = list(assets.find(page_q, {f: 1 for f in SEARCH_FIELDS}).sort("_id", ASCENDING).limit(batch_size))
+        if not docs:
+            break
+        assets.bulk_write([UpdateOne({"_id": d["_id"]}, {"$set": {"_search": search_terms(d)}}) for d in docs],
+                          ordered=False)
+        last_id, done = docs[-1]["_id"], done + len(docs)
+        click.echo(f"{done} assets indexed")
+
 # ---------------- Audit READ APIs (Super Admin) ----------------
+AUDIT_PUBLIC = {"snapshot": 0}
+
 def _parse_bool(s):
     return True if str(s).lower() == "true" else False if str(s).lower() == "false" else None
 
@@ -1098,13 +3325,10 @@ def audit_list():
         page, size = 1, 25
     skip = (page - 1) * size
 
-    total = audit.count_documents(q)
-    cur = audit.find(q).sort([("ts", DESCENDING)]).skip(skip).limit(size)
+    total = audit_reader.count_documents(q)
+    cur = audit_reader.find(q, AUDIT_PUBLIC).sort([("ts", DESCENDING)]).skip(skip).limit(size)
 
-    items = []
-    for d in cur:
-        d["_id"] = str(d["_id"])
-        items.append(d)
+    items = list(cur)
 
     return jsonify({"total": total, "page": page, "size": size, "items": items}), 200
 
@@ -1115,19 +3339,18 @@ def audit_get_one(id):
         oid = ObjectId(id)
     except Exception:
         return jsonify({"error": "Invalid id"}), 400
-    doc = audit.find_one({"_id": oid})
+    doc = audit_reader.find_one({"_id": oid}, AUDIT_PUBLIC)
     if not doc:
         return jsonify({"error": "Not found"}), 404
-    doc["_id"] = str(doc["_id"])
     return jsonify(doc), 200
 
 
 @app.route("/api/assets/max-serial", methods=["GET"])
 def get_max_serial():
     try:
-        # ensure 'assets' is a valid collection object
-        doc = assets.find_one({"serial_no": {"$exists": True}}, sort=[("serial_no", -1)])
-        max_serial = int(doc["serial_no"]) if doc and "serial_no" in doc else 0
+        # Preview only: the counter is not advanced until assets are created
+        counter = info.find_one(ASSET_SERIAL_FILTER, {"value": 1}) or {}
+        max_serial = max(int(counter.get("value") or 0), highest_asset_serial())
         return jsonify({"next_serial": max_serial + 1}), 200
     except Exception as e:
         app.logger.exception("Error computing max serial")
@@ -1135,6 +3358,7 @@ def get_max_serial():
 
 
 @app.route("/api/assets/bulk-update-by-serial", methods=["POST"])
+@limit_workload("import")
 def bulk_update_by_serial():
     updates = request.get_json(silent=True) or []
     allowed_fields = [
@@ -1174,18 +3398,31 @@ def bulk_update_by_serial():
             assign_date = datetime.now().strftime("%Y-%m-%d")
         update_fields["assign_date"] = assign_date
 
+        try:
+            asset_fields = type_asset_fields(dict(update_fields))
+        except ValueError as e:
+            results.append({"serial_no": serial_no, "matched": 0, "modified": 0, "skipped": True, "reason": str(e)})
+            continue
+
         matched, modified = 0, 0
 
-        # Update in Assets collection
-        asset_result = assets.update_one(
-            {"serial_no": serial_no}, {"$set": update_fields}
-        )
-        matched += asset_result.matched_count
-        modified += asset_result.modified_count
+        # Update in Assets collection (int serials; QR rows use "U01"-style strings)
+        try:
+            asset_serial = parse_serial(serial_no)
+        except ValueError:
+            asset_serial = None
+        if asset_serial is not None:
+            asset_result = assets.update_one(
+                {"serial_no": asset_serial}, stamp_update({"$set": asset_fields})
+            )
+            matched += asset_result.matched_count
+            modified += asset_result.modified_count
+            if asset_result.matched_count and touches_search(update_fields):
+                refresh_search_terms({"serial_no": asset_serial})
 
         # Also update in QrRegistry if needed:
         qr_result = qr_registry.update_one(
-            {"serial_no": serial_no}, {"$set": update_fields}
+            {"serial_no": serial_no}, stamp_update({"$set": dict(update_fields)})
         )
         matched += qr_result.matched_count
         modified += qr_result.modified_count
@@ -1196,13 +3433,16 @@ def bulk_update_by_serial():
             "modified": modified,
             "skipped": False
         })
+    if any(r["matched"] for r in results):
+        bump_revision("assets", "qr")
     return jsonify({"updated": results}), 200
 
 
 @app.route('/api/assets/single-import', methods=['POST'])
+@limit_workload("import")
 def import_excel_single():
     asset_data = request.get_json(silent=True) or {}
-    print('DEBUG: Received asset_data:', asset_data)
+    app.logger.debug("single-import received: %s", asset_data)
 
     serial_no = asset_data.get("serial_no")
     try:
@@ -1210,8 +3450,7 @@ def import_excel_single():
     except ValueError:
         serial_no = None
     verified_by = (asset_data.get("verified_by") or "").strip()
-    print('DEBUG: serial_no:', serial_no)
-    print('DEBUG: verified_by:', verified_by)
+    app.logger.debug("single-import serial_no=%s verified_by=%s", serial_no, verified_by)
 
     if not serial_no or not verified_by:
         return jsonify({"skipped": True, "reason": "Missing serial_no or verified_by"}), 200
@@ -1234,30 +3473,49 @@ def import_excel_single():
     update_fields["verified_by"] = verified_by
     update_fields["verified"] = True
     update_fields["verification_date"] = verification_date
-
-    result = assets.update_one({"serial_no": serial_no}, {"$set": update_fields})
-    print('DEBUG: update_one matched:', result.matched_count, 'modified:', result.modified_count)
+    try:
+        type_asset_fields(update_fields)
+    except ValueError as e:
+        return jsonify({"serial_no": serial_no, "skipped": True, "reason": str(e)}), 200
+
+    result = assets.update_one({"serial_no": serial_no}, stamp_update({"$set": update_fields}))
+    if result.matched_count:
+        if touches_search(update_fields):
+            refresh_search_terms({"serial_no": serial_no})
+        bump_revision("assets")
+    app.logger.debug("single-import matched=%s modified=%s", result.matched_count, result.modified_count)
     return jsonify({"serial_no": serial_no, "updated": bool(result.modified_count), "skipped": False}), 200
 
 # ---------------- Graph Analytics API ----------------
 # ==================== GRAPH ANALYTICS ENDPOINTS ====================
 
+FILTER_OPTIONS_CACHE_TTL = float(os.getenv("FILTER_OPTIONS_CACHE_TTL", "300"))
+
 @app.route('/api/assets/filter-options', methods=['GET'])
 @require_role("Super_Admin", "Admin", "Faculty", "Verifier")
+@limit_workload("analytics")
 def get_filter_options():
     """
     Get unique values for filter dropdowns
     Returns distinct values for all filterable fields
     """
+    etag, modified = collection_validators("filter-options", "assets", source=info_analytics)
+    cached = not_modified(etag, modified)
+    if cached is not None:
+        return cached
+    hit = cache.get("assets", "filter-options")
+    if hit and hit[0] == etag:
+        return with_etag(jsonify(hit[1]), etag, modified), 200
+
     try:
         # Get distinct values for each filter field
-        institutes = assets.distinct('institute')
-        departments = assets.distinct('department')
-        categories = assets.distinct('category')
-        statuses = assets.distinct('status')
-        asset_names = assets.distinct('asset_name')
-        assigned_types = assets.distinct('assigned_type')
-        locations = assets.distinct('location')
+        institutes = assets_analytics.distinct('institute')
+        departments = assets_analytics.distinct('department')
+        categories = assets_analytics.distinct('category')
+        statuses = assets_analytics.distinct('status')
+        asset_names = assets_analytics.distinct('asset_name')
+        assigned_types = assets_analytics.distinct('assigned_type')
+        locations = assets_analytics.distinct('location')
         
         # Filter out None, empty strings, and sort
         institutes = sorted([i for i in institutes if i and i.strip()])
@@ -1268,7 +3526,7 @@ def get_filter_options():
         assigned_types = sorted([t for t in assigned_types if t and t.strip()])
         locations = sorted([l for l in locations if l and l.strip()])
         
-        return jsonify({
+        payload = {
             'success': True,
             'institutes': institutes,
             'departments': departments,
@@ -1277,10 +3535,14 @@ def get_filter_options():
             'asset_names': asset_names,
             'assigned_types': assigned_types,
             'locations': locations
-        }), 200
+        }
+        cache.set("assets", "filter-options", (etag, payload), FILTER_OPTIONS_CACHE_TTL)
+        return with_etag(jsonify(payload), etag, modified), 200
         
     except Exception as e:
-        print(f"Error fetching filter options: {e}")
+        if deadline_exceeded(e):
+            raise  # limit_workload answers 503
+        app.logger.exception("Error fetching filter options")
         return jsonify({
             'success': False,
             'error': 'Failed to fetch filter options'
@@ -1289,6 +3551,7 @@ def get_filter_options():
 
 @app.route('/api/assets/stats', methods=['GET'])
 @require_role("Super_Admin", "Admin")
+@limit_workload("analytics")
 def get_asset_stats():
     """
     Get aggregated asset statistics for graph visualization
@@ -1319,41 +3582,56 @@ def get_asset_stats():
         match_stage['assigned_type'] = assigned_type
     if location:
         match_stage['location'] = location
+    try:
+        match_stage.update(date_range_filter(request.args))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    # Validators are read before the aggregations, from the same read handle
+    etag, modified = collection_validators("stats", "assets", source=info_analytics)
+    cached = not_modified(etag, modified)
+    if cached is not None:
+        audit_log(
+            audit, request, request.user, "stats.view",
+            resource={"type": "Stats", "filters": match_stage or None},
+            ok=True, status=304
+        )
+        return cached
     
     try:
         # 1. Total asset count
-        total_assets = assets.count_documents(match_stage)
+        total_assets = assets_analytics.count_documents(match_stage)
         
         # 2. Assets grouped by Category
-        by_category = list(assets.aggregate([
+        by_category = list(assets_analytics.aggregate([
             {'$match': match_stage},
             {'$group': {'_id': '$category', 'count': {'$sum': 1}}},
             {'$sort': {'count': -1}}
         ]))
         
         # 3. Assets grouped by Status
-        by_status = list(assets.aggregate([
+        by_status = list(assets_analytics.aggregate([
             {'$match': match_stage},
             {'$group': {'_id': '$status', 'count': {'$sum': 1}}},
             {'$sort': {'count': -1}}
         ]))
         
         # 4. Assets grouped by Department
-        by_department = list(assets.aggregate([
+        by_department = list(assets_analytics.aggregate([
             {'$match': match_stage},
             {'$group': {'_id': '$department', 'count': {'$sum': 1}}},
             {'$sort': {'count': -1}}
         ]))
         
         # 5. Assets grouped by Institute
-        by_institute = list(assets.aggregate([
+        by_institute = list(assets_analytics.aggregate([
             {'$match': match_stage},
             {'$group': {'_id': '$institute', 'count': {'$sum': 1}}},
             {'$sort': {'count': -1}}
         ]))
         
         # 6. Assets grouped by Location (top 10)
-        by_location = list(assets.aggregate([
+        by_location = list(assets_analytics.aggregate([
             {'$match': match_stage},
             {'$group': {'_id': '$location', 'count': {'$sum': 1}}},
             {'$sort': {'count': -1}},
@@ -1361,11 +3639,11 @@ def get_asset_stats():
         ]))
         
         # 7. Verified vs Unverified count
-        verified_count = assets.count_documents({**match_stage, 'verified': True})
-        unverified_count = assets.count_documents({**match_stage, 'verified': {'$ne': True}})
+        verified_count = assets_analytics.count_documents({**match_stage, 'verified': True})
+        unverified_count = assets_analytics.count_documents({**match_stage, 'verified': {'$ne': True}})
         
         # 8. FIXED: Assets by Assigned Type - ONLY for SINGLE assets (without serial_no)
-        by_assigned_type = list(assets.aggregate([
+        by_assigned_type = list(assets_analytics.aggregate([
             {'$match': match_stage},
             {'$group': {'_id': '$assigned_type', 'count': {'$sum': 1}}},
             {'$sort': {'count': -1}}
@@ -1373,48 +3651,13 @@ def get_asset_stats():
 
 
         # Assets grouped by asset_name (e.g., Chair, Table, etc.)
-        by_asset = list(assets.aggregate([
+        by_asset = list(assets_analytics.aggregate([
             {'$match': match_stage},
             {'$group': {'_id': '$asset_name', 'count': {'$sum': 1}}},
             {'$sort': {'count': -1}}
         ]))
 
         
-        # 9. SIMPLIFIED: Total assets added per date (no single/bulk breakdown)
-        try:
-            assets_by_date = list(assets.aggregate([
-                {'$match': match_stage},
-                {
-                    '$project': {
-                        'date': {
-                            '$cond': {
-                                # Check if assign_date exists and is not empty
-                                'if': {'$and': [
-                                    {'$ne': [{'$type': '$assign_date'}, 'missing']},
-                                    {'$ne': ['$assign_date', '']},
-                                    {'$ne': ['$assign_date', None]}
-                                ]},
-                                'then': '$assign_date',  # Use assign_date directly (YYYY-MM-DD format)
-                                'else': '1970-01-01'  # Default date for assets without assign_date
-                            }
-                        }
-                    }
-                },
-                # Filter out default dates
-                {'$match': {'date': {'$ne': '1970-01-01'}}},
-                {
-                    '$group': {
-                        '_id': '$date',  # Group only by date, not by type
-                        'count': {'$sum': 1}
-                    }
-                },
-                {'$sort': {'_id': 1}}  # Sort by date ascending
-            ]))
-        except Exception as date_error:
-            print(f"Error in assets_by_date aggregation: {date_error}")
-            import traceback
-            traceback.print_exc()
-            assets_by_date = []
         
         # AUDIT
         # AUDIT - With filter information in resource dictionary
@@ -1432,7 +3675,10 @@ def get_asset_stats():
                     "status": status or None,
                     "asset_name": asset_name or None,
                     "assigned_type": assigned_type or None,
-                    "location": location or None
+                    "location": location or None,
+                    "date_field": request.args.get("date_field") or None,
+                    "date_from": request.args.get("date_from") or None,
+                    "date_to": request.args.get("date_to") or None
                 }
             },
             ok=True, 
@@ -1441,17 +3687,17 @@ def get_asset_stats():
 
 
         
-        return jsonify({
+        return with_etag(jsonify({
             'success': True,
             'by_category': by_category,
             'by_asset': by_asset
-        }), 200
+        }), etag, modified), 200
 
         
     except Exception as e:
-        print(f"Error fetching stats: {e}")
-        import traceback
-        traceback.print_exc()
+        if deadline_exceeded(e):
+            raise  # limit_workload answers 503
+        app.logger.exception("Error fetching stats")
         audit_log(
             audit, request, request.user, "stats.view",
             ok=False, status=500, error=str(e)
@@ -1461,6 +3707,7 @@ def get_asset_stats():
 
 @app.route('/api/assets/bulk-stats', methods=['GET'])
 @require_role("Super_Admin", "Admin")
+@limit_workload("analytics")
 def get_bulk_asset_stats():
     """
     Get aggregated statistics for BULK QR codes from QrRegistry collection
@@ -1477,10 +3724,27 @@ def get_bulk_asset_stats():
         match_stage['institute'] = institute
     if department:
         match_stage['department'] = department
+
+    granularity = (request.args.get('granularity') or 'day').strip()
+    if granularity not in HISTOGRAM_GRANULARITIES:
+        return jsonify({'success': False, 'error': f"granularity must be one of {list(HISTOGRAM_GRANULARITIES)}"}), 400
+    try:
+        start, end = histogram_bounds(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    etag, modified = collection_validators("bulk-stats", "qr", "assets", source=info_analytics)
+    cached = not_modified(etag, modified)
+    if cached is not None:
+        audit_log(
+            audit, request, request.user, "bulk_stats.view",
+            resource={"type": "BulkStats"}, ok=True, status=304
+        )
+        return cached
     
     try:
-        # Access QrRegistry collection
-        qr_registry = db['QrRegistry']
+        # Access QrRegistry collection (analytics read preference)
+        qr_registry = qr_registry_analytics
         
         # 1. Total QR codes count
         total_qr_codes = qr_registry.count_documents(match_stage)
@@ -1510,32 +3774,14 @@ def get_bulk_asset_stats():
             {'$sort': {'count': -1}}
         ]))
         
-        # 5. QR codes by creation date (using created_at timestamp)
+        # 5. QR codes by creation date (?granularity=, date_from/date_to; default per day)
         try:
-            qr_by_date = list(qr_registry.aggregate([
-                {'$match': match_stage},
-                {
-                    '$project': {
-                        'date': {
-                            '$dateToString': {
-                                'format': '%Y-%m-%d',
-                                'date': {'$toDate': {'$multiply': ['$created_at', 1000]}}
-                            }
-                        }
-                    }
-                },
-                {
-                    '$group': {
-                        '_id': '$date',
-                        'count': {'$sum': 1}
-                    }
-                },
-                {'$sort': {'_id': 1}}
-            ]))
+            qr_by_date = [{'_id': b['bucket'], 'count': b['count']} for b in histogram(
+                qr_registry, match_stage, 'created_at', granularity, start, end, epoch=True)]
         except Exception as date_error:
-            print(f"Error in qr_by_date aggregation: {date_error}")
-            import traceback
-            traceback.print_exc()
+            if deadline_exceeded(date_error):
+                raise  # limit_workload answers 503
+            app.logger.exception("Error in qr_by_date aggregation")
             qr_by_date = []
         
         # 6. Link status (Linked/Not Linked) by Institute
@@ -1573,19 +3819,16 @@ def get_bulk_asset_stats():
         # Query Assets collection for these QR IDs to get categories
         by_category = []
         if linked_qr_ids:
-            by_category = list(assets.aggregate([
+            by_category = list(assets_analytics.aggregate([
                 {'$match': {'qr_id': {'$in': linked_qr_ids}}},
                 {'$group': {'_id': '$category', 'count': {'$sum': 1}}},
                 {'$sort': {'count': -1}}
             ]))
         
-        print(f"Bulk Stats Summary:")
-        print(f"  Total QR Codes: {total_qr_codes}")
-        print(f"  Linked: {linked_count}")
-        print(f"  Not Linked: {not_linked_count}")
-        print(f"  By Institute: {by_institute}")
-        print(f"  By Department: {by_department}")
-        print(f"  By Category (linked only): {by_category}")
+        app.logger.debug(
+            "Bulk stats: total=%s linked=%s not_linked=%s by_institute=%s by_department=%s by_category=%s",
+            total_qr_codes, linked_count, not_linked_count, by_institute, by_department, by_category,
+        )
         
         # AUDIT
         audit_log(
@@ -1598,7 +3841,7 @@ def get_bulk_asset_stats():
             status=200
         )
         
-        return jsonify({
+        return with_etag(jsonify({
             'success': True,
             'total_bulk_assets': total_qr_codes,
             'linked_count': linked_count,
@@ -1612,18 +3855,257 @@ def get_bulk_asset_stats():
             'by_category': by_category,
             'assets_by_date': qr_by_date,
             'link_status_by_institute': link_status_by_institute
-        }), 200
+        }), etag, modified), 200
         
     except Exception as e:
-        print(f"Error fetching bulk stats from QrRegistry: {e}")
-        import traceback
-        traceback.print_exc()
+        if deadline_exceeded(e):
+            raise  # limit_workload answers 503
+        app.logger.exception("Error fetching bulk stats from QrRegistry")
         audit_log(
             audit, request, request.user, "bulk_stats.view",
             ok=False, status=500, error=str(e)
         )
         return jsonify({'success': False, 'error': 'Failed to fetch bulk QR statistics'}), 500
 
+# ---------------- Histograms ----------------
+# Time-bucketed counts over an indexed date: the range goes into $match so
+# the index bounds the scan, then $dateTrunc buckets only what matched.
+# A five-year monthly chart is ~60 rows.
+HISTOGRAM_GRANULARITIES = {"day": 1, "week": 7, "month": 30.44, "quarter": 91.31}  # ~days per bucket
+HISTOGRAM_MAX_BUCKETS = int(os.getenv("HISTOGRAM_MAX_BUCKETS", "1000"))
+# source -> (read handle, revision name, date fields); QR timestamps are epoch seconds
+HISTOGRAM_SOURCES = {
+    "assets": (assets_analytics, "assets", ASSET_DATE_FIELDS),
+    "qr": (qr_registry_analytics, "qr", ("created_at",)),
+}
+HISTOGRAM_EPOCH_FIELDS = {("qr", "created_at")}
+
+def histogram_bounds(args):
+    """(start, end exclusive) from ?date_from=&date_to= (inclusive days); None when open."""
+    try:
+        start = parse_date_field(args.get("date_from"))
+        end = parse_date_field(args.get("date_to"))
+    except ValueError:
+        raise ValueError("date_from/date_to must be dates (YYYY-MM-DD)")
+    return start, (end + timedelta(days=1) if end else None)
+
+def _epoch(dt):
+    return int(dt.replace(tzinfo=timezone.utc).timestamp())
+
+def histogram(coll, match, field, granularity, start=None, end=None, epoch=False):
+    """[{"bucket": "YYYY-MM-DD", "count": n}] per granularity bucket of field, oldest first."""
+    bounds = {}
+    if start:
+        bounds["$gte"] = _epoch(start) if epoch else start
+    if end:
+        bounds["$lt"] = _epoch(end) if epoch else end
+    # Range operators only match their own BSON type, so blanks/legacy strings drop out
+    condition = {field: bounds or {"$type": "number" if epoch else "date"}}
+    trunc = {"date": {"$toDate": {"$multiply": [f"${field}", 1000]}} if epoch else f"${field}",
+             "unit": granularity}
+    if granularity == "week":
+        trunc["startOfWeek"] = "monday"
+    rows = coll.aggregate([
+        {"$match": {"$and": [match, condition]} if match else condition},
+        {"$group": {"_id": {"$dateTrunc": trunc}, "count": {"$sum": 1}}},
+        {"$sort": {"_id": 1}},
+    ])
+    return [{"bucket": r["_id"].strftime(DATE_FMT_DATE), "count": r["count"]} for r in rows if r["_id"]]
+
+def histogram_span_days(coll, field, start, end, epoch=False):
+    """Days covered by the range, filling open ends from the field's index."""
+    kind = "number" if epoch else "date"
+    if start is None or end is None:
+        lo = coll.find_one({field: {"$type": kind}}, {field: 1}, sort=[(field, ASCENDING)])
+        hi = coll.find_one({field: {"$type": kind}}, {field: 1}, sort=[(field, DESCENDING)])
+        if not lo or not hi:
+            return 0
+        as_dt = (lambda v: datetime.fromtimestamp(v, timezone.utc).replace(tzinfo=None)) if epoch else (lambda v: v)
+        start = start or as_dt(lo[field])
+        end = end or as_dt(hi[field]) + timedelta(days=1)
+    return max(0, (end - start).days)
+
+@app.route("/api/stats/histogram", methods=["GET"])
+@require_role("Super_Admin", "Admin")
+@limit_workload("analytics")
+def stats_histogram():
+    """
+    Counts per day|week|month|quarter. Params: source=assets|qr, field (assets:
+    assign_date|purchase_date|verification_date, qr: created_at), granularity
+    (default month), date_from/date_to, institute, department.
+    """
+    source = (request.args.get("source") or "assets").strip()
+    if source not in HISTOGRAM_SOURCES:
+        return jsonify({"error": f"source must be one of {list(HISTOGRAM_SOURCES)}"}), 400
+    coll, revision, fields = HISTOGRAM_SOURCES[source]
+    field = (request.args.get("field") or fields[0]).strip()
+    if field not in fields:
+        return jsonify({"error": f"field must be one of {list(fields)} for {source}"}), 400
+    granularity = (request.args.get("granularity") or "month").strip()
+    if granularity not in HISTOGRAM_GRANULARITIES:
+        return jsonify({"error": f"granularity must be one of {list(HISTOGRAM_GRANULARITIES)}"}), 400
+    try:
+        start, end = histogram_bounds(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    match = {}
+    for key in ("institute", "department"):
+        value = (request.args.get(key) or "").strip()
+        if value:
+            match[key] = value
+
+    etag, modified = collection_validators("histogram", revision, source=info_analytics)
+    cached = not_modified(etag, modified)
+    if cached is not None:
+        return cached
+
+    epoch = (source, field) in HISTOGRAM_EPOCH_FIELDS
+    span = histogram_span_days(coll, field, start, end, epoch)
+    if span / HISTOGRAM_GRANULARITIES[granularity] > HISTOGRAM_MAX_BUCKETS:
+        return jsonify({"error": f"Range spans more than {HISTOGRAM_MAX_BUCKETS} {granularity} buckets; "
+                                 "use a coarser granularity or a narrower range"}), 400
+
+    buckets = histogram(coll, match, field, granularity, start, end, epoch)
+    return with_etag(jsonify({
+        "source": source, "field": field, "granularity": granularity,
+        "date_from": request.args.get("date_from") or None, "date_to": request.args.get("date_to") or None,
+        "total": sum(b["count"] for b in buckets), "buckets": buckets,
+    }), etag, modified), 200
+
+# ---------------- Valuation rollups ----------------
+# Count, total/average purchase value and straight-line book value grouped by
+# institute/department/category/vendor/purchase year, in one aggregation
+# ($facet per dimension). Results are cached per query in the "assets" cache
+# namespace, and only reused while the assets revision counter is unchanged.
+VALUATION_DIMENSIONS = {
+    "institute": "$institute",
+    "department": "$department",
+    "category": "$category",
+    "vendor": "$vendor_name",
+    "purchase_year": "$purchase_year",
+}
+# Useful life in years per category, e.g. "Furniture=10,Electronics=5"
+VALUATION_LIFE_YEARS = {
+    k.strip(): float(v) for k, v in (
+        pair.split("=", 1) for pair in os.getenv(
+            "VALUATION_LIFE_YEARS",
+            "Furniture=10,Electronics=5,Networking=5,Electrical=8,Lab Equipment=10",
+        ).split(",") if "=" in pair
+    )
+}
+VALUATION_DEFAULT_LIFE_YEARS = float(os.getenv("VALUATION_DEFAULT_LIFE_YEARS", "5"))
+VALUATION_CACHE_TTL = float(os.getenv("VALUATION_CACHE_TTL", "600"))
+MS_PER_YEAR = 365.25 * 86400 * 1000
+
+def valuation_pipeline(match, dimensions, as_of):
+    life = {"$switch": {
+        "branches": [{"case": {"$eq": ["$category", c]}, "then": y} for c, y in VALUATION_LIFE_YEARS.items()],
+        "default": VALUATION_DEFAULT_LIFE_YEARS,
+    }} if VALUATION_LIFE_YEARS else VALUATION_DEFAULT_LIFE_YEARS
+    dated = {"$eq": [{"$type": "$purchase_date"}, "date"]}
+    group = {
+        "count": {"$sum": 1},
+        "valued": {"$sum": {"$cond": [{"$eq": ["$value", None]}, 0, 1]}},
+        "total": {"$sum": "$value"},
+        "book": {"$sum": "$book"},
+    }
+    facets = {"overall": [{"$group": {"_id": None, **group}}]}
+    for dim in dimensions:
+        facets[dim] = [{"$group": {"_id": VALUATION_DIMENSIONS[dim], **group}}, {"$sort": {"total": -1}}]
+    return [
+        {"$match": match},
+        {"$project": {
+            "institute": 1, "department": 1, "category": 1, "vendor_name": 1,
+            "purchase_year": {"$cond": [dated, {"$year": "$purchase_date"}, None]},
+            "value": {"$cond": [{"$in": [{"$type": "$rate_per_unit"}, ["decimal", "double", "int", "long"]]},
+                                {"$toDecimal": "$rate_per_unit"}, None]},
+            "age_years": {"$cond": [dated, {"$divide": [{"$subtract": [as_of, "$purchase_date"]}, MS_PER_YEAR]}, 0]},
+            "life": life,
+        }},
+        # Straight line to zero over the useful life; undated assets keep full value
+        {"$addFields": {"book": {"$cond": [
+            {"$eq": ["$value", None]}, None,
+            {"$multiply": ["$value", {"$max": [0, {"$subtract": [
+                1, {"$divide": [{"$max": [0, "$age_years"]}, "$life"]}]}]}]},
+        ]}}},
+        {"$facet": facets},
+    ]
+
+def _money(value):
+    if value is None:
+        return 0.0
+    amount = value.to_decimal() if isinstance(value, Decimal128) else Decimal(str(value))
+    return float(amount.quantize(MONEY_QUANT))
+
+def valuation_rows(rows):
+    out = []
+    for r in rows:
+        total, book = _money(r.get("total")), _money(r.get("book"))
+        out.append({
+            "key": r["_id"], "count": r["count"], "valued_count": r["valued"],
+            "total_value": total,
+            "average_value": round(total / r["valued"], 2) if r["valued"] else 0.0,
+            "book_value": book,
+            "depreciation": round(total - book, 2),
+        })
+    return out
+
+@app.route("/api/stats/valuation", methods=["GET"])
+@require_role("Super_Admin", "Admin")
+@limit_workload("analytics")
+def stats_valuation():
+    """
+    Valuation rollups. Params: group_by (comma list of institute, department,
+    category, vendor, purchase_year; default all), as_of (book value date,
+    default today), institute, department, category, date_from/date_to
+    (purchase date range).
+    """
+    raw_dims = (request.args.get("group_by") or ",".join(VALUATION_DIMENSIONS)).split(",")
+    dimensions = [d.strip() for d in raw_dims if d.strip()]
+    unknown = [d for d in dimensions if d not in VALUATION_DIMENSIONS]
+    if unknown or not dimensions:
+        return jsonify({"error": f"group_by must be a list of {list(VALUATION_DIMENSIONS)}"}), 400
+    try:
+        as_of = parse_date_field(request.args.get("as_of") or datetime.now(timezone.utc))
+        match = date_range_filter({**request.args.to_dict(), "date_field": "purchase_date"})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    for key in ("institute", "department", "category"):
+        value = (request.args.get(key) or "").strip()
+        if value:
+            match[key] = value
+
+    etag, modified = collection_validators("valuation", "assets", source=info_analytics)
+    # Book values also move with as_of (today by default), so a new day must not revalidate
+    etag = f"{etag}-{as_of:%Y%m%d}"
+    if modified is not None:
+        modified = max(modified, min(_as_utc(as_of), datetime.now(timezone.utc)))
+    cached = not_modified(etag, modified)
+    if cached is not None:
+        return cached
+
+    cache_key = "valuation:" + json.dumps([dimensions, as_of, match], sort_keys=True, default=str)
+    hit = cache.get("assets", cache_key)
+    if hit and hit[0] == etag:
+        payload = hit[1]
+    else:
+        result = next(assets_analytics.aggregate(valuation_pipeline(match, dimensions, as_of)), {})
+        overall = valuation_rows(result.get("overall") or [])
+        payload = {
+            "as_of": as_of.strftime(DATE_FMT_DATE),
+            "overall": overall[0] if overall else valuation_rows([{"_id": None, "count": 0, "valued": 0}])[0],
+            "groups": {dim: valuation_rows(result.get(dim) or []) for dim in dimensions},
+            "life_years": {**VALUATION_LIFE_YEARS, "default": VALUATION_DEFAULT_LIFE_YEARS},
+        }
+        cache.set("assets", cache_key, (etag, payload), VALUATION_CACHE_TTL)
+
+    audit_log(
+        audit, request, request.user, "valuation.view",
+        resource={"type": "Valuation", "group_by": dimensions},
+        ok=True, status=200
+    )
+    return with_etag(jsonify(payload), etag, modified), 200
+
 # MASTER_COLLECTIONS = {
 #     'asset-names': db.asset_names,
 #     'institutes': db.institutes,
@@ -1643,6 +4125,38 @@ def get_bulk_asset_stats():
 # NEW APPROACH: Single master document in "OtherInfo" collection
 MASTER_DOC_FILTER = {"type": "master"}  # single master record in OtherInfo
 
+# Master data is read on every form and scan page, so it is served from the
+# shared cache ("master" namespace). Setup writes bump the document's
+# "version" and invalidate the namespace in every worker; the TTL only
+# matters when no invalidation bus is available.
+MASTER_CACHE_TTL = float(os.getenv("MASTER_CACHE_TTL", "30"))
+
+def bump_master(update: dict) -> dict:
+    """Add the version increment every master-data write must carry."""
+    update.setdefault("$inc", {})["version"] = 1
+    return update
+
+def invalidate_master_cache():
+    cache.invalidate("master")
+
+def load_master_data():
+    """Sorted master lists plus version and ETag, cached for MASTER_CACHE_TTL."""
+    return cache.get_or_set("master", "data", _read_master_data, MASTER_CACHE_TTL)
+
+def _read_master_data():
+    doc = info.find_one(MASTER_DOC_FILTER, {"_id": 0, "Institutes": 1, "Departments": 1,
+                                            "Asset_NameCategory": 1, "version": 1}) or {}
+    data = {
+        "version": int(doc.get("version", 0)),
+        "institutes": sorted(doc.get("Institutes", [])),
+        "departments": sorted(doc.get("Departments", [])),
+        "asset_names": sorted((doc.get("Asset_NameCategory") or {}).keys()),
+    }
+    # Hash the content too so edits made outside the API still change the ETag
+    digest = hashlib.sha1(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    data["etag"] = f"master-{data['version']}-{digest}"
+    return data
+
 # 1) Add Asset Name + Category pair (stores as "Name:Category" => 1)
 @app.post("/api/setup/asset-names")
 def add_asset_name_with_category():
@@ -1653,10 +4167,11 @@ def add_asset_name_with_category():
         return jsonify({"error": "Both 'name' and 'category' are required"}), 400
 
     pair_key = f"{name}:{category}"
-    update = {"$set": {f"Asset_NameCategory.{pair_key}": 1}}
+    update = bump_master({"$set": {f"Asset_NameCategory.{pair_key}": 1}})
     info.find_one_and_update(
         MASTER_DOC_FILTER, update, upsert=True, return_document=ReturnDocument.AFTER
     )
+    invalidate_master_cache()
     return jsonify({"ok": True, "saved": pair_key}), 200
 
 # 2) Add Institute (unique)
@@ -1666,7 +4181,8 @@ def add_institute():
     name = (data.get("name") or "").strip()
     if not name:
         return jsonify({"error": "'name' is required"}), 400
-    info.update_one(MASTER_DOC_FILTER, {"$addToSet": {"Institutes": name}}, upsert=True)
+    info.update_one(MASTER_DOC_FILTER, bump_master({"$addToSet": {"Institutes": name}}), upsert=True)
+    invalidate_master_cache()
     return jsonify({"ok": True, "saved": name}), 200
 
 # 3) Add Department (unique)
@@ -1676,26 +4192,37 @@ def add_department():
     name = (data.get("name") or "").strip()
     if not name:
         return jsonify({"error": "'name' is required"}), 400
-    info.update_one(MASTER_DOC_FILTER, {"$addToSet": {"Departments": name}}, upsert=True)
+    info.update_one(MASTER_DOC_FILTER, bump_master({"$addToSet": {"Departments": name}}), upsert=True)
+    invalidate_master_cache()
     return jsonify({"ok": True, "saved": name}), 200
 
 
 
 @app.get("/api/setup/asset-names")
 def list_asset_name_category():
-    doc = info.find_one(MASTER_DOC_FILTER, {"_id": 0, "Asset_NameCategory": 1}) or {}
-    kv = doc.get("Asset_NameCategory", {})
-    return jsonify(sorted(kv.keys())), 200
+    return jsonify(load_master_data()["asset_names"]), 200
 
 @app.get("/api/setup/institutes")
 def list_institutes():
-    doc = info.find_one(MASTER_DOC_FILTER, {"_id": 0, "Institutes": 1}) or {}
-    return jsonify(sorted(doc.get("Institutes", []))), 200
+    return jsonify(load_master_data()["institutes"]), 200
 
 @app.get("/api/setup/departments")
 def list_departments():
-    doc = info.find_one(MASTER_DOC_FILTER, {"_id": 0, "Departments": 1}) or {}
-    return jsonify(sorted(doc.get("Departments", []))), 200
+    return jsonify(load_master_data()["departments"]), 200
+
+@app.get("/api/setup/bootstrap")
+def setup_bootstrap():
+    """
+    All master data in one response: institutes, departments and
+    "Name:Category" asset pairs, plus the master version. Carries an ETag so
+    clients revalidate with If-None-Match and get a 304 when nothing changed.
+    """
+    data = load_master_data()
+    cached = not_modified(data["etag"])
+    if cached is not None:
+        return cached
+    body = {k: data[k] for k in ("version", "institutes", "departments", "asset_names")}
+    return with_etag(jsonify(body), data["etag"]), 200
 
 
 
@@ -1706,56 +4233,93 @@ from urllib.parse import unquote
 def delete_asset_pair(key):
     # key will be URL-encoded e.g., "Mouse%3AElectronics"
     decoded = unquote(key)
-    info.update_one(MASTER_DOC_FILTER, {"$unset": {f"Asset_NameCategory.{decoded}": ""}}, upsert=True)
+    info.update_one(MASTER_DOC_FILTER, bump_master({"$unset": {f"Asset_NameCategory.{decoded}": ""}}), upsert=True)
+    invalidate_master_cache()
     return jsonify({"ok": True, "deleted": decoded}), 200
 
 @app.delete("/api/setup/institutes/<path:value>")
 def delete_institute(value):
-    info.update_one(MASTER_DOC_FILTER, {"$pull": {"Institutes": value}})
+    info.update_one(MASTER_DOC_FILTER, bump_master({"$pull": {"Institutes": value}}))
+    invalidate_master_cache()
     return jsonify({"ok": True, "deleted": value}), 200
 
 @app.delete("/api/setup/departments/<path:value>")
 def delete_department(value):
-    info.update_one(MASTER_DOC_FILTER, {"$pull": {"Departments": value}})
+    info.update_one(MASTER_DOC_FILTER, bump_master({"$pull": {"Departments": value}}))
+    invalidate_master_cache()
     return jsonify({"ok": True, "deleted": value}), 200
 
 # Correct: get the collection object from the database
 def get_users_collection():
     return db[USER_COLLECTION]
 
+# Role counts are kept in OtherInfo and adjusted on signup/delete; the first
+# read (or the refresh-user-directory command) seeds them from a full count.
+ROLE_COUNTS_FILTER = {"type": "user_roles"}
+USER_PAGE_DEFAULT = 50
+USER_PAGE_MAX = 200
+USER_PUBLIC = {"password": 0, "name_lc": 0}
 
-from bson import ObjectId
+def recount_user_roles():
+    counts = {str(r["_id"]): r["count"] for r in users.aggregate([{"$group": {"_id": "$role", "count": {"$sum": 1}}}])}
+    info.replace_one(ROLE_COUNTS_FILTER, {**ROLE_COUNTS_FILTER, "counts": counts}, upsert=True)
+    return counts
+
+def role_counts():
+    doc = info.find_one(ROLE_COUNTS_FILTER)
+    return {r: n for r, n in doc["counts"].items() if n} if doc else recount_user_roles()
+
+def adjust_role_count(role, delta):
+    # No upsert: before the first recount there is nothing to adjust
+    info.update_one(ROLE_COUNTS_FILTER, {"$inc": {f"counts.{role}": delta}})
+
+@app.cli.command("refresh-user-directory")
+def refresh_user_directory_command():
+    """Fill name_lc for users created before prefix search, then recount roles."""
+    ops = [UpdateOne({"_id": u["_id"]}, {"$set": {"name_lc": (u.get("name") or "").lower()}})
+           for u in users.find({"name_lc": {"$exists": False}}, {"name": 1})]
+    if ops:
+        users.bulk_write(ops, ordered=False)
+    click.echo(f"names: {len(ops)} updated, roles: {recount_user_roles()}")
 
-def mongo_to_json(doc):
-    """Convert _id to string in a MongoDB document or list."""
-    if isinstance(doc, list):
-        return [mongo_to_json(d) for d in doc]
-    doc = dict(doc)
-    if '_id' in doc and isinstance(doc['_id'], ObjectId):
-        doc['_id'] = str(doc['_id'])
-    return doc    
 
+from bson import ObjectId
 
 @app.route('/api/users', methods=['GET'])
 @require_role('Super_Admin')
 def list_users():
-    users_collection = db[USER_COLLECTION]
-    role = request.args.get('role')
+    """
+    User directory in emp_id order, one page at a time. Params: role, q
+    (emp_id or name prefix), limit, after (the previous page's "next").
+    Role counts come from the maintained counter, not a scan.
+    """
     query = {}
+    role = request.args.get('role')
     if role:
         query['role'] = role
-    users = list(users_collection.find(query, {'password': 0}))
-    users = mongo_to_json(users)            # <-- Fix: Make _id serializable
-    counts = list(users_collection.aggregate([
-        {'$group': {'_id': '$role', 'count': {'$sum': 1}}}
-    ]))
-    # Optionally process counts for _id as string, too.
-    for c in counts:
-        c['_id'] = str(c['_id'])
+    q = (request.args.get('q') or '').strip()
+    if q:
+        prefixes = {q, q.upper()}
+        query['$or'] = [{'emp_id': {'$regex': '^' + re.escape(p)}} for p in prefixes]
+        query['$or'].append({'name_lc': {'$regex': '^' + re.escape(q.lower())}})
+    after = (request.args.get('after') or '').strip()
+    if after:
+        query['emp_id'] = {'$gt': after}
+    try:
+        limit = min(USER_PAGE_MAX, max(1, int(request.args.get('limit', USER_PAGE_DEFAULT))))
+    except ValueError:
+        limit = USER_PAGE_DEFAULT
+
+    page = list(users.find(query, USER_PUBLIC).sort('emp_id', ASCENDING).limit(limit + 1))
+    has_more = len(page) > limit
+    page = page[:limit]
+    counts = role_counts()
     return jsonify({
         'success': True,
-        'users': users,
-        'counts': counts
+        'users': page,
+        'counts': [{'_id': r, 'count': n} for r, n in counts.items()],
+        'total': sum(counts.values()),
+        'next': page[-1]['emp_id'] if has_more else None,
     })
 
 
@@ -1765,10 +4329,11 @@ from flask import jsonify
 def delete_user(user_id):
     if request.method == 'OPTIONS':
         return ('', 204)
-    users_collection = db[USER_COLLECTION]
     try:
-        result = users_collection.delete_one({'_id': ObjectId(user_id)})
-        if result.deleted_count == 1:
+        removed = users.find_one_and_delete({'_id': ObjectId(user_id)}, {'role': 1})
+        if removed:
+            adjust_role_count(removed.get('role'), -1)
+            cache.delete("users", str(removed["_id"]))
             return jsonify({'success': True}), 200
         else:
             return jsonify({'success': False, 'error': 'User not found'}), 404
@@ -1789,6 +4354,8 @@ def reset_user_password(user_id):
     # ✅ Use the same hash function as signup
     try:
         hashed_pw = hash_password(new_pw)   # same as used in signup()
+    except PasswordPoolBusy:
+        return password_busy_response()
     except Exception as e:
         return jsonify({'success': False, 'error': f'Password hashing failed: {str(e)}'}), 500
 
@@ -1805,6 +4372,921 @@ def reset_user_password(user_id):
 
 
 
+# ---------------- Metrics ----------------
+# Prometheus text exposition at /metrics. Series are kept per worker process;
+# with several gunicorn workers each process reports its own counters.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RouteMetrics:
+    """Per-route request counts, latency histograms and Mongo command timings."""
+
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.requests = {}     # (route, method, status) -> count
+        self.latency = {}      # (route, method) -> [bucket counts..., sum, count]
+        self.mongo = {}        # route -> [commands, seconds]
+        self.slowest = {}      # route -> (command, seconds)
+
+    def observe(self, route, method, status, seconds, mongo_stats):
+        with self._lock:
+            key = (route, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+            hist = self.latency.get((route, method))
+            if hist is None:
+                hist = self.latency[(route, method)] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    hist[i] += 1
+            hist[-2] += seconds
+            hist[-1] += 1
+
+            if mongo_stats and mongo_stats["count"]:
+                agg = self.mongo.setdefault(route, [0, 0.0])
+                agg[0] += mongo_stats["count"]
+                agg[1] += mongo_stats["seconds"]
+                prev = self.slowest.get(route)
+                if prev is None or mongo_stats["slowest_seconds"] > prev[1]:
+                    self.slowest[route] = (mongo_stats["slowest_command"], mongo_stats["slowest_seconds"])
+
+    def render(self) -> str:
+        def esc(v):
+            return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+        lines = []
+        with self._lock:
+            lines.append("# HELP http_requests_total Requests served, by route, method and status.")
+            lines.append("# TYPE http_requests_total counter")
+            for (route, method, status), n in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{route="{esc(route)}",method="{method}",status="{status}"}} {n}')
+
+            lines.append("# HELP http_request_duration_seconds Request latency, by route and method.")
+            lines.append("# TYPE http_request_duration_seconds histogram")
+            for (route, method), hist in sorted(self.latency.items()):
+                labels = f'route="{esc(route)}",method="{method}"'
+                for i, bound in enumerate(self.buckets):
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {hist[i]}')
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {hist[-1]}')
+                lines.append(f"http_request_duration_seconds_sum{{{labels}}} {hist[-2]:.6f}")
+                lines.append(f"http_request_duration_seconds_count{{{labels}}} {hist[-1]}")
+
+            lines.append("# HELP mongo_commands_total Mongo commands issued while serving a route.")
+            lines.append("# TYPE mongo_commands_total counter")
+            for route, (n, _) in sorted(self.mongo.items()):
+                lines.append(f'mongo_commands_total{{route="{esc(route)}"}} {n}')
+
+            lines.append("# HELP mongo_command_seconds_total Time spent in Mongo commands while serving a route.")
+            lines.append("# TYPE mongo_command_seconds_total counter")
+            for route, (_, secs) in sorted(self.mongo.items()):
+                lines.append(f'mongo_command_seconds_total{{route="{esc(route)}"}} {secs:.6f}')
+
+            lines.append("# HELP mongo_slowest_command_seconds Slowest single Mongo command seen for a route.")
+            lines.append("# TYPE mongo_slowest_command_seconds gauge")
+            for route, (cmd, secs) in sorted(self.slowest.items()):
+                lines.append(f'mongo_slowest_command_seconds{{route="{esc(route)}",command="{esc(cmd)}"}} {secs:.6f}')
+        return "\n".join(lines) + "\n"
+
+
+route_metrics = RouteMetrics(LATENCY_BUCKETS)
+
+
+class RequestIdFilter(logging.Filter):
+    """Adds the current request id (or "-") to every log record."""
+
+    def filter(self, record):
+        record.request_id = getattr(_request_local, "request_id", None) or "-"
+        return True
+
+
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s",
+)
+for _handler in logging.getLogger().handlers:
+    _handler.addFilter(RequestIdFilter())
+
+@app.before_request
+def _start_request_metrics():
+    _request_local.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    _request_local.route = request.url_rule.rule if request.url_rule else "<unmatched>"
+    _request_local.started = time.perf_counter()
+    _request_local.mongo = {"count": 0, "seconds": 0.0, "slowest_seconds": 0.0, "slowest_command": None}
+
+@app.after_request
+def _record_request_metrics(resp):
+    started = getattr(_request_local, "started", None)
+    mongo_stats = getattr(_request_local, "mongo", None)
+    _request_local.started = None
+    _request_local.mongo = None
+    if started is None:
+        return resp
+    elapsed = time.perf_counter() - started
+    route_metrics.observe(_request_local.route, request.method, resp.status_code, elapsed, mongo_stats)
+
+    resp.headers["X-Request-ID"] = _request_local.request_id
+    timing = [f"app;dur={elapsed * 1000:.2f}"]
+    if mongo_stats:
+        timing.append(f'db;dur={mongo_stats["seconds"] * 1000:.2f};desc="{mongo_stats["count"]} cmds"')
+    resp.headers["Server-Timing"] = ", ".join(timing)
+    return resp
+
+@app.teardown_request
+def _clear_request_id(exc):
+    _request_local.request_id = None
+    _request_local.route = None
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    if METRICS_TOKEN and request.headers.get("Authorization", "") != f"Bearer {METRICS_TOKEN}":
+        return jsonify({"error": "Unauthorized"}), 401
+    body = route_metrics.render() + render_workload_metrics() + render_cache_metrics()
+    return app.response_class(body, mimetype="text/plain; version=0.0.4")
+
+# ---------------- Slow operation log ----------------
+# Records go to a capped collection (SLOW_OPS_SINK=mongo, default) or to a
+# rotating JSON-lines file (SLOW_OPS_SINK=file). Explains run on a background
+# thread, at most once per filter shape every SLOW_OPS_EXPLAIN_INTERVAL seconds.
+SLOW_OPS_SINK = os.getenv("SLOW_OPS_SINK", "mongo").lower()
+SLOW_OPS_COLLECTION = os.getenv("SLOW_OPS_COLLECTION", "SlowOps")
+SLOW_OPS_CAPPED_BYTES = int(os.getenv("SLOW_OPS_CAPPED_BYTES", str(32 * 1024 * 1024)))
+SLOW_OPS_FILE = os.getenv("SLOW_OPS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "slow_ops.jsonl"))
+SLOW_OPS_FILE_MAX_BYTES = int(os.getenv("SLOW_OPS_FILE_MAX_BYTES", str(10 * 1024 * 1024)))
+SLOW_OPS_FILE_BACKUPS = int(os.getenv("SLOW_OPS_FILE_BACKUPS", "5"))
+SLOW_OPS_EXPLAIN = os.getenv("SLOW_OPS_EXPLAIN", "true").lower() == "true"
+SLOW_OPS_EXPLAIN_INTERVAL = int(os.getenv("SLOW_OPS_EXPLAIN_INTERVAL", "300"))
+SLOW_OPS_QUEUE_SIZE = 1000
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+
+_slow_ops_queue = queue.Queue(maxsize=SLOW_OPS_QUEUE_SIZE)
+_slow_ops_thread = None
+_slow_ops_lock = threading.Lock()
+_slow_ops_explained = {}  # shape hash -> last explain time
+slow_ops_dropped = 0
+
+def redact_shape(value, in_filter=True):
+    """
+    Replace literal values with "?" so filters can be logged and grouped by
+    shape. Outside of filters, field paths ("$x") and numbers are kept.
+    """
+    if isinstance(value, dict):
+        return {k: redact_shape(v, in_filter or k in ("$match", "query", "filter")) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(not isinstance(v, (dict, list, tuple)) for v in value):
+            return ["?"] if in_filter else [redact_shape(v, in_filter) for v in value]
+        return [redact_shape(v, in_filter) for v in value]
+    if in_filter:
+        return "?"
+    if isinstance(value, (bool, int, float)) or (isinstance(value, str) and value.startswith("$")):
+        return value
+    return "?"
+
+def slow_op_shape(command_name, command):
+    """Collection and redacted query shape for a command document."""
+    collection = command.get(command_name)
+    if command_name == "find":
+        shape = {"filter": redact_shape(command.get("filter", {}))}
+        if command.get("sort"):
+            shape["sort"] = dict(command["sort"])
+    elif command_name == "aggregate":
+        shape = {"pipeline": [redact_shape(stage, in_filter=False) for stage in command.get("pipeline", [])]}
+    elif command_name in ("count", "distinct"):
+        shape = {"query": redact_shape(command.get("query", {}))}
+        if command_name == "distinct":
+            shape["key"] = command.get("key")
+    elif command_name == "update":
+        stmts = command.get("updates") or [{}]
+        shape = {"q": redact_shape(stmts[0].get("q", {})), "statements": len(stmts)}
+    elif command_name == "delete":
+        stmts = command.get("deletes") or [{}]
+        shape = {"q": redact_shape(stmts[0].get("q", {})), "statements": len(stmts)}
+    elif command_name == "findAndModify":
+        shape = {"query": redact_shape(command.get("query", {}))}
+    else:
+        shape = {}
+        collection = command.get("collection", collection)
+    return collection, shape
+
+def explainable_command(command_name, command):
+    """Strip driver/session fields and reduce writes to one statement for explain."""
+    cmd = {k: v for k, v in command.items()
+           if not k.startswith("$") and k not in ("lsid", "txnNumber", "writeConcern", "readConcern", "maxTimeMS")}
+    if command_name == "update":
+        cmd["updates"] = cmd.get("updates", [])[:1]
+    elif command_name == "delete":
+        cmd["deletes"] = cmd.get("deletes", [])[:1]
+    return cmd
+
+def _find_key(node, key):
+    """Depth-first search for the first value stored under key."""
+    if isinstance(node, dict):
+        if key in node:
+            return node[key]
+        for v in node.values():
+            found = _find_key(v, key)
+            if found is not None:
+                return found
+    elif isinstance(node, list):
+        for v in node:
+            found = _find_key(v, key)
+            if found is not None:
+                return found
+    return None
+
+def trim_plan(node):
+    """Keep the plan tree's stages and index names; drop filters and bounds (they hold values)."""
+    if not isinstance(node, dict):
+        return None
+    node = node.get("queryPlan", node)
+    out = {k: node[k] for k in ("stage", "indexName", "keyPattern", "direction", "isMultiKey") if k in node}
+    if isinstance(node.get("inputStage"), dict):
+        out["inputStage"] = trim_plan(node["inputStage"])
+    if isinstance(node.get("inputStages"), list):
+        out["inputStages"] = [trim_plan(n) for n in node["inputStages"]]
+    return out
+
+def plan_summary(plan):
+    """Flatten a winning plan into "FETCH > IXSCAN(idx)" form."""
+    parts = []
+    node = plan.get("queryPlan", plan) if isinstance(plan, dict) else None
+    while isinstance(node, dict):
+        stage = node.get("stage", "?")
+        if node.get("indexName"):
+            stage += f"({node['indexName']})"
+        parts.append(stage)
+        node = node.get("inputStage") or (node.get("inputStages") or [None])[0]
+    return " > ".join(parts)
+
+def run_explain(database_name, command_name, command):
+    explained = client[database_name].command(
+        "explain", explainable_command(command_name, command), verbosity="executionStats"
+    )
+    stats = _find_key(explained, "executionStats") or {}
+    winning = _find_key(explained, "winningPlan") or {}
+    summary = plan_summary(winning)
+    return {
+        "plan": summary,
+        "collscan": "COLLSCAN" in summary,
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "n_returned": stats.get("nReturned"),
+        "execution_ms": stats.get("executionTimeMillis"),
+        "winning_plan": trim_plan(winning),
+    }
+
+def reply_count(command_name, reply):
+    """Documents returned (or affected) according to the server reply."""
+    if not isinstance(reply, dict):
+        return None
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+    if command_name == "distinct":
+        return len(reply.get("values") or [])
+    return reply.get("n")
+
+def record_slow_op(event, command, reply):
+    """Called from the command listener; queues the record for the worker thread."""
+    global slow_ops_dropped
+    collection, shape = slow_op_shape(event.command_name, command)
+    shape_json = json.dumps(shape, sort_keys=True, default=str)
+    shape_key = f"{event.database_name}.{collection}:{event.command_name}:{shape_json}"
+    rec = {
+        "ts": int(time.time()),
+        "route": getattr(_request_local, "route", None) or "<background>",
+        "request_id": getattr(_request_local, "request_id", None),
+        "database": event.database_name,
+        "collection": collection,
+        "command": event.command_name,
+        "shape": shape_json,  # stored as text: shapes contain "$" operator keys
+        "shape_hash": hashlib.sha1(shape_key.encode("utf-8")).hexdigest()[:16],
+        "duration_ms": round(event.duration_micros / 1000, 2),
+        "n_returned": reply_count(event.command_name, reply),
+        "ok": reply is not None,
+    }
+    try:
+        _slow_ops_queue.put_nowait((rec, command))
+    except queue.Full:
+        slow_ops_dropped += 1
+        return
+    _ensure_slow_ops_worker()
+
+def _ensure_slow_ops_worker():
+    global _slow_ops_thread
+    if _slow_ops_thread is not None and _slow_ops_thread.is_alive():
+        return
+    with _slow_ops_lock:
+        if _slow_ops_thread is None or not _slow_ops_thread.is_alive():
+            _slow_ops_thread = threading.Thread(target=_slow_ops_worker, name="slow-ops", daemon=True)
+            _slow_ops_thread.start()
+
+def _slow_ops_file_logger():
+    logger = logging.getLogger("campusassets.slow_ops")
+    if not logger.handlers:
+        os.makedirs(os.path.dirname(SLOW_OPS_FILE), exist_ok=True)
+        handler = RotatingFileHandler(SLOW_OPS_FILE, maxBytes=SLOW_OPS_FILE_MAX_BYTES, backupCount=SLOW_OPS_FILE_BACKUPS)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+def _slow_ops_collection():
+    if SLOW_OPS_COLLECTION not in db.list_collection_names(filter={"name": SLOW_OPS_COLLECTION}):
+        try:
+            db.create_collection(SLOW_OPS_COLLECTION, capped=True, size=SLOW_OPS_CAPPED_BYTES)
+        except CollectionInvalid:
+            pass  # created concurrently by another worker
+    col = db[SLOW_OPS_COLLECTION]
+    col.create_index([("shape_hash", ASCENDING), ("ts", DESCENDING)])
+    return col
+
+def _slow_ops_worker():
+    _slow_ops_local.internal = True  # never log our own explain/insert commands
+    sink = None
+    while True:
+        rec, command = _slow_ops_queue.get()
+        try:
+            if sink is None:
+                sink = _slow_ops_file_logger() if SLOW_OPS_SINK == "file" else _slow_ops_collection()
+
+            now = time.time()
+            if (SLOW_OPS_EXPLAIN and rec["command"] in EXPLAINABLE_COMMANDS
+                    and now - _slow_ops_explained.get(rec["shape_hash"], 0) >= SLOW_OPS_EXPLAIN_INTERVAL):
+                _slow_ops_explained[rec["shape_hash"]] = now
+                try:
+                    rec["explain"] = run_explain(rec["database"], rec["command"], command)
+                except Exception as e:
+                    rec["explain_error"] = str(e)[:200]
+
+            if SLOW_OPS_SINK == "file":
+                sink.info(json.dumps(rec, default=json_default))
+            else:
+                sink.insert_one(rec)
+        except Exception:
+            app.logger.exception("Failed to record slow operation")
+        finally:
+            _slow_ops_queue.task_done()
+
+def _read_slow_ops_file(since_ts):
+    paths = [SLOW_OPS_FILE] + [f"{SLOW_OPS_FILE}.{i}" for i in range(1, SLOW_OPS_FILE_BACKUPS + 1)]
+    out = []
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                if rec.get("ts", 0) >= since_ts:
+                    out.append(rec)
+    return out
+
+def top_slow_ops(records, limit):
+    """Group records by shape, worst total time first (file sink)."""
+    groups = {}
+    for rec in sorted(records, key=lambda r: r.get("ts", 0)):
+        g = groups.setdefault(rec["shape_hash"], {
+            "_id": rec["shape_hash"], "command": rec.get("command"), "collection": rec.get("collection"),
+            "shape": rec.get("shape"), "routes": set(), "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+            "last_seen": 0, "explain": None,
+        })
+        g["routes"].add(rec.get("route"))
+        g["count"] += 1
+        g["total_ms"] += rec.get("duration_ms", 0)
+        g["max_ms"] = max(g["max_ms"], rec.get("duration_ms", 0))
+        g["last_seen"] = rec.get("ts", 0)
+        if rec.get("explain"):
+            g["explain"] = rec["explain"]
+    out = sorted(groups.values(), key=lambda g: g["total_ms"], reverse=True)[:limit]
+    for g in out:
+        g["routes"] = sorted(r for r in g["routes"] if r)
+        g["avg_ms"] = round(g["total_ms"] / g["count"], 2)
+    return out
+
+@app.route("/api/admin/slow-ops", methods=["GET"])
+@require_role("Super_Admin")
+def slow_ops_top():
+    """
+    Top slow-operation offenders grouped by query shape.
+    Query: limit (default 20), since_ts (epoch seconds), route.
+    """
+    try:
+        limit = min(100, max(1, int(request.args.get("limit", 20))))
+        since_ts = int(request.args.get("since_ts") or 0)
+    except Exception:
+        return jsonify({"error": "limit and since_ts must be integers"}), 400
+    route = (request.args.get("route") or "").strip()
+
+    if SLOW_OPS_SINK == "file":
+        records = [r for r in _read_slow_ops_file(since_ts) if not route or r.get("route") == route]
+        items = top_slow_ops(records, limit)
+    else:
+        match = {"ts": {"$gte": since_ts}}
+        if route:
+            match["route"] = route
+        col = db[SLOW_OPS_COLLECTION]
+        items = list(col.aggregate([
+            {"$match": match},
+            {"$group": {
+                "_id": "$shape_hash",
+                "command": {"$first": "$command"},
+                "collection": {"$first": "$collection"},
+                "shape": {"$first": "$shape"},
+                "routes": {"$addToSet": "$route"},
+                "count": {"$sum": 1},
+                "total_ms": {"$sum": "$duration_ms"},
+                "avg_ms": {"$avg": "$duration_ms"},
+                "max_ms": {"$max": "$duration_ms"},
+                "last_seen": {"$max": "$ts"},
+            }},
+            {"$sort": {"total_ms": -1}},
+            {"$limit": limit},
+        ]))
+        for g in items:
+            g["avg_ms"] = round(g["avg_ms"] or 0, 2)
+            latest = col.find_one({"shape_hash": g["_id"], "explain": {"$exists": True}},
+                                  {"explain": 1, "_id": 0}, sort=[("ts", DESCENDING)])
+            g["explain"] = (latest or {}).get("explain")
+
+    return jsonify({
+        "threshold_ms": SLOW_QUERY_MS,
+        "sink": SLOW_OPS_SINK,
+        "dropped": slow_ops_dropped,
+        "items": items,
+    }), 200
+
+# ---------------- Request profiling ----------------
+# Opt-in cProfile capture. A request is profiled when PROFILE_SAMPLE_RATE
+# selects it, or when a Super_Admin sends "X-Profile: 1". Profiles land in
+# PROFILE_DIR (newest PROFILE_MAX_FILES kept) with a JSON sidecar describing
+# the request. With the rate at 0 and no header, the cost is one dict lookup.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+PROFILE_NAME_RE = re.compile(r"^[A-Za-z0-9_.-]+\.prof$")
+
+def _profile_requested():
+    if request.headers.get("X-Profile") == "1":
+        user, err = current_user()
+        return not err and user.get("role") == "Super_Admin"
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+@app.before_request
+def _start_profiler():
+    if PROFILE_SAMPLE_RATE <= 0 and "X-Profile" not in request.headers:
+        return
+    if request.endpoint in ("metrics", "list_profiles", "get_profile") or not _profile_requested():
+        return
+    profiler = cProfile.Profile()
+    _request_local.profiler = (profiler, time.perf_counter())
+    profiler.enable()
+
+def _prune_profiles():
+    profiles = sorted(
+        (f for f in os.listdir(PROFILE_DIR) if f.endswith(".prof")),
+        key=lambda f: os.path.getmtime(os.path.join(PROFILE_DIR, f)),
+    )
+    for name in profiles[:max(0, len(profiles) - PROFILE_MAX_FILES)]:
+        for path in (os.path.join(PROFILE_DIR, name), os.path.join(PROFILE_DIR, name[:-5] + ".json")):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+@app.after_request
+def _save_profile(resp):
+    state = getattr(_request_local, "profiler", None)
+    if state is None:
+        return resp
+    _request_local.profiler = None
+    profiler, started = state
+    profiler.disable()
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        request_id = getattr(_request_local, "request_id", None) or uuid.uuid4().hex
+        endpoint = SAFE_TOKEN_RE.sub("", request.endpoint or "unmatched")
+        name = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}_{endpoint}_{SAFE_TOKEN_RE.sub('', request_id)[:36]}.prof"
+        profiler.dump_stats(os.path.join(PROFILE_DIR, name))
+        meta = {
+            "name": name,
+            "route": request.url_rule.rule if request.url_rule else None,
+            "endpoint": request.endpoint,
+            "method": request.method,
+            "path": request.path,
+            "status": resp.status_code,
+            "request_id": request_id,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+            "ts": int(time.time()),
+        }
+        with open(os.path.join(PROFILE_DIR, name[:-5] + ".json"), "w", encoding="utf-8") as fh:
+            json.dump(meta, fh)
+        _prune_profiles()
+        resp.headers["X-Profile-Id"] = name
+    except Exception:
+        app.logger.exception("Failed to save request profile")
+    return resp
+
+@app.teardown_request
+def _stop_profiler(exc):
+    # after_request is skipped when a response could not be built
+    state = getattr(_request_local, "profiler", None)
+    if state is not None:
+        state[0].disable()
+        _request_local.profiler = None
+
+@app.route("/api/admin/profiles", methods=["GET"])
+@require_role("Super_Admin")
+def list_profiles():
+    """Saved request profiles, newest first. Optional filter: route."""
+    route = (request.args.get("route") or "").strip()
+    items = []
+    if os.path.isdir(PROFILE_DIR):
+        for f in os.listdir(PROFILE_DIR):
+            if not f.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(PROFILE_DIR, f), encoding="utf-8") as fh:
+                    meta = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            if route and meta.get("route") != route:
+                continue
+            prof_path = os.path.join(PROFILE_DIR, meta.get("name", ""))
+            if os.path.exists(prof_path):
+                meta["size"] = os.path.getsize(prof_path)
+                items.append(meta)
+    items.sort(key=lambda m: m.get("ts", 0), reverse=True)
+    return jsonify({"sample_rate": PROFILE_SAMPLE_RATE, "count": len(items), "items": items}), 200
+
+@app.route("/api/admin/profiles/<name>", methods=["GET"])
+@require_role("Super_Admin")
+def get_profile(name):
+    """
+    Download a .prof file (load with pstats or snakeviz), or pass
+    ?format=text&sort=cumulative&limit=40 for a printed summary.
+    """
+    if not PROFILE_NAME_RE.match(name):
+        return jsonify({"error": "Invalid profile name"}), 400
+    path = os.path.join(PROFILE_DIR, name)
+    if not os.path.exists(path):
+        return jsonify({"error": "Not found"}), 404
+    if request.args.get("format") == "text":
+        sort = request.args.get("sort", "cumulative")
+        if sort not in ("cumulative", "tottime", "calls", "ncalls"):
+            sort = "cumulative"
+        try:
+            limit = min(200, max(1, int(request.args.get("limit", 40))))
+        except Exception:
+            limit = 40
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+        return app.response_class(out.getvalue(), mimetype="text/plain")
+    return send_file(path, as_attachment=True, download_name=name)
+
+# ---------------- Scheduled reports ----------------
+# Report definitions live in REPORT_COLLECTION. Each worker process runs a
+# scheduler thread that claims due definitions (the next_run_at bump is atomic,
+# so each run is rendered by one worker only) and renders them on a small pool
+# into a size-bounded directory of content-addressed files. Downloads are plain
+# send_file serves with ETag, Last-Modified and Range support.
+REPORT_COLLECTION = os.getenv("REPORT_COLLECTION", "Reports")
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "report_cache"))
+REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+REPORT_SCHEDULER = os.getenv("REPORT_SCHEDULER", "true").lower() == "true"
+REPORT_POLL_SECONDS = int(os.getenv("REPORT_POLL_SECONDS", "60"))
+REPORT_DEFAULT_INTERVAL_HOURS = 24 * 7
+REPORT_KINDS = {"inventory", "unverified", "status"}
+REPORT_FORMATS = {"csv", "xlsx"} if openpyxl else {"csv"}
+REPORT_MIMETYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+# Same columns and headings as the Assets page Excel export
+REPORT_COLUMNS = [
+    ("serial_no", "Serial No"), ("registration_number", "Registration No"),
+    ("asset_name", "Asset Name"), ("category", "Category"), ("institute", "Institute"),
+    ("department", "Department"), ("status", "Status"),
+    ("size_lxwxh", "Design Specifications (LxWxH)"), ("company_model", "Company / Model / Model No."),
+    ("it_serial_no", "Serial No. (IT Asset)"), ("dead_stock_no", "Dead Stock / Asset / Stock No."),
+    ("bill_no", "Bill No"), ("vendor_name", "Vendor Name"), ("purchase_date", "Date of Purchase"),
+    ("rate_per_unit", "Rate per Unit (Rs.)"), ("po_no", "Purchase Order (PO) No."),
+    ("room_no", "Room No. / Location (short)"), ("building_name", "Name of Building"),
+    ("desc", "Description"), ("assigned_type", "Assigned Type"),
+    ("assigned_faculty_name", "Assigned Faculty Name"), ("employee_code", "Employee Code"),
+    ("assign_date", "Assign Date"), ("remarks", "Remarks"),
+    ("verification_date", "Verification Date"), ("verified", "Verified"), ("verified_by", "Verified By"),
+]
+
+reports = db[REPORT_COLLECTION]
+_report_pool = None
+_report_thread = None
+_report_lock = threading.Lock()
+
+def report_cell(key, value):
+    if key == "verified":
+        return "Yes" if value is True else "No"
+    if isinstance(value, datetime):
+        return value.strftime(DATE_FMT_DATE)
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    return "" if value is None else str(value)
+
+def report_rows(defn):
+    """Header row followed by data rows for one report definition."""
+    query = {k: defn[k] for k in ("institute", "department") if defn.get(k)}
+    if defn["kind"] == "status":
+        keys = ["department", "status"] if not defn.get("department") else ["status"]
+        pipeline = [
+            {"$match": query},
+            {"$group": {"_id": {k: f"${k}" for k in keys}, "count": {"$sum": 1}}},
+            {"$sort": {**{f"_id.{k}": 1 for k in keys}}},
+        ]
+        yield [k.title() for k in keys] + ["Count"]
+        for r in assets_export.aggregate(pipeline):
+            yield [report_cell(k, r["_id"].get(k)) for k in keys] + [r["count"]]
+        return
+    if defn["kind"] == "unverified":
+        query["verified"] = {"$ne": True}
+    yield [label for _, label in REPORT_COLUMNS]
+    cursor = assets_export.find(query, {k: 1 for k, _ in REPORT_COLUMNS}).sort("serial_no", ASCENDING)
+    for doc in cursor:
+        yield [report_cell(k, doc.get(k)) for k, _ in REPORT_COLUMNS]
+
+def write_report(defn, path):
+    rows = 0
+    if defn["format"] == "xlsx":
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet(defn["kind"].title())
+        for row in report_rows(defn):
+            ws.append(row)
+            rows += 1
+        wb.save(path)
+    else:
+        with open(path, "w", newline="", encoding="utf-8-sig") as fh:  # BOM so Excel detects UTF-8
+            writer = csv.writer(fh)
+            for row in report_rows(defn):
+                writer.writerow(row)
+                rows += 1
+    return rows - 1
+
+def report_file(output):
+    return os.path.join(REPORT_CACHE_DIR, output["file"])
+
+def render_report(defn):
+    """Render a definition into the cache directory and record the output on it."""
+    os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+    tmp = os.path.join(REPORT_CACHE_DIR, f".tmp-{uuid.uuid4().hex}")
+    started = time.time()
+    try:
+        rows = write_report(defn, tmp)
+        digest = hashlib.sha256()
+        with open(tmp, "rb") as fh:
+            for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+                digest.update(chunk)
+        sha = digest.hexdigest()
+        name = f"{sha}.{defn['format']}"
+        os.replace(tmp, os.path.join(REPORT_CACHE_DIR, name))  # identical output lands on the same file
+    except Exception as e:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        reports.update_one({"_id": defn["_id"]}, {"$set": {"last_error": str(e), "last_run_at": datetime.now(timezone.utc)}})
+        app.logger.exception("report %s failed", defn["_id"])
+        return None
+    output = {
+        "file": name, "sha256": sha, "rows": rows,
+        "size": os.path.getsize(os.path.join(REPORT_CACHE_DIR, name)),
+        "rendered_at": datetime.now(timezone.utc),
+        "render_ms": round((time.time() - started) * 1000, 1),
+    }
+    reports.update_one({"_id": defn["_id"]}, {"$set": {"output": output, "last_error": None, "last_run_at": output["rendered_at"]}})
+    prune_report_cache()
+    return output
+
+def prune_report_cache():
+    """Drop the least recently used files until the directory fits REPORT_CACHE_MAX_BYTES."""
+    try:
+        entries = [e for e in os.scandir(REPORT_CACHE_DIR) if e.is_file() and not e.name.startswith(".")]
+    except FileNotFoundError:
+        return
+    total = sum(e.stat().st_size for e in entries)
+    if total <= REPORT_CACHE_MAX_BYTES:
+        return
+    current = {d["output"]["file"] for d in reports.find({"output.file": {"$exists": True}}, {"output.file": 1})}
+    # Superseded outputs go first, then current ones by last access
+    for e in sorted(entries, key=lambda e: (e.name in current, e.stat().st_atime)):
+        if total <= REPORT_CACHE_MAX_BYTES:
+            break
+        size = e.stat().st_size
+        try:
+            os.remove(e.path)
+            total -= size
+        except FileNotFoundError:
+            pass
+
+def run_due_reports(wait=False):
+    """Claim every due definition and render it on the pool; returns how many were claimed."""
+    global _report_pool
+    with _report_lock:
+        if _report_pool is None:
+            _report_pool = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="report")
+    futures = []
+    while True:
+        now = datetime.now(timezone.utc)
+        defn = reports.find_one_and_update(
+            {"enabled": True, "next_run_at": {"$lte": now}},
+            [{"$set": {"next_run_at": {"$add": [now, {"$multiply": ["$interval_hours", 3600 * 1000]}]}}}],
+            return_document=ReturnDocument.AFTER,
+        )
+        if defn is None:
+            break
+        futures.append(_report_pool.submit(render_report, defn))
+    if wait:
+        for f in futures:
+            f.result()
+    return len(futures)
+
+def _report_scheduler():
+    reports.create_index([("enabled", ASCENDING), ("next_run_at", ASCENDING)])
+    while True:
+        try:
+            run_due_reports()
+        except Exception:
+            app.logger.exception("report scheduler pass failed")
+        time.sleep(REPORT_POLL_SECONDS)
+
+@app.before_request
+def _ensure_report_scheduler():
+    global _report_thread
+    if not REPORT_SCHEDULER or (_report_thread is not None and _report_thread.is_alive()):
+        return
+    with _report_lock:
+        if _report_thread is None or not _report_thread.is_alive():
+            _report_thread = threading.Thread(target=_report_scheduler, name="report-scheduler", daemon=True)
+            _report_thread.start()
+
+def present_report(defn):
+    out = dict(defn)
+    out["id"] = str(out.pop("_id"))
+    if out.get("output"):
+        out["output"] = {k: v for k, v in out["output"].items() if k != "file"}
+        out["download_url"] = f"/api/reports/{out['id']}/download"
+    return out
+
+@app.route("/api/reports", methods=["GET"])
+@require_auth
+def list_reports():
+    q = {k: request.args[k] for k in ("institute", "department", "kind") if request.args.get(k)}
+    items = [present_report(d) for d in reports.find(q).sort([("institute", ASCENDING), ("department", ASCENDING), ("kind", ASCENDING)])]
+    return jsonify(items), 200
+
+@app.route("/api/reports", methods=["POST"])
+@require_role("Super_Admin", "Admin")
+def create_report():
+    """
+    Body: {kind: inventory|unverified|status, institute, department?,
+    format: csv|xlsx (default csv), interval_hours (default weekly)}.
+    The first render is queued right away.
+    """
+    data = request.get_json() or {}
+    kind = (data.get("kind") or "").strip()
+    fmt = (data.get("format") or "csv").strip().lower()
+    institute = (data.get("institute") or "").strip()
+    department = (data.get("department") or "").strip()
+    if kind not in REPORT_KINDS:
+        return jsonify({"error": f"kind must be one of {sorted(REPORT_KINDS)}"}), 400
+    if fmt not in REPORT_FORMATS:
+        return jsonify({"error": f"format must be one of {sorted(REPORT_FORMATS)}"}), 400
+    if not institute:
+        return jsonify({"error": "institute is required"}), 400
+    try:
+        interval = float(data.get("interval_hours") or REPORT_DEFAULT_INTERVAL_HOURS)
+    except (TypeError, ValueError):
+        return jsonify({"error": "interval_hours must be a number"}), 400
+    if interval < 1:
+        return jsonify({"error": "interval_hours must be at least 1"}), 400
+
+    now = datetime.now(timezone.utc)
+    doc = {
+        "kind": kind, "format": fmt, "institute": institute, "department": department or None,
+        "interval_hours": interval, "enabled": True, "next_run_at": now,
+        "created_at": now, "created_by": request.user["emp_id"],
+    }
+    res = reports.insert_one(doc)
+    run_due_reports()
+    audit_log(
+        audit, request, request.user, "report.create",
+        resource={"type": "Report", "id": str(res.inserted_id), "kind": kind, "institute": institute, "department": department},
+        ok=True, status=201
+    )
+    return jsonify(present_report(doc)), 201
+
+@app.route("/api/reports/<id>", methods=["DELETE"])
+@require_role("Super_Admin", "Admin")
+def delete_report(id):
+    try:
+        oid = ObjectId(id)
+    except Exception:
+        return jsonify({"error": "Invalid id"}), 400
+    doc = reports.find_one_and_delete({"_id": oid})
+    if not doc:
+        return jsonify({"error": "Report not found"}), 404
+    audit_log(
+        audit, request, request.user, "report.delete",
+        resource={"type": "Report", "id": id, "kind": doc["kind"], "institute": doc["institute"]},
+        ok=True, status=200
+    )
+    return jsonify({"deleted": id}), 200
+
+@app.route("/api/reports/<id>/run", methods=["POST"])
+@require_role("Super_Admin", "Admin")
+def run_report(id):
+    """Queue an immediate render; the schedule continues from this run."""
+    try:
+        oid = ObjectId(id)
+    except Exception:
+        return jsonify({"error": "Invalid id"}), 400
+    res = reports.update_one({"_id": oid}, {"$set": {"next_run_at": datetime.now(timezone.utc)}})
+    if not res.matched_count:
+        return jsonify({"error": "Report not found"}), 404
+    run_due_reports()
+    return jsonify({"queued": id}), 202
+
+@app.route("/api/reports/<id>/download", methods=["GET"])
+@require_auth
+def download_report(id):
+    """Serve the latest render; renders on demand if it was never built or was evicted."""
+    try:
+        oid = ObjectId(id)
+    except Exception:
+        return jsonify({"error": "Invalid id"}), 400
+    defn = reports.find_one({"_id": oid})
+    if not defn:
+        return jsonify({"error": "Report not found"}), 404
+    output = defn.get("output")
+    if not output or not os.path.exists(report_file(output)):
+        output = render_report(defn)
+        if output is None:
+            return jsonify({"error": "Report could not be rendered"}), 500
+    stamp = output["rendered_at"].strftime(DATE_FMT_DATE)
+    scope = "_".join(s for s in (defn["institute"], defn.get("department")) if s)
+    name = f"{defn['kind']}_{re.sub(r'[^A-Za-z0-9_-]+', '-', scope)}_{stamp}.{defn['format']}"
+    resp = send_file(
+        report_file(output), mimetype=REPORT_MIMETYPES[defn["format"]],
+        as_attachment=True, download_name=name, etag=output["sha256"],
+        conditional=True, last_modified=output["rendered_at"],
+    )
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+@app.cli.command("render-reports")
+@click.option("--all", "render_all", is_flag=True, help="Render every enabled report, not only due ones.")
+def render_reports_command(render_all):
+    """Render scheduled reports now (for cron-driven deployments with REPORT_SCHEDULER=false)."""
+    if render_all:
+        reports.update_many({"enabled": True}, {"$set": {"next_run_at": datetime.now(timezone.utc)}})
+    click.echo(f"rendered {run_due_reports(wait=True)} report(s)")
+
+# ---------------- Health ----------------
+@app.route("/api/health", methods=["GET"])
+def health_live():
+    """Liveness: the process is up and serving requests."""
+    return jsonify({"status": "ok"}), 200
+
+@app.route("/api/health/ready", methods=["GET"])
+def health_ready():
+    """
+    Readiness: Mongo answers a ping within the server-selection timeout and the
+    connection pool is not saturated. Load balancers should route on this one.
+    """
+    pool = pool_state.snapshot()
+    pool["max_size"] = MONGO_MAX_POOL_SIZE
+    checks = {"pool": pool}
+    ready = True
+
+    started = time.perf_counter()
+    try:
+        client.admin.command("ping")
+        checks["mongo"] = {"ok": True, "ping_ms": round((time.perf_counter() - started) * 1000, 2)}
+    except Exception as e:
+        checks["mongo"] = {"ok": False, "error": e.__class__.__name__}
+        ready = False
+
+    if pool["checked_out"] >= MONGO_MAX_POOL_SIZE:
+        ready = False
+        checks["pool"]["saturated"] = True
+    recent = pool.get("last_checkout_failure")
+    if recent and int(time.time()) - recent < 10:
+        ready = False
+        checks["pool"]["recent_checkout_failure"] = True
+
+    return jsonify({"status": "ready" if ready else "unavailable", "checks": checks}), (200 if ready else 503)
+
 # ---------------- Run ----------------
 
 @app.route("/download/sample-report", methods=["GET"])
@@ -1826,4 +5308,9 @@ def download_sample_report():
         return send_file(filepath, as_attachment=True, download_name=filename)
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=int(os.getenv("BACKEND_PORT", 5000)), debug=True)
+    # Development server only; production runs wsgi:app under gunicorn (see gunicorn.conf.py)
+    app.run(
+        host="0.0.0.0",
+        port=int(os.getenv("BACKEND_PORT", 5000)),
+        debug=os.getenv("FLASK_DEBUG", "true").lower() == "true",
+    )
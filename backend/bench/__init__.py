@@ -0,0 +1 @@
+"""API benchmark harness. See bench/run.py."""
@@ -0,0 +1,320 @@
+"""
+Reproducible API benchmark.
+
+Seeds a dedicated database with a deterministic dataset (see
+scripts/gen_campus_data.py), then drives the hot
+endpoints through the Flask test client (in-process) and/or over HTTP with
+concurrent clients. Reports p50/p95/p99 latency, throughput, bytes on the
+wire and Mongo commands per request (from the Server-Timing header), and
+writes the results as JSON for comparing runs.
+
+    cd backend
+    python -m bench.run --preset small --mode client
+    python -m bench.run --preset small --mode http --base-url http://localhost:5000 \\
+        --concurrency 1,8,32 --requests 500
+    python -m bench.run --skip-seed --compare bench/results/<earlier>.json
+
+HTTP mode expects the server to be running against the same MONGO_URL/DB_NAME
+and JWT_SECRET, e.g. `DB_NAME=CampusAssetsBench gunicorn -c gunicorn.conf.py wsgi:app`.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from pymongo import MongoClient
+
+from scripts.gen_campus_data import PRESETS, generate
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+SERVER_TIMING_DB_RE = re.compile(r'db;dur=([\d.]+);desc="(\d+) cmds"')
+
+# name -> (path template, sample key). Sample keys are filled from the dataset.
+SCENARIOS = {
+    "list_assets": ("/api/assets", None),
+    "get_by_id": ("/api/assets/{asset_id}", "asset_id"),
+    "get_by_registration": ("/api/assets/by-reg/{registration_number}", "registration_number"),
+    "qr_list": ("/api/qr?page={page}&size=25", "page"),
+    "qr_get_by_id": ("/api/qr/by-id/{qr_id}", "qr_id"),
+    "asset_stats": ("/api/assets/stats", None),
+    "asset_stats_filtered": ("/api/assets/stats?institute={institute}", "institute"),
+    "bulk_stats": ("/api/assets/bulk-stats", None),
+    "filter_options": ("/api/assets/filter-options", None),
+    "audit_list": ("/api/audit?page={page}&size=25", "page"),
+}
+
+
+def percentile(sorted_vals, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_vals:
+        return None
+    k = max(0, min(len(sorted_vals) - 1, math.ceil(pct / 100.0 * len(sorted_vals)) - 1))
+    return sorted_vals[k]
+
+
+def load_samples(db, names, rng, n=1000):
+    """Identifiers drawn from the dataset; the same seed picks the same ones."""
+    n_assets = db[names["assets"]].estimated_document_count()
+    picks = rng.sample(range(1, n_assets + 1), min(n, n_assets))
+    docs = {d["serial_no"]: d for d in db[names["assets"]].find(
+        {"serial_no": {"$in": picks}}, {"registration_number": 1, "serial_no": 1})}
+    chosen = [docs[p] for p in picks if p in docs]
+
+    n_qr = db[names["qr"]].estimated_document_count()
+    offset = rng.randint(0, max(0, n_qr - n))
+    qr_ids = [d["qr_id"] for d in db[names["qr"]].find({}, {"qr_id": 1}).sort("qr_id", 1).skip(offset).limit(n)]
+    rng.shuffle(qr_ids)
+
+    return {
+        "asset_id": [str(d["_id"]) for d in chosen] or [""],
+        "registration_number": [d["registration_number"] for d in chosen if d.get("registration_number")] or [""],
+        "qr_id": qr_ids or [""],
+        "institute": sorted(v for v in db[names["assets"]].distinct("institute") if v) or [""],
+        "page": [str(p) for p in range(1, 41)],
+    }
+
+
+class Target:
+    """Issues one request and returns (status, body bytes, Server-Timing header)."""
+
+    def __init__(self, mode, app=None, base_url=None, headers=None):
+        self.mode = mode
+        self.app = app
+        self.base_url = urlsplit(base_url) if base_url else None
+        self.headers = headers or {}
+        self._local = threading.local()
+
+    def _client(self):
+        c = getattr(self._local, "client", None)
+        if c is None:
+            if self.mode == "client":
+                c = self.app.test_client()
+            else:
+                cls = http.client.HTTPSConnection if self.base_url.scheme == "https" else http.client.HTTPConnection
+                c = cls(self.base_url.hostname, self.base_url.port, timeout=120)
+            self._local.client = c
+        return c
+
+    def get(self, path):
+        c = self._client()
+        if self.mode == "client":
+            r = c.get(path, headers=self.headers)
+            return r.status_code, len(r.get_data()), r.headers.get("Server-Timing", "")
+        try:
+            c.request("GET", path, headers=self.headers)
+            r = c.getresponse()
+            body = r.read()
+            return r.status, len(body), r.getheader("Server-Timing", "")
+        except (http.client.HTTPException, OSError):
+            c.close()
+            self._local.client = None
+            raise
+
+
+def run_scenario(target, name, samples, concurrency, total, warmup):
+    template, key = SCENARIOS[name]
+    values = samples.get(key) if key else None
+
+    def path_for(i):
+        if not values:
+            return template
+        return template.format(**{key: values[i % len(values)]})
+
+    for i in range(warmup):
+        target.get(path_for(i))
+
+    latencies, sizes, db_ms, db_cmds = [], [], [], []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            status, size, timing = target.get(path_for(i))
+        except Exception:
+            with lock:
+                errors += 1
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+        m = SERVER_TIMING_DB_RE.search(timing or "")
+        with lock:
+            if status >= 400:
+                errors += 1
+            latencies.append(elapsed)
+            sizes.append(size)
+            if m:
+                db_ms.append(float(m.group(1)))
+                db_cmds.append(int(m.group(2)))
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    mean = lambda xs: round(sum(xs) / len(xs), 3) if xs else None
+    return {
+        "endpoint": name,
+        "path": template,
+        "mode": target.mode,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50), 3) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95), 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 3) if latencies else None,
+        "mean_ms": mean(latencies),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else None,
+        "bytes_per_req": mean(sizes),
+        "mongo_ops_per_req": mean(db_cmds),
+        "db_ms_per_req": mean(db_ms),
+    }
+
+
+def git_rev():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def compare(current, baseline_path):
+    with open(baseline_path, encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    base = {(r["endpoint"], r["mode"], r["concurrency"]): r for r in baseline["results"]}
+    print(f"\ncompared with {baseline_path} ({baseline['meta'].get('git_rev')})")
+    print(f"{'endpoint':24} {'mode':6} {'conc':>4} {'p50 Δ%':>8} {'p95 Δ%':>8} {'rps Δ%':>8}")
+    for r in current["results"]:
+        b = base.get((r["endpoint"], r["mode"], r["concurrency"]))
+        if not b:
+            continue
+
+        def delta(field):
+            if not b.get(field) or r.get(field) is None:
+                return "n/a"
+            return f"{(r[field] - b[field]) / b[field] * 100:+.1f}"
+        print(f"{r['endpoint']:24} {r['mode']:6} {r['concurrency']:>4} "
+              f"{delta('p50_ms'):>8} {delta('p95_ms'):>8} {delta('throughput_rps'):>8}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    ap.add_argument("--db", default=os.getenv("BENCH_DB_NAME", "CampusAssetsBench"))
+    ap.add_argument("--preset", choices=sorted(PRESETS), default="small")
+    ap.add_argument("--assets", type=int, help="override the preset's asset count")
+    ap.add_argument("--qr", type=int, help="override the preset's QR row count")
+    ap.add_argument("--audit-per-asset", type=float, help="override the preset's audit events per asset")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--workers", type=int, help="data generator worker processes")
+    ap.add_argument("--skip-seed", action="store_true", help="reuse the data already in --db")
+    ap.add_argument("--mode", choices=["client", "http", "both"], default="client")
+    ap.add_argument("--base-url", default="http://localhost:5000")
+    ap.add_argument("--concurrency", default="1,8", help="comma separated client counts")
+    ap.add_argument("--requests", type=int, default=200, help="requests per endpoint and concurrency level")
+    ap.add_argument("--warmup", type=int, default=10)
+    ap.add_argument("--endpoints", default=",".join(SCENARIOS), help="comma separated scenario names")
+    ap.add_argument("--no-compress", action="store_true", help="do not send Accept-Encoding: gzip")
+    ap.add_argument("--out", default=RESULTS_DIR)
+    ap.add_argument("--compare", help="earlier results file to diff against")
+    args = ap.parse_args(argv)
+
+    # The app reads its configuration at import time
+    os.environ["MONGO_URL"] = args.mongo_url
+    os.environ["DB_NAME"] = args.db
+    os.environ.setdefault("JWT_SECRET", "bench-secret-not-for-production")
+    os.environ.setdefault("FRONTEND_ORIGIN", "http://localhost:3000")
+    os.environ.setdefault("PROFILE_SAMPLE_RATE", "0")
+
+    names = {
+        "assets": os.getenv("ASSETS_COLLECTION", "Assets"),
+        "qr": os.getenv("QR_COLLECTION", "QrRegistry"),
+        "audit": os.getenv("AUDIT_COLLECTION", "AuditLogs"),
+    }
+    mongo = MongoClient(args.mongo_url)
+    bench_db = mongo[args.db]
+    if args.skip_seed:
+        counts = {k: bench_db[v].estimated_document_count() for k, v in names.items()}
+    else:
+        n_assets, n_qr, per_asset = PRESETS[args.preset]
+        counts = generate(
+            args.mongo_url, args.db,
+            args.assets if args.assets is not None else n_assets,
+            args.qr if args.qr is not None else n_qr,
+            args.audit_per_asset if args.audit_per_asset is not None else per_asset,
+            seed=args.seed, workers=args.workers, drop=True,
+        )
+
+    import app as app_module  # noqa: E402  (after env is configured)
+
+    users = app_module.users
+    users.update_one(
+        {"emp_id": "bench_admin"},
+        {"$setOnInsert": {"emp_id": "bench_admin", "name": "Benchmark", "role": "Super_Admin",
+                          "password": app_module.hash_password(os.urandom(16).hex()),
+                          "created_at": int(time.time())}},
+        upsert=True,
+    )
+    app_module.recount_user_roles()
+    token = app_module.jwt_issue(users.find_one({"emp_id": "bench_admin"}), ttl_hours=24)
+    headers = {"Authorization": f"Bearer {token}"}
+    if not args.no_compress:
+        headers["Accept-Encoding"] = "gzip"
+
+    samples = load_samples(bench_db, names, random.Random(args.seed))
+    modes = ["client", "http"] if args.mode == "both" else [args.mode]
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    scenarios = [s.strip() for s in args.endpoints.split(",") if s.strip() in SCENARIOS]
+
+    results = []
+    for mode in modes:
+        target = Target(mode, app=app_module.app, base_url=args.base_url, headers=headers)
+        for name in scenarios:
+            for conc in levels:
+                r = run_scenario(target, name, samples, conc, args.requests, args.warmup)
+                results.append(r)
+                print(f"{mode:6} {name:24} c={conc:<3} p50={r['p50_ms']}ms p95={r['p95_ms']}ms "
+                      f"p99={r['p99_ms']}ms rps={r['throughput_rps']} ops/req={r['mongo_ops_per_req']} "
+                      f"errors={r['errors']}")
+
+    report = {
+        "meta": {
+            "timestamp": int(time.time()),
+            "git_rev": git_rev(),
+            "preset": args.preset,
+            "seed": args.seed,
+            "counts": counts,
+            "requests": args.requests,
+            "concurrency": levels,
+            "compressed": not args.no_compress,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"{time.strftime('%Y%m%dT%H%M%S')}_{args.preset}.json")
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"results written to {path}")
+
+    if args.compare:
+        compare(report, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+"""Gunicorn settings, driven by environment variables.
+
+Sizing guide: WEB_CONCURRENCY worker processes x GUNICORN_THREADS threads each
+gives the number of requests served concurrently. Every worker owns its own
+MongoClient, so keep MONGO_MAX_POOL_SIZE >= GUNICORN_THREADS and make sure
+WEB_CONCURRENCY * MONGO_MAX_POOL_SIZE stays under the server's connection limit.
+The analytics/export/import load-shedding limits (LOAD_SHED_*) are per worker
+too; keep their concurrency + queue totals below GUNICORN_THREADS so scan
+requests always find a free thread.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('BACKEND_PORT', '5000')}")
+
+# Request handlers are mostly I/O bound (Mongo round trips) with some CPU-bound
+# bcrypt/JSON work, so use a few processes with a thread pool in each.
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+worker_class = "gthread"
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Recycle workers periodically to bound memory growth; jitter avoids all
+# workers restarting at once.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+
+# MongoClient is not fork-safe: let each worker import the app (and open its
+# own pool) after forking instead of preloading it in the master.
+preload_app = False
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+errorlog = os.getenv("GUNICORN_ERROR_LOG", "-")
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
@@ -0,0 +1,502 @@
+"""
+Synthetic campus dataset generator.
+
+Writes assets, QR registry rows, audit history, staff users and the master
+setup document in the shapes produced by the API (create_assets_bulk, the QR
+registry and audit_log). Distributions are skewed the way a real campus is: a
+few large institutes and departments own most of the inventory, assets arrive
+in bulk purchases, older QR batches are more likely to be linked.
+
+Output is fully determined by --seed: work is split into fixed-size chunks and
+every chunk draws from its own RNG, so the worker count does not change the
+data. Document _ids are derived from the seed as well.
+
+    cd backend
+    python -m scripts.gen_campus_data --preset large --workers 8 --drop
+    python -m scripts.gen_campus_data --assets 250000 --qr 100000 --seed 7 --drop
+
+MONGO_URL / DB_NAME (or --mongo-url / --db) select the target database.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+from bisect import bisect_right
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from pymongo import MongoClient
+
+PRESETS = {
+    # name: (assets, qr rows, audit events per asset)
+    "tiny": (1_000, 500, 3),
+    "small": (10_000, 5_000, 3),
+    "medium": (100_000, 50_000, 3),
+    "large": (1_000_000, 500_000, 3),
+}
+
+INSTITUTES = ["UVPCE", "BSPP", "CMSR", "VMPIM", "ISPP", "GUNI-IT", "MUIS", "SKPCPER"]
+DEPARTMENTS = ["CE", "IT", "ME", "EE", "EC", "CIVIL", "BIOMED", "MBA", "PHARMA", "ADMIN", "LIBRARY", "HOSTEL"]
+CATALOG = [
+    # (asset_name, category, weight, typical price, rate spread)
+    ("Chair", "Furniture", 30, 1_800, 0.4),
+    ("Table", "Furniture", 15, 4_500, 0.4),
+    ("Bench", "Furniture", 12, 6_000, 0.3),
+    ("Almirah", "Furniture", 4, 12_000, 0.3),
+    ("Computer", "Electronics", 14, 48_000, 0.3),
+    ("Monitor", "Electronics", 6, 11_000, 0.3),
+    ("Projector", "Electronics", 3, 38_000, 0.3),
+    ("Printer", "Electronics", 2, 16_000, 0.4),
+    ("Router", "Networking", 2, 7_500, 0.5),
+    ("Switch", "Networking", 1, 22_000, 0.5),
+    ("AC", "Electrical", 3, 42_000, 0.2),
+    ("Fan", "Electrical", 8, 2_400, 0.2),
+    ("Oscilloscope", "Lab Equipment", 1, 65_000, 0.4),
+    ("Microscope", "Lab Equipment", 1, 28_000, 0.4),
+]
+STATUS_WEIGHTS = [("active", 80), ("inactive", 6), ("repair", 6), ("scrape", 5), ("damage", 3)]
+BUILDINGS = ["A Block", "B Block", "C Block", "D Block", "Library", "Admin", "Workshop", "Hostel"]
+FIRST_NAMES = ["Amit", "Priya", "Rahul", "Neha", "Kiran", "Sneha", "Vikram", "Pooja", "Ravi", "Anjali",
+               "Harsh", "Meera", "Nirav", "Divya", "Jay", "Riya"]
+LAST_NAMES = ["Patel", "Shah", "Mehta", "Desai", "Joshi", "Trivedi", "Pandya", "Bhatt", "Parikh", "Modi"]
+VENDORS = [f"{a} {b}" for a in ("Shree", "Om", "Gujarat", "National", "Sai", "Jay Ambe", "Prime", "Tech")
+           for b in ("Traders", "Enterprises", "Furniture", "Infotech", "Electricals", "Systems")]
+USER_ROLES = [("Faculty", 70), ("Verifier", 20), ("Admin", 9), ("Super_Admin", 1)]
+
+DEFAULT_PASSWORD = "campus123"  # every generated user gets this password
+START = datetime(2019, 6, 1, tzinfo=timezone.utc)
+END = datetime(2025, 6, 1, tzinfo=timezone.utc)
+CHUNK = 10_000
+
+
+def zipf_weights(n, s=1.1):
+    return [1.0 / (k ** s) for k in range(1, n + 1)]
+
+
+def weighted(rng, items, cum):
+    """Pick from items with precomputed cumulative weights."""
+    return items[bisect_right(cum, rng.random() * cum[-1])]
+
+
+def cumulative(weights):
+    out, total = [], 0.0
+    for w in weights:
+        total += w
+        out.append(total)
+    return out
+
+
+INST_CUM = cumulative(zipf_weights(len(INSTITUTES)))
+DEPT_CUM = cumulative(zipf_weights(len(DEPARTMENTS), 0.9))
+CATALOG_CUM = cumulative([c[2] for c in CATALOG])
+STATUS_CUM = cumulative([w for _, w in STATUS_WEIGHTS])
+VENDOR_CUM = cumulative(zipf_weights(len(VENDORS), 1.2))
+ROLE_CUM = cumulative([w for _, w in USER_ROLES])
+
+
+def oid(kind, ts, n):
+    """Deterministic ObjectId: creation time + a kind byte + a counter."""
+    return ObjectId(f"{int(ts) & 0xFFFFFFFF:08x}{kind:02x}{n:014x}")
+
+
+def asset_oid(created, serial):
+    return oid(1, created, serial)
+
+
+def chunk_rng(seed, kind, index):
+    return random.Random(f"{seed}:{kind}:{index}")
+
+
+# ---------------- Planning (parent process) ----------------
+def plan_asset_batches(n_assets, rng):
+    """
+    Split n_assets into bulk-create batches like the Add Asset form produces:
+    (start_serial, quantity, created_ts, asset index, institute, department).
+    Serial numbers grow with creation time, as next_asset_serial() assigns them.
+    """
+    batches, serial = [], 1
+    while serial <= n_assets:
+        # Mostly small purchases with a long tail of lab/classroom fit-outs
+        qty = min(1000, max(1, int(rng.lognormvariate(1.2, 1.1))), n_assets - serial + 1)
+        batches.append([serial, qty, 0, None, weighted(rng, INSTITUTES, INST_CUM), weighted(rng, DEPARTMENTS, DEPT_CUM)])
+        serial += qty
+    span = (END - START).total_seconds()
+    times = sorted(START.timestamp() + rng.random() * span for _ in batches)
+    for b, ts in zip(batches, times):
+        b[2] = int(ts)
+        b[3] = CATALOG.index(weighted(rng, CATALOG, CATALOG_CUM))
+    return [tuple(b) for b in batches]
+
+
+def plan_qr_batches(n_qr, rng):
+    """
+    QR registry batches: (first row number, size, created_ts, institute,
+    department, first per-institute serial number). Per-institute serials are
+    allocated in creation order, matching next_serial_for_institute().
+    """
+    batches, row = [], 0
+    while row < n_qr:
+        size = min(n_qr - row, rng.choice([10, 25, 50, 50, 100, 100, 200, 500]))
+        batches.append([row, size, 0, weighted(rng, INSTITUTES, INST_CUM), weighted(rng, DEPARTMENTS, DEPT_CUM), 0])
+        row += size
+    span = (END - START).total_seconds()
+    times = sorted(START.timestamp() + rng.random() * span for _ in batches)
+    counters, prev = {}, 0
+    for b, ts in zip(batches, times):
+        # One batch per second at most keeps qr_id (which embeds the stamp) unique
+        b[2] = prev = max(int(ts), prev + 1)
+        b[5] = counters.get(b[3], 0) + 1
+        counters[b[3]] = counters.get(b[3], 0) + b[1]
+    return [tuple(b) for b in batches]
+
+
+def group_tasks(batches, size_index, limit=CHUNK):
+    """Group consecutive batches into tasks of roughly `limit` documents."""
+    tasks, cur, n = [], [], 0
+    for b in batches:
+        cur.append(b)
+        n += b[size_index]
+        if n >= limit:
+            tasks.append(cur)
+            cur, n = [], 0
+    if cur:
+        tasks.append(cur)
+    return tasks
+
+
+# ---------------- Document builders ----------------
+def day(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d")
+
+
+def person(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def audit_doc(rng, ts, action, actor, resource, institute=None, department=None, changes=None):
+    doc = {
+        "ts": int(ts),
+        "ts_iso": datetime.fromtimestamp(ts, timezone.utc).isoformat(),
+        "actor": actor,
+        "action": action,
+        "resource": resource,
+        "result": {"ok": True, "status": 201 if action.endswith("create") else 200},
+        "context": {
+            "ip_masked": f"10.{rng.randint(0, 40)}.{rng.randint(0, 255)}.0",
+            "ua_hash": "%064x" % rng.getrandbits(256),
+            "method": "POST" if action.endswith("create") else "PUT",
+            "route": "/api/assets",
+            "request_id": "%032x" % rng.getrandbits(128),
+        },
+        "severity": "info",
+    }
+    if changes:
+        doc["changes"] = changes
+    if institute:
+        doc["institute"] = institute
+    if department:
+        doc["department"] = department
+    return doc
+
+
+def build_assets(task, seed, index, helpers, actors, audit_per_asset):
+    rng = chunk_rng(seed, "assets", index)
+    sanitize_token, reg_prefix_from_asset, reg_with_seq, search_terms, type_asset_fields = helpers
+    now_ts = END.timestamp()
+    assets, events = [], []
+    for start_serial, qty, created, cat_idx, institute, department in task:
+        asset_name, category, _, price, spread = CATALOG[cat_idx]
+        created_dt = datetime.fromtimestamp(created, timezone.utc)
+        prefix = reg_prefix_from_asset(asset_name, at=created_dt)
+        purchase_ts = created - rng.randint(0, 120) * 86400
+        assign_ts = purchase_ts + rng.randint(0, 60) * 86400
+        rate = round(price * rng.lognormvariate(0, spread), -1)
+        vendor = weighted(rng, VENDORS, VENDOR_CUM)
+        bill_no = f"INV/{created_dt.year}/{rng.randint(1, 9999):04d}"
+        po_no = f"PO/{institute}/{rng.randint(1, 4999):04d}"
+        building = rng.choice(BUILDINGS)
+        model = f"{vendor.split()[0]}-{rng.randint(100, 999)}"
+        individual = category == "Electronics" and rng.random() < 0.3
+        faculty = person(rng) if individual else ""
+        actor = rng.choice(actors)
+
+        for i in range(1, qty + 1):
+            serial = start_serial + i - 1
+            verified = rng.random() < min(0.9, 0.25 + (now_ts - created) / (now_ts - START.timestamp()))
+            verify_ts = min(now_ts, assign_ts + rng.randint(30, 700) * 86400)
+            status = weighted(rng, [s for s, _ in STATUS_WEIGHTS], STATUS_CUM)
+            room = f"{rng.randint(1, 4)}{rng.randint(1, 30):02d}"
+            doc = {
+                "_id": asset_oid(created, serial),
+                "serial_no": serial,
+                "registration_number": reg_with_seq(prefix, i),
+                "asset_name": asset_name,
+                "category": category,
+                "room_no": room,
+                "building_name": building,
+                "assign_date": day(assign_ts),
+                "status": status,
+                "desc": f"{asset_name} ({model})",
+                "remarks": "",
+                "verification_date": day(verify_ts) if verified else "",
+                "verified": verified,
+                "verified_by": person(rng) if verified else "",
+                "institute": institute,
+                "department": department,
+                "assigned_type": "individual" if individual else "general",
+                "assigned_faculty_name": faculty,
+                "employee_code": f"EMP{rng.randint(1, 99999):05d}" if individual else "",
+                "bill_no": bill_no,
+                "vendor_name": vendor,
+                "purchase_date": day(purchase_ts),
+                "rate_per_unit": rate,
+                "po_no": po_no,
+                "size_lxwxh": "",
+                "company_model": model,
+                "it_serial_no": f"{sanitize_token(model).upper()}{rng.getrandbits(32):08X}" if category == "Electronics" else "",
+                "dead_stock_no": f"DS/{institute}/{serial:07d}",
+                "created_at": created,
+                "updated_at": datetime.fromtimestamp(created, timezone.utc),
+                "version": 1,
+                "schema": 2,  # app.ASSET_SCHEMA_VERSION: typed dates and money
+            }
+            type_asset_fields(doc)
+            doc["_search"] = search_terms(doc)
+            assets.append(doc)
+
+        events.append(audit_doc(
+            rng, created, "asset.bulk_create", actor, {"type": "Asset", "id": None},
+            institute, department, {"after": {"count": qty, "sample_serial_no": list(range(start_serial, start_serial + min(qty, 50)))}},
+        ))
+        # Follow-up history: edits and verifications spread after creation
+        for _ in range(int(rng.random() * 2 * audit_per_asset * qty)):
+            serial = rng.randint(start_serial, start_serial + qty - 1)
+            ts = min(now_ts, created + rng.randint(1, 900) * 86400)
+            action = "asset.update"
+            events.append(audit_doc(
+                rng, ts, action, rng.choice(actors),
+                {"type": "Asset", "id": str(asset_oid(created, serial)), "serial_no": serial,
+                 "registration_number": reg_with_seq(prefix, serial - start_serial + 1)},
+                institute, department, {"diff": {"verified": [False, True]}},
+            ))
+    return assets, events
+
+
+def build_qr(task, seed, index, helpers, asset_index, actors):
+    rng = chunk_rng(seed, "qr", index)
+    sanitize_token, institute_serial_prefix, qr_timestamp_str = helpers
+    now_ts = END.timestamp()
+    rows, events = [], []
+    for first_row, size, created, institute, department, first_serial in task:
+        inst = sanitize_token(institute).upper()
+        dept = sanitize_token(department).upper()
+        stamp = qr_timestamp_str(datetime.fromtimestamp(created, timezone.utc))
+        prefix = institute_serial_prefix(inst)
+        # Older batches have had more time to be stuck on assets
+        age = (now_ts - created) / (now_ts - START.timestamp())
+        link_p = 0.15 + 0.75 * age
+        candidates = asset_index.get(institute) or []
+        for seq in range(1, size + 1):
+            n = first_row + seq
+            row = {
+                "_id": oid(2, created, n),
+                "qr_id": f"{inst}/{dept}/{stamp}/{seq:04d}",
+                "serial_no": f"{prefix}{first_serial + seq - 1:02d}",
+                "institute": inst,
+                "department": dept,
+                "ts": stamp,
+                "created_at": created,
+                "used": False,
+                "linked_at": None,
+                "updated_at": datetime.fromtimestamp(created, timezone.utc),
+                "version": 1,
+            }
+            if rng.random() < link_p:
+                linked_at = min(now_ts, created + rng.randint(1, 400) * 86400)
+                row["used"] = True
+                row["linked_at"] = int(linked_at)
+                row["updated_at"] = datetime.fromtimestamp(linked_at, timezone.utc)
+                row["version"] = 2
+                if candidates and rng.random() < 0.7:
+                    # Linked to an existing asset (qr_link_asset)
+                    start_serial, qty, a_created = candidates[rng.randrange(len(candidates))]
+                    row["asset_id"] = asset_oid(a_created, rng.randint(start_serial, start_serial + qty - 1))
+                    action = "qr.link"
+                else:
+                    # Filled in by scanning (qr_update_fields)
+                    name, category = CATALOG[rng.randrange(len(CATALOG))][:2]
+                    row.update({
+                        "asset_name": name, "category": category, "status": "active",
+                        "assign_date": day(linked_at), "verified": True,
+                        "verified_by": person(rng), "verification_date": day(linked_at),
+                        "assigned_type": "general", "assigned_faculty_name": "",
+                    })
+                    action = "qr.update"
+                events.append(audit_doc(
+                    rng, linked_at, action, rng.choice(actors),
+                    {"type": "QR", "qr_id": row["qr_id"]}, inst, dept,
+                ))
+            rows.append(row)
+    return rows, events
+
+
+# ---------------- Workers ----------------
+_worker = {}
+
+
+def _init_worker(mongo_url, db_name, names, seed, asset_index, actors, audit_per_asset):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import app as app_module  # same helpers the API uses
+
+    client = MongoClient(mongo_url)
+    _worker.update(
+        db=client[db_name], names=names, seed=seed, asset_index=asset_index, actors=actors,
+        audit_per_asset=audit_per_asset,
+        asset_helpers=(app_module.sanitize_token, app_module.reg_prefix_from_asset, app_module.reg_with_seq,
+                       app_module.search_terms, app_module.type_asset_fields),
+        qr_helpers=(app_module.sanitize_token, app_module.institute_serial_prefix, app_module.qr_timestamp_str),
+    )
+
+
+def _run_task(job):
+    kind, index, task = job
+    db, names = _worker["db"], _worker["names"]
+    if kind == "assets":
+        docs, events = build_assets(task, _worker["seed"], index, _worker["asset_helpers"],
+                                    _worker["actors"], _worker["audit_per_asset"])
+        db[names["assets"]].insert_many(docs, ordered=False, bypass_document_validation=True)
+    else:
+        docs, events = build_qr(task, _worker["seed"], index, _worker["qr_helpers"],
+                                _worker["asset_index"], _worker["actors"])
+        db[names["qr"]].insert_many(docs, ordered=False, bypass_document_validation=True)
+    if events:
+        db[names["audit"]].insert_many(events, ordered=False, bypass_document_validation=True)
+    return kind, len(docs), len(events)
+
+
+# ---------------- Entry point ----------------
+def build_users(n, rng, password_hash):
+    users = []
+    for i in range(1, n + 1):
+        emp_id = f"EMP{i:05d}"
+        role = weighted(rng, [r for r, _ in USER_ROLES], ROLE_CUM)
+        name = person(rng)
+        users.append({
+            "_id": oid(3, START.timestamp(), i),
+            "emp_id": emp_id,
+            "name": name,
+            "name_lc": name.lower(),
+            "password": password_hash,
+            "role": role,
+            "created_at": int(START.timestamp()) + i * 3600,
+        })
+    return users
+
+
+def generate(mongo_url, db_name, n_assets, n_qr, audit_per_asset=3, n_users=200, seed=42,
+             workers=None, drop=False, log=print):
+    """Generate a dataset into db_name. Returns document counts."""
+    # The app reads its configuration at import time
+    os.environ["MONGO_URL"] = mongo_url
+    os.environ["DB_NAME"] = db_name
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if backend_dir not in sys.path:
+        sys.path.insert(0, backend_dir)
+
+    client = MongoClient(mongo_url)
+    db = client[db_name]
+    names = {
+        "assets": os.getenv("ASSETS_COLLECTION", "Assets"),
+        "qr": os.getenv("QR_COLLECTION", "QrRegistry"),
+        "audit": os.getenv("AUDIT_COLLECTION", "AuditLogs"),
+        "users": os.getenv("USER_COLLECTION", "Users"),
+        "info": os.getenv("INFO_COLLECTION", "OtherInfo"),
+    }
+    if drop:
+        for name in names.values():
+            db[name].drop()
+
+    import app as app_module  # creates indexes on the (now empty) collections
+
+    rng = random.Random(seed)
+    started = time.perf_counter()
+
+    # Staff accounts (hash once; bcrypt is deliberately slow)
+    users = build_users(n_users, rng, app_module.hash_password(DEFAULT_PASSWORD))
+    if users:
+        db[names["users"]].insert_many(users, ordered=False)
+    app_module.recount_user_roles()
+    actors = [{"user_id": str(u["_id"]), "emp_id": u["emp_id"], "name": u["name"], "role": u["role"]}
+              for u in users if u["role"] in ("Admin", "Super_Admin", "Verifier")] or [
+        {"user_id": None, "emp_id": "system", "name": "System", "role": "Super_Admin"}]
+
+    asset_batches = plan_asset_batches(n_assets, rng)
+    asset_index = {}
+    for start_serial, qty, created, _, institute, _ in asset_batches:
+        asset_index.setdefault(institute, []).append((start_serial, qty, created))
+    qr_batches = plan_qr_batches(n_qr, rng)
+
+    jobs = [("assets", i, t) for i, t in enumerate(group_tasks(asset_batches, 1))]
+    jobs += [("qr", i, t) for i, t in enumerate(group_tasks(qr_batches, 1))]
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    log(f"generating {n_assets} assets in {len(asset_batches)} batches and {n_qr} QR rows "
+        f"in {len(qr_batches)} batches with {workers} workers")
+
+    counts = {"assets": 0, "qr": 0, "audit": 0, "users": len(users)}
+    init_args = (mongo_url, db_name, names, seed, asset_index, actors, audit_per_asset)
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(workers, initializer=_init_worker, initargs=init_args) as pool:
+        for done, (kind, n_docs, n_events) in enumerate(pool.imap_unordered(_run_task, jobs), 1):
+            counts[kind] += n_docs
+            counts["audit"] += n_events
+            if done % max(1, len(jobs) // 20) == 0 or done == len(jobs):
+                elapsed = time.perf_counter() - started
+                log(f"  {done}/{len(jobs)} chunks, {counts['assets'] + counts['qr']} docs, "
+                    f"{(counts['assets'] + counts['qr'] + counts['audit']) / max(elapsed, 1e-6):,.0f} docs/s")
+
+    # Master setup document used by the forms and scan pages
+    db[names["info"]].update_one(
+        {"type": "master"},
+        app_module.bump_master(
+            {"$addToSet": {"Institutes": {"$each": INSTITUTES}, "Departments": {"$each": DEPARTMENTS}},
+             "$set": {f"Asset_NameCategory.{name}:{category}": 1 for name, category, *_ in CATALOG}}),
+        upsert=True,
+    )
+    # Delta-sync order follows _id, i.e. creation time
+    app_module.backfill_sync_seq(batch_size=5000, log=lambda msg: None)
+    # Invalidate ETags handed out for the previous contents
+    app_module.bump_revision("assets", "qr")
+    app_module.ensure_indexes()
+    log(f"done in {time.perf_counter() - started:.1f}s: {counts}")
+    return counts
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    ap.add_argument("--db", default=os.getenv("DB_NAME", "Dataset"))
+    ap.add_argument("--preset", choices=sorted(PRESETS), default="small")
+    ap.add_argument("--assets", type=int, help="override the preset's asset count")
+    ap.add_argument("--qr", type=int, help="override the preset's QR row count")
+    ap.add_argument("--audit-per-asset", type=float, help="average audit events per asset")
+    ap.add_argument("--users", type=int, default=200)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--workers", type=int, help="worker processes (default: CPUs - 1)")
+    ap.add_argument("--drop", action="store_true", help="drop the target collections first")
+    args = ap.parse_args(argv)
+
+    n_assets, n_qr, per_asset = PRESETS[args.preset]
+    generate(
+        args.mongo_url, args.db,
+        args.assets if args.assets is not None else n_assets,
+        args.qr if args.qr is not None else n_qr,
+        args.audit_per_asset if args.audit_per_asset is not None else per_asset,
+        args.users, args.seed, args.workers, args.drop,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+#!/usr/bin/env bash
+# Start a local three-member replica set for exercising read/write splitting.
+#
+#   ./scripts/replset-dev.sh          # start (data under ./.replset)
+#   ./scripts/replset-dev.sh stop
+#
+# Then run the backend with:
+#   MONGO_URL="mongodb://localhost:27017,localhost:27018,localhost:27019/?replicaSet=rs0"
+# Analytics/export/audit responses carry "X-Read-Node: secondary"; scans and
+# writes report "primary".
+set -euo pipefail
+
+RS_NAME="${RS_NAME:-rs0}"
+BASE_DIR="${REPLSET_DIR:-$(pwd)/.replset}"
+PORTS=(27017 27018 27019)
+
+if [[ "${1:-start}" == "stop" ]]; then
+  for port in "${PORTS[@]}"; do
+    mongosh --quiet --port "$port" --eval 'db.getSiblingDB("admin").shutdownServer({force: true})' >/dev/null 2>&1 || true
+  done
+  exit 0
+fi
+
+for port in "${PORTS[@]}"; do
+  mkdir -p "$BASE_DIR/$port"
+  mongod --replSet "$RS_NAME" --port "$port" --bind_ip localhost \
+    --dbpath "$BASE_DIR/$port" --logpath "$BASE_DIR/$port.log" --fork
+done
+
+mongosh --quiet --port "${PORTS[0]}" --eval "
+rs.initiate({
+  _id: '$RS_NAME',
+  members: [
+    { _id: 0, host: 'localhost:${PORTS[0]}', priority: 2 },
+    { _id: 1, host: 'localhost:${PORTS[1]}' },
+    { _id: 2, host: 'localhost:${PORTS[2]}' }
+  ]
+})"
+echo "Replica set $RS_NAME running on ports ${PORTS[*]}"
@@ -0,0 +1,117 @@
+"""Bulk delete cut short (snapshot cap, failed page), then undone (runs on mongomock)."""
+import os
+import sys
+import uuid
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+import mongomock.collection
+import pymongo
+
+os.environ.setdefault("JWT_SECRET", "x" * 32)
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("FRONTEND_ORIGIN", "http://localhost:3000")
+os.environ.setdefault("ARCHIVE_INTERVAL_HOURS", "0")
+os.environ.setdefault("REPORT_SCHEDULER", "false")
+
+
+class _Client(mongomock.MongoClient):
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+
+
+class _BulkResult:
+    def __init__(self, n):
+        self.matched_count = self.modified_count = n
+
+
+def _bulk_write(self, ops, ordered=True, **kwargs):
+    # mongomock does not accept pymongo 4 operation objects
+    n = 0
+    for op in ops:
+        if type(op).__name__ == "ReplaceOne":
+            n += self.replace_one(op._filter, op._doc, upsert=bool(op._upsert)).modified_count
+        else:
+            n += self.update_one(op._filter, op._doc, upsert=bool(op._upsert)).modified_count
+    return _BulkResult(n)
+
+
+pymongo.MongoClient = _Client
+mongomock.collection.Collection.bulk_write = _bulk_write
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app as appmod  # noqa: E402
+
+TOTAL = 20
+
+
+@pytest.fixture
+def client(monkeypatch):
+    for coll in (appmod.assets, appmod.qr_registry, appmod.audit, appmod.users):
+        coll.delete_many({})
+    docs = [{"serial_no": i, "registration_number": f"BD/{i:04d}", "asset_name": uuid.uuid4().hex,
+             "remarks": uuid.uuid4().hex * 4} for i in range(1, TOTAL + 1)]
+    ids = appmod.assets.insert_many(docs).inserted_ids
+    appmod.qr_registry.insert_many([{"qr_id": f"QR{i}", "serial_no": i, "asset_id": _id}
+                                    for i, _id in enumerate(ids, 1)])
+
+    # Pages of 5 assets; the cap fits a couple of pages but not all four
+    monkeypatch.setattr(appmod, "BULK_DELETE_CHUNK", 5)
+    monkeypatch.setattr(appmod, "BULK_DELETE_SNAPSHOT_MAX_BYTES", 1200)
+
+    appmod.users.insert_one({"emp_id": "tester", "name": "Tester", "role": "Super_Admin", "password": b""})
+    token = appmod.jwt_issue(appmod.users.find_one({"emp_id": "tester"}))
+    c = appmod.app.test_client()
+    c.environ_base["HTTP_AUTHORIZATION"] = "Bearer " + token
+    return c
+
+
+def test_truncated_bulk_delete_undo(client):
+    criteria = {"registration_prefix": "BD/"}
+    preview = client.post("/api/assets/bulk-delete", json=dict(criteria, dry_run=True)).get_json()
+    assert preview["matched"] == TOTAL
+
+    res = client.post("/api/assets/bulk-delete", json=dict(criteria, confirm=preview["confirm"]))
+    assert res.status_code == 200
+    body = res.get_json()
+    assert 0 < body["deleted_asset"] < TOTAL
+    assert body["remaining"] == TOTAL - body["deleted_asset"]
+    assert body["deleted_qr"] == body["deleted_asset"]
+    assert appmod.assets.count_documents({}) == body["remaining"]
+
+    res = client.post(f"/api/assets/bulk-delete/{body['batch_id']}/undo")
+    assert res.status_code == 200
+    assert res.get_json() == {"restored_asset": body["deleted_asset"], "restored_qr": body["deleted_qr"]}
+    assert appmod.assets.count_documents({}) == TOTAL
+    assert appmod.qr_registry.count_documents({}) == TOTAL
+
+
+def test_failed_page_undo(client, monkeypatch):
+    monkeypatch.setattr(appmod, "BULK_DELETE_SNAPSHOT_MAX_BYTES", 1 << 20)
+    delete_page = appmod.assets.delete_many
+    calls = []
+
+    def failing_delete(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 3:
+            raise appmod.PyMongoError("connection lost")
+        return delete_page(*args, **kwargs)
+
+    monkeypatch.setattr(appmod.assets, "delete_many", failing_delete)
+    criteria = {"registration_prefix": "BD/"}
+    preview = client.post("/api/assets/bulk-delete", json=dict(criteria, dry_run=True)).get_json()
+    res = client.post("/api/assets/bulk-delete", json=dict(criteria, confirm=preview["confirm"]))
+    assert res.status_code == 500
+    assert appmod.assets.count_documents({}) == TOTAL - 10
+
+    record = appmod.audit.find_one({"action": "asset.bulk_delete"})
+    assert record["changes"]["after"]["complete"] is False
+    assert record["changes"]["after"]["deleted_assets"] == 10
+
+    monkeypatch.setattr(appmod.assets, "delete_many", delete_page)
+    res = client.post(f"/api/assets/bulk-delete/{record['resource']['batch_id']}/undo")
+    assert res.status_code == 200
+    # The failed page was snapshotted but not deleted; its rows are skipped
+    assert res.get_json() == {"restored_asset": 10, "restored_qr": 10}
+    assert appmod.assets.count_documents({}) == TOTAL
+    assert appmod.qr_registry.count_documents({}) == TOTAL
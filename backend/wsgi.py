@@ -0,0 +1,10 @@
+"""WSGI entry point for production serving.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The Flask development server (python app.py) is single-process and runs the
+debugger; do not expose it.
+"""
+from app import app
+
+application = app
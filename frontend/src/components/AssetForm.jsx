@@ -60,11 +60,8 @@ export default function AssetForm() {
   useEffect(() => {
     async function fetchDropdowns() {
       try {
-        const [an, ins, dep] = await Promise.all([
-          fetch(`${API}/api/setup/asset-names`, { credentials: "include" }).then((r) => r.json()),
-          fetch(`${API}/api/setup/institutes`, { credentials: "include" }).then((r) => r.json()),
-          fetch(`${API}/api/setup/departments`, { credentials: "include" }).then((r) => r.json()),
-        ]);
+        const res = await fetch(`${API}/api/setup/bootstrap`, { credentials: "include" });
+        const { asset_names: an, institutes: ins, departments: dep } = await res.json();
         setAssetNames(Array.isArray(an) ? an : []);
         setInstituteOptions(Array.isArray(ins) ? ins : []);
         setDepartmentOptions(Array.isArray(dep) ? dep : []);
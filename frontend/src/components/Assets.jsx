@@ -413,6 +413,9 @@ export default function Assets() {
 
   const [detail, setDetail] = useState(null);
 
+  // Archived assets live in a separate collection and are only fetched on request
+  const [showArchived, setShowArchived] = useState(false);
+
   // Selection state for checkboxes
   const [selectedIds, setSelectedIds] = useState([]);
   const selectAllRef = useRef();
@@ -426,7 +429,8 @@ export default function Assets() {
     let alive = true;
     (async () => {
       try {
-        const res = await fetch(`${API}/api/assets`, {
+        const qs = showArchived ? "?include_archived=true" : "";
+        const res = await fetch(`${API}/api/assets${qs}`, {
           credentials: "include",
         });
         if (!res.ok) {
@@ -448,7 +452,7 @@ export default function Assets() {
     return () => {
       alive = false;
     };
-  }, [navigate]);
+  }, [navigate, showArchived]);
 
   const options = useMemo(
     () => ({
@@ -827,6 +831,15 @@ export default function Assets() {
             <option value="linked">Linked</option>
             <option value="not_linked">Not Linked</option>
           </select>
+
+          <label className="inline-flex items-center gap-2 px-3 py-2 text-sm">
+            <input
+              type="checkbox"
+              checked={showArchived}
+              onChange={(e) => setShowArchived(e.target.checked)}
+            />
+            Include archived
+          </label>
         </div>
 
         {/* Table with checkboxes */}
@@ -865,7 +878,10 @@ export default function Assets() {
                   <td className="px-3 py-2">{fmt(a.serial_no)}</td>
                   <td className="px-3 py-2">{fmt(a.asset_name)}</td>
                   <td className="px-3 py-2">{fmt(a.room_no)}</td>
-                  <td className="px-3 py-2">{fmt(a.status)}</td>
+                  <td className="px-3 py-2">
+                    {fmt(a.status)}
+                    {a.archived && <span className="ml-1 text-xs text-gray-500">(archived)</span>}
+                  </td>
                   <td className="px-3 py-2 whitespace-nowrap">{fmt(a.assign_date)}</td>
                   <td className="px-3 py-2 text-right">
                     <div className="inline-flex gap-2">
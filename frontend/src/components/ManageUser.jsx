@@ -2,10 +2,14 @@ import React, { useEffect, useMemo, useState } from "react";
 
 const API = process.env.REACT_APP_BACKEND_PORT || "http://localhost:5000";
 const ROLES = ["Super_Admin", "Admin", "Faculty", "Verifier"];
+const PAGE_SIZE = 50;
 
 export default function ManageUsers() {
   const [users, setUsers] = useState([]);
   const [counts, setCounts] = useState({});
+  const [total, setTotal] = useState(0);
+  const [next, setNext] = useState(null);
+  const [search, setSearch] = useState("");
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState("");
   const [roleFilter, setRoleFilter] = useState("");
@@ -13,19 +17,28 @@ export default function ManageUsers() {
   const [newPw, setNewPw] = useState("");
 
   useEffect(() => {
-    fetchUsers();
-  }, [roleFilter]);
+    // Debounce typing in the search box
+    const t = setTimeout(() => fetchUsers(), search ? 250 : 0);
+    return () => clearTimeout(t);
+  }, [roleFilter, search]);
 
-  async function fetchUsers() {
+  async function fetchUsers(after = null) {
     setLoading(true);
     setError("");
     try {
-      const res = await fetch(`${API}/api/users${roleFilter ? `?role=${roleFilter}` : ""}`, {
+      const params = new URLSearchParams({ limit: PAGE_SIZE });
+      if (roleFilter) params.set("role", roleFilter);
+      if (search.trim()) params.set("q", search.trim());
+      if (after) params.set("after", after);
+      const res = await fetch(`${API}/api/users?${params}`, {
         credentials: "include",
       });
       const data = await res.json();
       if (data.success) {
-        setUsers(Array.isArray(data.users) ? data.users : []);
+        const page = Array.isArray(data.users) ? data.users : [];
+        setUsers((prev) => (after ? [...prev, ...page] : page));
+        setNext(data.next || null);
+        setTotal(data.total || 0);
         const countObj = {};
         (data.counts || []).forEach((c) => {
           countObj[c._id] = c.count;
@@ -149,7 +162,7 @@ export default function ManageUsers() {
           }}
           onClick={() => setRoleFilter("")}
         >
-          All ({users.length})
+          All ({total})
         </button>
 
         {/* Then the role pills in preferred order */}
@@ -172,6 +185,14 @@ export default function ManageUsers() {
         ))}
       </div>
 
+      <input
+        type="text"
+        value={search}
+        placeholder="Search by employee ID or name"
+        style={{ width: "100%", fontSize: 14, padding: "8px 12px", borderRadius: 8, border: "1px solid #e5e7eb", marginBottom: 16 }}
+        onChange={(e) => setSearch(e.target.value)}
+      />
+
       {error && <div style={{ color: "#dc2626", marginBottom: 16 }}>{error}</div>}
       {loading && <div style={{ color: "#6366f1", marginBottom: 18 }}>Loading...</div>}
 
@@ -244,6 +265,14 @@ export default function ManageUsers() {
           </tbody>
         </table>
       </div>
+
+      {next && (
+        <div style={{ textAlign: "center", marginTop: 16 }}>
+          <button style={resetBtn} disabled={loading} onClick={() => fetchUsers(next)}>
+            Load more
+          </button>
+        </div>
+      )}
     </div>
   );
 }
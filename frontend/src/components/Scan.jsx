@@ -18,16 +18,12 @@ export default function Scan() {
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const [institutesRes, departmentsRes] = await Promise.all([
-          fetch(`${API}/api/setup/institutes`, { credentials: "include" }),
-          fetch(`${API}/api/setup/departments`, { credentials: "include" })
-        ]);
-
-        if (institutesRes.ok && departmentsRes.ok) {
-          const institutesList = await institutesRes.json();
-          const departmentsList = await departmentsRes.json();
-          setInstitutes(institutesList);
-          setDepartments(departmentsList);
+        const res = await fetch(`${API}/api/setup/bootstrap`, { credentials: "include" });
+
+        if (res.ok) {
+          const master = await res.json();
+          setInstitutes(master.institutes || []);
+          setDepartments(master.departments || []);
         }
       } catch (error) {
         console.error('Error fetching institutes/departments:', error);